@@ -18,22 +18,20 @@ def from_historique_to_frequence(historique):
     >>> from_historique_to_frequence(np.array([[0.1, 0.4, 0.5, 0.3], [0.4, 0, 1, 0], [0.5, 1, 0.2, 0.7], [0.3, 0, 0.7, 0.3]]))
     array([1.3, 1.4, 2.4, 1.3])
     """
-    nb_ref = len(historique[0])
-    frequence = np.zeros(nb_ref)
-    for ref in range(nb_ref):
-        for ref2 in range(nb_ref):
-            frequence[ref] += historique[ref, ref2]
+    frequence = np.asarray(historique, dtype=float).sum(axis=1)
     return frequence
 
 
 
-def rang_frequence(historique):
+def rang_frequence(historique, frequence=None):
     """
     Donne le rang de chaque référence (en fonction de leur fréquence)
 
     Paramètres:
         historique (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
 
+        frequence (array de taille nb_ref) : fréquences déjà calculées (cf from_historique_to_frequence).
+
     Return:
         rang_ref (array de taille (nb_ref)) : rang_ref[refi] = rang de refi lorsque les références sont rangées par fréquences croissantes
 
@@ -42,8 +40,11 @@ def rang_frequence(historique):
     >>> rang_frequence(np.array([[0.1, 0.4, 0.5, 0.3], [0.4, 0, 1, 0], [0.5, 1, 0.2, 0.7], [0.3, 0, 0.7, 0.3]]))
     array([2., 1., 0., 3.])
     """
-    frequence = from_historique_to_frequence(historique)
-    nb_ref = len(historique[0])
+    if frequence is None:
+        frequence = from_historique_to_frequence(historique)
+    # frequence est modifiée pendant le classement
+    frequence = np.array(frequence, dtype=float)
+    nb_ref = len(frequence)
     rang_ref = -1*np.zeros(nb_ref)
     for k in range(nb_ref):
         ref_max = np.argmax(frequence)
@@ -132,7 +133,7 @@ def classify_rangees(nb_rangees):
 
 
 
-def ABC(historique, nb_rangees, longueur_rangees):
+def ABC(historique, nb_rangees, longueur_rangees, instance=None):
     """
     Regroupe les références en 3 groupes, 1 pour chaque classe.
 
@@ -143,12 +144,17 @@ def ABC(historique, nb_rangees, longueur_rangees):
 
         longueur_rangees (entier) : correspond à la longueur d'une rangée.
 
+        instance (Instance) : si elle est donnée, on réutilise ses rangs déjà calculés.
+
     Return:
         positionnement (array de taille (longueur_rangees, nb_rangees): la position
         des références dans l'entrepôt.
     """
     nb_ref = nb_rangees*longueur_rangees
-    rang_ref = rang_frequence(historique)
+    if instance is not None:
+        rang_ref = instance.rang
+    else:
+        rang_ref = rang_frequence(historique)
 
     # on calcule le nombre de références par classe
     rangees_classe = classify_rangees(nb_rangees)
@@ -1,12 +1,25 @@
 """
-Ce module permet de générer un emplacement aléatoire.
+Ce module permet de générer un emplacement aléatoire, et de connaître sans tirage
+la moyenne et la variance du coût d'un emplacement aléatoire.
+-------
+Pour un emplacement uniforme, le coût X = sum_{i<j} proba[i, j] * temps[place_i, place_j] est celui
+d'un problème d'affectation quadratique dont on connaît les deux premiers moments : on écrit
+X = sum_{i != j} A[i, j] * B[place_i, place_j], avec A la partie supérieure de proba symétrisée
+et divisée par 2, B le tableau des temps symétrisé, de diagonale nulle (deux références
+n'ont jamais la même place). En notant, pour une matrice M symétrique de diagonale nulle,
+    S(M) = sum M[i, j], S2(M) = sum M[i, j]², R(M) = sum_i (sum_j M[i, j])²,
+on trouve, avec (n)_k = n (n - 1) ... (n - k + 1),
+    E[X] = S(A) S(B) / (n)_2
+    E[X²] = 2 S2(A) S2(B) / (n)_2 + 4 (R(A) - S2(A)) (R(B) - S2(B)) / (n)_3
+            + (S(A)² + 2 S2(A) - 4 R(A)) (S(B)² + 2 S2(B) - 4 R(B)) / (n)_4
+selon que les deux couples de références ont deux, trois ou quatre références distinctes.
 """
 
 import numpy.random as rd
 import numpy as np
 
 
-def alea(longueur_rangees, nb_rangees):
+def alea(longueur_rangees, nb_rangees, nb_tirages=None, generateur=None):
     """
     Réparti les références de manière aléatoire dans l'entrepot.
 
@@ -15,24 +28,102 @@ def alea(longueur_rangees, nb_rangees):
 
         nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
 
+        nb_tirages (Entier): si il est donné, on tire nb_tirages positionnements indépendants d'un coup.
+
+        generateur (numpy.random.Generator): le générateur aléatoire à utiliser (par défaut, celui de numpy.random).
+
     Return:
-        position (Array de taille (longueur_rangees, nb_rangees): la position
-        des références dans l'entrepôt.
+        position (Array de taille (longueur_rangees, nb_rangees), ou (nb_tirages, longueur_rangees, nb_rangees)):
+        la position des références dans l'entrepôt.
 
     >>> alea(1, 1)
     array([[0.]])
+    >>> positions = alea(2, 3, nb_tirages=4, generateur=np.random.default_rng(0))
+    >>> positions.shape
+    (4, 2, 3)
+    >>> bool(np.all(np.sort(positions.reshape(4, 6), axis=1) == np.arange(6)))
+    True
+    """
+    nb_ref = longueur_rangees * nb_rangees
+    tirages = (1 if nb_tirages is None else nb_tirages, nb_ref)
+    uniformes = rd.random(tirages) if generateur is None else generateur.random(tirages)
+    # Trier des réels uniformes donne une permutation uniforme de chaque ligne
+    positions = np.argsort(uniformes, axis=1).astype(float).reshape(tirages[0], longueur_rangees, nb_rangees)
+
+    return positions[0] if nb_tirages is None else positions
+
+
+def _moments_matrice(matrice):
+    """
+    Somme, somme des carrés et somme des carrés des sommes des lignes d'une matrice.
+    """
+    return matrice.sum(), np.sum(matrice ** 2), np.sum(matrice.sum(axis=1) ** 2)
+
+
+def _moments_temps(temps_entrepot):
+    """
+    Moments (cf _moments_matrice) de la partie symétrique, hors diagonale, des temps de l'entrepôt.
+    La table est lue ligne par ligne : elle peut être triangulaire ou implicite, sans matrice pleine.
+    """
+    nb = len(temps_entrepot)
+    (somme, carres, lignes) = (0., 0., 0.)
+    for place in range(nb):
+        ligne = (np.asarray(temps_entrepot[place], dtype=float)
+                 + np.asarray(temps_entrepot[:, place], dtype=float)) / 2
+        ligne[place] = 0
+        somme_ligne = ligne.sum()
+        (somme, carres, lignes) = (somme + somme_ligne, carres + np.sum(ligne ** 2), lignes + somme_ligne ** 2)
+    return somme, carres, lignes
+
+
+def moments_alea(temps_entrepot, proba):
+    """
+    Calcule exactement, en O(nb_ref²), l'espérance et la variance du coût (cf evaluation.evalue_position)
+    d'un positionnement tiré uniformément.
+
+    Parametres:
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places,
+            éventuellement triangulaire ou implicite (cf routage.TempsImplicite) : il est lu ligne par ligne.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+    Return:
+        esperance (Réel): le coût moyen d'un positionnement aléatoire.
+
+        variance (Réel): la variance de ce coût.
+
+    On vérifie sur tous les positionnements de 4 références :
+
+    >>> from itertools import permutations
+    >>> from evaluation import evalue_position, evalue_entrepot
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> couts = [evalue_position(np.reshape(ordre, (2, 2)), evalue_entrepot(2, 2), proba)
+    ...          for ordre in permutations(range(4))]
+    >>> np.allclose(moments_alea(evalue_entrepot(2, 2), proba), (np.mean(couts), np.var(couts)))
+    True
+    >>> implicite = moments_alea(evalue_entrepot(2, 2, implicite=True), proba)
+    >>> np.allclose(implicite, moments_alea(evalue_entrepot(2, 2), proba))
+    True
     """
-    # nb_ref = nb_rangees * longueur_rangees
-    position = np.zeros((longueur_rangees, nb_rangees))
+    nb_ref = len(proba)
+    haute = np.triu(proba, 1)
+    A = (haute + haute.T) / 2
 
-    refs = [ref for ref in range(nb_rangees * longueur_rangees)]
-    rd.shuffle(refs)
+    (somme_a, carres_a, lignes_a) = _moments_matrice(A)
+    (somme_b, carres_b, lignes_b) = _moments_temps(temps_entrepot)
+    # Nombre de façons de placer 2, 3 et 4 références distinctes ; s'il n'y en a pas assez,
+    # le terme correspondant est nul et on évite seulement de diviser par 0
+    arrangements2 = max(1, nb_ref * (nb_ref - 1))
+    arrangements3 = max(1, arrangements2 * (nb_ref - 2))
+    arrangements4 = max(1, arrangements3 * (nb_ref - 3))
 
-    for index_refi in range(longueur_rangees):
-        for index_refj in range(nb_rangees):
-            position[index_refi, index_refj] = refs[index_refi * nb_rangees + index_refj]
+    esperance = somme_a * somme_b / arrangements2
+    moment2 = (2 * carres_a * carres_b / arrangements2
+               + 4 * (lignes_a - carres_a) * (lignes_b - carres_b) / arrangements3
+               + (somme_a ** 2 + 2 * carres_a - 4 * lignes_a) * (somme_b ** 2 + 2 * carres_b - 4 * lignes_b)
+               / arrangements4)
 
-    return position
+    return float(esperance), float(max(moment2 - esperance ** 2, 0))
 
 
 if __name__ == "__main__":
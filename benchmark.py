@@ -0,0 +1,255 @@
+"""
+Ce module mesure les performances des algorithmes et des noyaux de calcul sur une échelle
+de tailles d'entrepôts, pour vérifier qu'une optimisation paie et qu'aucune ne régresse.
+-------
+Les instances sont générées par generateur.matrice_proba avec une graine fixée.
+Pour chaque cas et chaque taille, on enregistre
+    - le temps de calcul (meilleur de plusieurs répétitions pour les noyaux rapides),
+    - le pic de mémoire allouée (tracemalloc, mesuré dans une exécution séparée),
+    - le nombre d'évaluations de la fonction de coût (pour descente),
+    - le coût de la solution obtenue (pour les méthodes de positionnement).
+Les résultats sont écrits en JSON ; comparés à un fichier de référence, ils signalent les régressions :
+    python benchmark.py --sortie mesures.json --reference reference.json
+renvoie un code d'erreur s'il y en a.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+import numpy as np
+from generateur import matrice_proba, store_matrice
+from evaluation import evalue_entrepot, evalue_position
+from jaccard import indice_jacquard, jacquard
+from abc_classique import ABC
+from descente_locale import descente
+from instance import Instance
+from alea import alea
+from routage import table_temps, table_temps_triangulaire
+
+# Echelle des tailles (longueur_rangees, nb_rangees) : le nombre de références doit être un multiple de 3
+TAILLES = ((5, 6), (10, 12), (20, 24), (30, 36))
+GRAINE = 0
+# Temps de calcul donné à descente pour chaque taille, en secondes
+BUDGET_DESCENTE = 2.
+# Nombre de répétitions d'un cas dont on garde le meilleur temps
+NB_REPETITIONS = 3
+# Une mesure régresse si elle dépasse la référence de plus de cette proportion...
+TOLERANCE = 0.25
+# ... et de plus de ce temps (en secondes), pour ne pas signaler le bruit sur les cas très courts
+TEMPS_NEGLIGEABLE = 0.01
+
+CAS = {}
+
+
+def cas_benchmark(nom, repete=True, preparation=None):
+    """
+    Enregistre un cas de benchmark sous le nom "nom".
+    La fonction décorée reçoit l'instance et un positionnement de départ ; elle renvoie le nombre d'évaluations
+    et le positionnement obtenu (ou None pour chacun s'ils n'ont pas de sens).
+    Si elle est donnée, preparation(instance) est appelée avant les mesures, hors du temps mesuré.
+    """
+    def enregistre(fonction):
+        CAS[nom] = (fonction, repete, preparation)
+        return fonction
+    return enregistre
+
+
+# Fichiers des instances, écrits une fois par instance, pour le cas "chargement"
+_REPERTOIRE_FICHIERS = tempfile.TemporaryDirectory()
+_FICHIERS = {}
+
+
+def _ecrit_fichier(instance):
+    if instance.cle not in _FICHIERS:
+        nom = os.path.join(_REPERTOIRE_FICHIERS.name, instance.cle)
+        store_matrice(instance.proba, instance.longueur_rangees, instance.nb_rangees, nom + ".txt")
+        _FICHIERS[instance.cle] = nom
+
+
+@cas_benchmark("chargement", preparation=_ecrit_fichier)
+def _chargement(instance, _):
+    # Seule la lecture est mesurée : le fichier est écrit par _ecrit_fichier
+    Instance.depuis_fichier(_FICHIERS[instance.cle]).proba
+    return None, None
+
+
+@cas_benchmark("evalue_entrepot")
+def _evalue_entrepot(instance, _):
+    # Les tables de temps sont gardées en mémoire (cf routage.TAILLE_CACHE) : on mesure leur calcul
+    table_temps.cache_clear()
+    table_temps_triangulaire.cache_clear()
+    evalue_entrepot(instance.longueur_rangees, instance.nb_rangees, instance.politique)
+    return None, None
+
+
+@cas_benchmark("evalue_position")
+def _evalue_position(instance, positionnement):
+    evalue_position(positionnement, instance.temps_entrepot, instance.proba)
+    return 1, None
+
+
+@cas_benchmark("indice_jacquard")
+def _indice_jacquard(instance, _):
+    indice_jacquard(instance.proba)
+    return None, None
+
+
+@cas_benchmark("ABC")
+def _abc(instance, _):
+    return None, ABC(instance.proba, instance.nb_rangees, instance.longueur_rangees)
+
+
+@cas_benchmark("jacquard")
+def _jacquard(instance, _):
+    return None, jacquard(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot,
+                          0.1)
+
+
+@cas_benchmark("descente", repete=False)
+def _descente(instance, positionnement):
+    nb_evaluations = 0
+
+    def fonction_cout(essai):
+        nonlocal nb_evaluations
+        nb_evaluations += 1
+        return evalue_position(essai, instance.temps_entrepot, instance.proba)
+
+    solution = descente(positionnement.copy(), instance=instance, temps_max=BUDGET_DESCENTE,
+                        fonction_cout=fonction_cout)
+    return nb_evaluations, solution
+
+
+def instance_benchmark(longueur_rangees, nb_rangees, graine=GRAINE):
+    """
+    Génère l'instance de taille donnée, toujours la même pour une graine donnée.
+    """
+    random.seed(graine)
+    np.random.seed(graine)
+    return Instance(matrice_proba(longueur_rangees * nb_rangees), longueur_rangees, nb_rangees)
+
+
+def mesure(nom, instance, positionnement):
+    """
+    Mesure un cas sur une instance.
+
+    Parametres:
+        nom (Chaîne de caractères): le nom du cas (une clé de CAS).
+
+        instance (Instance): l'instance, dont temps_entrepot est déjà calculé.
+
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): le positionnement de départ.
+
+    Return:
+        resultat (dictionnaire): temps, memoire (octets), nb_evaluations et cout.
+
+    >>> instance = instance_benchmark(2, 3)
+    >>> resultat = mesure("evalue_position", instance, alea(2, 3))
+    >>> sorted(resultat), resultat["nb_evaluations"], resultat["cout"]
+    (['cout', 'memoire', 'nb_evaluations', 'temps'], 1, None)
+    """
+    (fonction, repete, preparation) = CAS[nom]
+    if preparation is not None:
+        preparation(instance)
+
+    temps = np.inf
+    for _ in range(NB_REPETITIONS if repete else 1):
+        # Les cas aléatoires (ABC, descente) refont les mêmes tirages à chaque mesure
+        random.seed(GRAINE)
+        np.random.seed(GRAINE)
+        debut = perf_counter()
+        (nb_evaluations, solution) = fonction(instance, positionnement)
+        temps = min(temps, perf_counter() - debut)
+
+    # tracemalloc ralentit le calcul : le pic de mémoire est mesuré à part (descente s'arrête à son budget)
+    tracemalloc.start()
+    random.seed(GRAINE)
+    np.random.seed(GRAINE)
+    fonction(instance, positionnement)
+    memoire = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    cout = None if solution is None else evalue_position(solution, instance.temps_entrepot, instance.proba)
+    return {"temps": temps, "memoire": memoire, "nb_evaluations": nb_evaluations, "cout": cout}
+
+
+def lance_benchmark(tailles=TAILLES, cas=None, graine=GRAINE):
+    """
+    Mesure chaque cas sur chaque taille d'entrepôt.
+
+    Return:
+        resultats (liste de dictionnaires): un dictionnaire par (cas, taille), avec les clés
+            cas, longueur_rangees, nb_rangees, nb_ref et celles de mesure.
+    """
+    resultats = []
+    for (longueur_rangees, nb_rangees) in tailles:
+        instance = instance_benchmark(longueur_rangees, nb_rangees, graine)
+        instance.temps_entrepot
+        positionnement = alea(longueur_rangees, nb_rangees, generateur=np.random.default_rng(graine))
+        for nom in (CAS if cas is None else cas):
+            resultat = {"cas": nom, "longueur_rangees": longueur_rangees, "nb_rangees": nb_rangees,
+                        "nb_ref": longueur_rangees * nb_rangees}
+            resultat.update(mesure(nom, instance, positionnement))
+            print("{cas} {longueur_rangees}x{nb_rangees} : {temps:.4f} s, {memoire} octets".format(**resultat))
+            resultats.append(resultat)
+    return resultats
+
+
+def regressions(resultats, reference, tolerance=TOLERANCE):
+    """
+    Compare des résultats à ceux d'une exécution de référence.
+
+    Return:
+        regressions (liste de chaînes de caractères): une description de chaque régression.
+
+    >>> reference = [{"cas": "ABC", "nb_ref": 30, "temps": 1., "memoire": 100, "cout": 5.}]
+    >>> regressions([{"cas": "ABC", "nb_ref": 30, "temps": 1.1, "memoire": 200, "cout": 5.}], reference)
+    ['ABC (30 références) : memoire 200 au lieu de 100']
+    """
+    references = {(resultat["cas"], resultat["nb_ref"]): resultat for resultat in reference}
+    trouvees = []
+    for resultat in resultats:
+        ancien = references.get((resultat["cas"], resultat["nb_ref"]))
+        if ancien is None:
+            continue
+        for (cle, marge) in (("temps", TEMPS_NEGLIGEABLE), ("memoire", 0), ("cout", 0)):
+            if resultat.get(cle) is None or ancien.get(cle) is None:
+                continue
+            if resultat[cle] > ancien[cle] * (1 + tolerance) and resultat[cle] - ancien[cle] > marge:
+                trouvees.append("{} ({} références) : {} {} au lieu de {}".format(
+                    resultat["cas"], resultat["nb_ref"], cle, resultat[cle], ancien[cle]))
+    return trouvees
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from argparse import ArgumentParser
+
+    PARSER = ArgumentParser(description="Mesure les performances sur une échelle de tailles d'entrepôts.")
+    PARSER.add_argument("--tailles", nargs="+", default=["{}x{}".format(*taille) for taille in TAILLES],
+                        help="tailles longueur_rangeesxnb_rangees, par exemple 5x6 10x12")
+    PARSER.add_argument("--cas", nargs="+", choices=sorted(CAS), help="cas mesurés (par défaut, tous)")
+    PARSER.add_argument("--graine", type=int, default=GRAINE)
+    PARSER.add_argument("--sortie", help="fichier JSON des résultats")
+    PARSER.add_argument("--reference", help="fichier JSON d'une exécution de référence")
+    PARSER.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ARGUMENTS = PARSER.parse_args()
+
+    RESULTATS = lance_benchmark([tuple(int(dimension) for dimension in taille.split("x"))
+                                 for taille in ARGUMENTS.tailles], ARGUMENTS.cas, ARGUMENTS.graine)
+    if ARGUMENTS.sortie is not None:
+        with open(ARGUMENTS.sortie, "w") as FICHIER:
+            json.dump({"graine": ARGUMENTS.graine, "resultats": RESULTATS}, FICHIER, indent=1)
+
+    if ARGUMENTS.reference is not None:
+        with open(ARGUMENTS.reference) as FICHIER:
+            REGRESSIONS = regressions(RESULTATS, json.load(FICHIER)["resultats"], ARGUMENTS.tolerance)
+        for REGRESSION in REGRESSIONS:
+            print("Régression : {}".format(REGRESSION))
+        sys.exit(1 if REGRESSIONS else 0)
@@ -0,0 +1,178 @@
+"""
+Ce module permet de garder sur le disque les calculs coûteux d'une exécution à l'autre :
+S-shape de l'entrepôt, statistiques d'une instance et meilleurs positionnements connus.
+-------
+Chaque résultat est rangé sous une clé qui est l'empreinte (sha256) de ce dont il dépend :
+les dimensions de l'entrepôt pour le S-shape, le contenu de l'instance pour les statistiques.
+Les tableaux sont des fichiers .npy relus par projection en mémoire (mmap).
+Lorsque le cache dépasse sa taille maximale, on supprime les fichiers les moins récemment utilisés.
+"""
+
+from contextlib import suppress
+from hashlib import sha256
+from pathlib import Path
+import os
+import numpy as np
+
+# Répertoire et taille par défaut, modifiables par variables d'environnement
+REPERTOIRE_CACHE = os.environ.get("MOPSI_CACHE", ".cache_mopsi")
+TAILLE_MAX_CACHE = int(os.environ.get("MOPSI_CACHE_TAILLE", 2 ** 30))
+
+
+def empreinte(*elements):
+    """
+    Calcule la clé d'un ensemble d'éléments (tableaux, chaînes, nombres ou octets).
+
+    Parametres:
+        elements : ce dont dépend le résultat à mettre en cache.
+
+    Return:
+        cle (Chaîne de caractères): empreinte hexadécimale.
+
+    >>> empreinte("sshape", 5, 6) == empreinte("sshape", 5, 6)
+    True
+    >>> empreinte(np.zeros(2)) == empreinte(np.zeros(3))
+    False
+    """
+    hachage = sha256()
+    for element in elements:
+        if isinstance(element, np.ndarray):
+            element = np.ascontiguousarray(element)
+            hachage.update("{}{}".format(element.dtype.str, element.shape).encode())
+            hachage.update(element.tobytes())
+        elif isinstance(element, bytes):
+            hachage.update(element)
+        else:
+            hachage.update(repr(element).encode())
+        # Séparateur pour que ("ab", "c") et ("a", "bc") n'aient pas la même clé
+        hachage.update(b"\x00")
+
+    return hachage.hexdigest()
+
+
+class CacheDisque:
+    """
+    Cache de tableaux sur le disque, borné en taille, avec éviction LRU.
+
+    Parametres:
+        repertoire (Chaîne de caractères): répertoire du cache, créé si besoin.
+
+        taille_max (Entier): taille maximale du cache en octets.
+
+        mesures (instrumentation.Mesures): si il est donné, compte les tableaux trouvés dans le cache ou calculés.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     cache = CacheDisque(repertoire)
+    ...     tableau = cache.calcule(empreinte("test"), "carre", lambda: np.arange(3) ** 2)
+    ...     (list(tableau), cache.charge(empreinte("test"), "carre") is not None)
+    ([0, 1, 4], True)
+    >>> with TemporaryDirectory() as repertoire:
+    ...     cache = CacheDisque(repertoire)
+    ...     cache.propose_positionnement("cle", np.array([[1, 0]]), 3.5)
+    ...     cache.meilleur_positionnement("cle")
+    True
+    (array([[1., 0.]]), 3.5)
+    """
+    def __init__(self, repertoire=REPERTOIRE_CACHE, taille_max=TAILLE_MAX_CACHE, mesures=None):
+        self.repertoire = Path(repertoire)
+        self.taille_max = taille_max
+        self.mesures = mesures
+        self.repertoire.mkdir(parents=True, exist_ok=True)
+
+    def _chemin(self, cle, nom):
+        return self.repertoire / cle[:2] / "{}_{}.npy".format(cle, nom)
+
+    def charge(self, cle, nom):
+        """
+        Renvoie le tableau projeté en mémoire (lecture seule), ou None s'il n'est pas dans le cache.
+        """
+        chemin = self._chemin(cle, nom)
+        try:
+            tableau = np.load(chemin, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        # La date de modification sert de date de dernière utilisation ; un autre processus peut
+        # avoir évincé le fichier entre-temps, le tableau projeté reste lisible
+        with suppress(OSError):
+            os.utime(chemin)
+        return tableau
+
+    def enregistre(self, cle, nom, tableau):
+        """
+        Ecrit le tableau dans le cache (de manière atomique) puis fait de la place si besoin.
+        """
+        chemin = self._chemin(cle, nom)
+        chemin.parent.mkdir(exist_ok=True)
+        temporaire = chemin.with_suffix(".{}.tmp".format(os.getpid()))
+        with open(temporaire, "wb") as fichier:
+            np.save(fichier, np.asarray(tableau))
+        os.replace(temporaire, chemin)
+        self.evince()
+
+    def calcule(self, cle, nom, fonction):
+        """
+        Renvoie le tableau du cache s'il existe, sinon le calcule avec fonction() et l'enregistre.
+        """
+        tableau = self.charge(cle, nom)
+        if self.mesures is not None:
+            self.mesures.compte("cache_calcules" if tableau is None else "cache_trouves")
+        if tableau is None:
+            tableau = fonction()
+            self.enregistre(cle, nom, tableau)
+        return tableau
+
+    def evince(self):
+        """
+        Supprime les fichiers les moins récemment utilisés jusqu'à respecter taille_max.
+        """
+        fichiers = []
+        for chemin in self.repertoire.glob("*/*.npy"):
+            try:
+                etat = chemin.stat()
+            except FileNotFoundError:
+                continue
+            fichiers.append((etat.st_mtime, etat.st_size, chemin))
+
+        taille = sum(taille_fichier for (_, taille_fichier, _) in fichiers)
+        for (_, taille_fichier, chemin) in sorted(fichiers):
+            if taille <= self.taille_max:
+                break
+            try:
+                chemin.unlink()
+            except FileNotFoundError:
+                pass
+            taille -= taille_fichier
+
+    def meilleur_positionnement(self, cle):
+        """
+        Renvoie le meilleur positionnement connu pour l'instance de clé "cle" et sa valeur,
+        ou (None, inf) s'il n'y en a pas.
+        """
+        meilleur = self.charge(cle, "meilleur")
+        if meilleur is None:
+            return None, float("inf")
+        return np.array(meilleur["positionnement"][0]), float(meilleur["valeur"][0])
+
+    def propose_positionnement(self, cle, positionnement, valeur):
+        """
+        Enregistre le positionnement s'il est meilleur que le meilleur connu.
+
+        Return:
+            ameliore (Booléen): True si le positionnement a été enregistré.
+        """
+        if valeur >= self.meilleur_positionnement(cle)[1]:
+            return False
+        positionnement = np.asarray(positionnement, dtype=float)
+        # Un seul enregistrement : le positionnement et sa valeur sont écrits (ou évincés) ensemble
+        meilleur = np.empty(1, dtype=[("valeur", float), ("positionnement", float, positionnement.shape)])
+        meilleur["valeur"] = valeur
+        meilleur["positionnement"] = positionnement
+        self.enregistre(cle, "meilleur", meilleur)
+        return True
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
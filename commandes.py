@@ -0,0 +1,243 @@
+"""
+Ce module permet d'évaluer un emplacement sur des commandes de plusieurs lignes,
+et non plus seulement sur des paires de références (cf evaluation.evalue_position).
+-------
+Une tournée S-shape part de l'entrée, visite les rangées de la commande de gauche à droite
+puis revient à l'entrée. Si la commande occupe m rangées, de profondeurs maximales d_r
+(depuis l'allée avant), le temps de la tournée est
+    2 + (trajet horizontal entre l'entrée et les rangées extrêmes) + min(S-shape, retour)
+avec
+    - retour : on entre par l'avant dans chaque rangée et on rebrousse chemin, sum 2 * d_r,
+    - S-shape : on traverse les rangées (longueur_rangees + 1 chacune) ; si m est impair,
+      on rebrousse chemin dans une rangée, choisie parmi celles où l'on passe par l'avant.
+Pour une ou deux références, c'est exactement evaluation.sshape.
+Les tournées sont calculées par lots, sans boucle sur les commandes : les lignes sont triées
+par (commande, rangée) puis réduites par rangée (profondeur maximale) et par commande.
+"""
+
+from collections import Counter
+from functools import cached_property
+from random import randrange
+from time import time
+import numpy as np
+from routage import geometrie_places
+from evaluation import places_references
+
+
+class Commandes:
+    """
+    Ensemble pondéré de commandes distinctes.
+
+    Parametres:
+        commandes (liste de listes d'entiers) : les références de chaque commande.
+
+        poids (liste de réels) : poids (nombre d'occurrences ou probabilité) de chaque commande.
+            Par défaut, toutes les commandes ont le poids 1.
+
+    >>> commandes = Commandes([[0, 3, 3], [1]], poids=[2, 1])
+    >>> (commandes.refs.tolist(), commandes.numeros.tolist(), commandes.nb_commandes)
+    ([0, 3, 1], [0, 0, 1], 2)
+    >>> commandes.commandes_de([3, 1]).tolist()
+    [0, 1]
+    """
+    def __init__(self, commandes, poids=None):
+        longueurs = np.array([len(commande) for commande in commandes], dtype=np.int64)
+        refs = np.array([ref for commande in commandes for ref in commande], dtype=np.int64)
+        numeros = np.repeat(np.arange(len(longueurs)), longueurs)
+        # Une référence commandée deux fois ne change pas la tournée
+        cles = np.unique(numeros << 32 | refs)
+        self.numeros = cles >> 32
+        self.refs = cles & 0xFFFFFFFF
+        self.nb_commandes = len(longueurs)
+        self.poids = np.ones(self.nb_commandes) if poids is None else np.asarray(poids, dtype=float)
+
+    @classmethod
+    def depuis_historique(cls, chemin):
+        """
+        Lit un historique (une commande par ligne, cf ingestion) et regroupe les commandes identiques.
+        """
+        compteur = Counter()
+        with open(chemin) as fichier:
+            for ligne in fichier:
+                if ligne.lstrip().startswith("#"):
+                    continue
+                commande = tuple(sorted({int(ref) for ref in ligne.replace(",", " ").split()}))
+                if len(commande) > 0:
+                    compteur[commande] += 1
+        return cls(list(compteur.keys()), list(compteur.values()))
+
+    @cached_property
+    def index(self):
+        """
+        Index des commandes de chaque référence, au format CSR :
+        les commandes de ref sont commandes_triees[debuts[ref]: debuts[ref + 1]].
+        """
+        ordre = np.argsort(self.refs, kind="stable")
+        debuts = np.searchsorted(self.refs[ordre], np.arange(self.refs.max(initial=-1) + 2))
+        return debuts, self.numeros[ordre]
+
+    def commandes_de(self, refs):
+        """Numéros (triés) des commandes qui contiennent au moins une des références."""
+        (debuts, commandes_triees) = self.index
+        refs = np.asarray(refs)
+        refs = refs[refs < len(debuts) - 1]
+        return np.unique(np.concatenate([commandes_triees[debuts[ref]: debuts[ref + 1]] for ref in refs] + [[]])
+                         ).astype(np.int64)
+
+    def lignes(self, numeros):
+        """Références et numéros de commande des lignes des commandes "numeros" (triés)."""
+        debuts = np.searchsorted(self.numeros, numeros)
+        longueurs = np.searchsorted(self.numeros, numeros, side="right") - debuts
+        # Concaténation des intervalles [debut, debut + longueur[ sans boucle
+        indices = np.repeat(debuts - np.cumsum(longueurs) + longueurs, longueurs) + np.arange(longueurs.sum())
+        return self.refs[indices], self.numeros[indices]
+
+
+def temps_tournees(places, refs, numeros, longueur_rangees, nb_rangees):
+    """
+    Calcule le temps de la tournée S-shape de chaque commande.
+
+    Paramètres:
+        places (array d'entiers de taille nb_ref) : places[ref] = place 1D de ref (cf places_references).
+
+        refs (array d'entiers) : la référence de chaque ligne.
+
+        numeros (array d'entiers) : le numéro de commande de chaque ligne.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+    Return:
+        commandes (array d'entiers) : les numéros de commande distincts, triés.
+
+        temps (array de taille nb_commandes) : le temps de la tournée de chacune.
+
+    >>> places = places_references(np.array([[3, 1, 4], [0, 2, 5]]))
+    >>> temps_tournees(places, np.array([0, 1, 0, 2, 5]), np.array([0, 0, 1, 1, 1]), 2, 3)
+    (array([0, 1]), array([12., 16.]))
+    """
+    (rangee, allee, ecart, profondeur) = geometrie_places(longueur_rangees, nb_rangees, places[refs])
+
+    # -- Profondeur maximale de chaque rangée de chaque commande -- #
+    cles = numeros * nb_rangees + rangee
+    ordre = np.argsort(cles, kind="stable")
+    cles = cles[ordre]
+    debuts_groupes = np.flatnonzero(np.concatenate(([True], cles[1:] != cles[:-1])))
+    profondeur = np.maximum.reduceat(profondeur[ordre], debuts_groupes)
+    (commande_groupes, allee, ecart) = (numeros[ordre][debuts_groupes], allee[ordre][debuts_groupes],
+                                        ecart[ordre][debuts_groupes])
+
+    # -- Réduction par commande : les rangées de chaque commande sont triées de gauche à droite -- #
+    debuts = np.flatnonzero(np.concatenate(([True], commande_groupes[1:] != commande_groupes[:-1])))
+    fins = np.concatenate((debuts[1:], [len(commande_groupes)])) - 1
+    nb_rangees_commande = fins - debuts + 1
+    horizontal = ecart[debuts] + (allee[fins] - allee[debuts]) + ecart[fins]
+
+    retour = 2 * np.add.reduceat(profondeur, debuts)
+    # On passe par l'avant devant les rangées de rang pair (0, 2, ...) : c'est là qu'on peut rebrousser chemin
+    rang = np.arange(len(commande_groupes)) - np.repeat(debuts, nb_rangees_commande)
+    rebrousse = np.minimum.reduceat(np.where(rang % 2 == 0, profondeur, np.inf), debuts)
+    impair = nb_rangees_commande % 2 == 1
+    sshape = (nb_rangees_commande - impair) * (longueur_rangees + 1) + np.where(impair, 2 * rebrousse, 0)
+
+    return commande_groupes[debuts], 2. + horizontal + np.minimum(sshape, retour)
+
+
+def evalue_commandes(positionnement, commandes):
+    """
+    Evalue le temps moyen d'une tournée, pondéré par le poids des commandes.
+
+    Parametres:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): la position des références.
+
+        commandes (Commandes): les commandes et leurs poids.
+
+    Return:
+        esperance (Réel): le temps moyen d'une tournée.
+
+    Avec les paires de références pondérées par proba, on retrouve evalue_position :
+
+    >>> from evaluation import evalue_position, evalue_entrepot
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> (refs1, refs2) = np.triu_indices(4, 1)
+    >>> paires = Commandes(np.stack((refs1, refs2), axis=1).tolist(), proba[refs1, refs2])
+    >>> positionnement = np.array([[1, 3], [0, 2]])
+    >>> round(evalue_commandes(positionnement, paires) * paires.poids.sum(), 10)
+    9.6
+    >>> round(evalue_position(positionnement, evalue_entrepot(2, 2), proba), 10)
+    9.6
+    """
+    (longueur_rangees, nb_rangees) = np.shape(positionnement)
+    (numeros, temps) = temps_tournees(places_references(positionnement), commandes.refs, commandes.numeros,
+                                      longueur_rangees, nb_rangees)
+    return float(commandes.poids[numeros] @ temps / commandes.poids.sum())
+
+
+def delta_echange_commandes(places, ref1, ref2, commandes, longueur_rangees, nb_rangees):
+    """
+    Calcule la variation du temps total (pondéré) lorsque ref1 et ref2 échangent leurs places.
+    Seules les commandes qui contiennent ref1 ou ref2 sont réévaluées.
+
+    Return:
+        delta (Réel) : nouveau temps total - ancien temps total.
+
+    >>> commandes = Commandes([[0, 1], [2, 3], [0, 3]])
+    >>> places = places_references(np.array([[3, 1], [0, 2]]))
+    >>> delta_echange_commandes(places, 0, 2, commandes, 2, 2)
+    -2.0
+    """
+    numeros = commandes.commandes_de([ref1, ref2])
+    (refs, numeros_lignes) = commandes.lignes(numeros)
+    (_, avant) = temps_tournees(places, refs, numeros_lignes, longueur_rangees, nb_rangees)
+    echange = places.copy()
+    (echange[ref1], echange[ref2]) = (places[ref2], places[ref1])
+    (_, apres) = temps_tournees(echange, refs, numeros_lignes, longueur_rangees, nb_rangees)
+
+    return float(commandes.poids[numeros] @ (apres - avant))
+
+
+def descente_commandes(positions, commandes, temps_max=None, nb_essais_max=None):
+    """
+    Descente locale par échanges aléatoires de deux références, sur le temps moyen des commandes.
+    Chaque échange n'est évalué que sur les commandes qui contiennent l'une des deux références.
+
+    Parametres:
+        positions (Array de taille (longueur_rangees, nb_rangees)): le positionnement de départ.
+
+        commandes (Commandes): les commandes et leurs poids.
+
+        temps_max (Réel): temps de calcul maximal en secondes.
+
+        nb_essais_max (Entier): nombre d'échanges successifs sans amélioration avant de s'arrêter.
+            Par défaut, 2 * nb_ref.
+
+    Return:
+        pos_opt (Array de taille (longueur_rangees, nb_rangees)): la position des références dans l'entrepôt.
+    """
+    (longueur_rangees, nb_rangees) = np.shape(positions)
+    nb_ref = longueur_rangees * nb_rangees
+    if nb_essais_max is None:
+        nb_essais_max = 2 * nb_ref
+    places = places_references(positions)
+    debut = time()
+    nb_essais = 0
+
+    while nb_essais < nb_essais_max and (temps_max is None or time() - debut < temps_max):
+        (ref1, ref2) = (randrange(nb_ref), randrange(nb_ref))
+        if ref1 != ref2 and delta_echange_commandes(places, ref1, ref2, commandes, longueur_rangees,
+                                                    nb_rangees) < -1e-12:
+            (places[ref1], places[ref2]) = (places[ref2], places[ref1])
+            nb_essais = 0
+        else:
+            nb_essais += 1
+
+    pos_opt = np.zeros(nb_ref, dtype=np.asarray(positions).dtype)
+    pos_opt[places] = np.arange(nb_ref)
+    return pos_opt.reshape(longueur_rangees, nb_rangees)
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,239 @@
+"""
+Ce module permet de calculer un emplacement performant pour les très grands entrepôts.
+On décompose l'entrepôt en zones de rangées contiguës :
+    - les références sont regroupées selon leurs indices de Jacquard,
+    - les groupes les plus fréquents vont dans les zones les plus proches de l'entrée,
+    - chaque zone est optimisée indépendamment (et en parallèle) par une descente locale,
+    - une dernière passe d'échanges répare les frontières entre zones.
+"""
+
+from multiprocessing import Pool
+import numpy as np
+from abc_classique import from_historique_to_frequence
+from jaccard import indice_jacquard
+from descente_locale import descente
+from evaluation import places_references, proba_symetrique, delta_echanges, evalue_entrepot
+
+
+def zones_rangees(nb_rangees, nb_zones, temps_entrepot, longueur_rangees):
+    """
+    Découpe les rangées en zones contiguës, triées de la plus proche à la plus éloignée de l'entrée.
+
+    Paramètres:
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        nb_zones (Entier): le nombre de zones, au plus nb_rangees.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+    Return:
+        zones (liste de listes d'entiers) : zones[k] est la liste des rangées de la k-ième zone la plus proche.
+
+    >>> zones_rangees(6, 3, evalue_entrepot(2, 6), 2)
+    [[2, 3], [0, 1], [4, 5]]
+    """
+    nb_zones = min(nb_zones, nb_rangees)
+    zones = [list(zone) for zone in np.array_split(np.arange(nb_rangees), nb_zones)]
+
+    # La distance d'une rangée à l'entrée est lue sur la diagonale du S-shape
+    diagonale = np.diagonal(temps_entrepot).reshape(longueur_rangees, nb_rangees)
+    distance_rangees = diagonale.mean(axis=0)
+    distance_zones = [distance_rangees[zone].mean() for zone in zones]
+
+    return [[int(rangee) for rangee in zones[index]] for index in np.argsort(distance_zones, kind="stable")]
+
+
+def regroupe_references(jacquard, frequence, tailles):
+    """
+    Regroupe les références par affinité de commande.
+    Chaque groupe part de la référence restante la plus fréquente, puis on ajoute
+    la référence la plus corrélée (somme des indices de Jacquard) au groupe.
+
+    Paramètres:
+        jacquard (array de taille (nb_ref, nb_ref)) : matrice des indices de jacquard.
+
+        frequence (array de taille nb_ref) : fréquence de commande de chaque référence.
+
+        tailles (liste d'entiers) : taille de chaque groupe, de somme nb_ref.
+
+    Return:
+        groupes (liste de listes d'entiers) : les références de chaque groupe.
+
+    >>> J = np.array([[0, 0.5, 0, 0], [0.5, 0, 0, 0.1], [0, 0, 0, 0.9], [0, 0.1, 0.9, 0]])
+    >>> regroupe_references(J, np.array([0.1, 0.4, 0.3, 0.2]), [2, 2])
+    [[1, 0], [2, 3]]
+    """
+    nb_ref = len(frequence)
+    restant = np.ones(nb_ref, dtype=bool)
+    groupes = []
+
+    for taille in tailles:
+        groupe = []
+        affinite = np.zeros(nb_ref)
+        for _ in range(taille):
+            if len(groupe) > 0 and np.max(np.where(restant, affinite, -1)) > 0:
+                ref = int(np.argmax(np.where(restant, affinite, -1)))
+            else:
+                # Aucune référence corrélée : on prend la plus fréquente
+                ref = int(np.argmax(np.where(restant, frequence, -np.inf)))
+            groupe.append(ref)
+            restant[ref] = False
+            affinite += jacquard[ref]
+        groupes.append(groupe)
+
+    return groupes
+
+
+def places_zone(rangees, nb_rangees, longueur_rangees):
+    """
+    Donne les places 1D globales d'une zone, dans l'ordre des places locales [rangee_locale + casier * nb_rangees_zone].
+
+    >>> places_zone([2, 3], 4, 2)
+    array([2, 3, 6, 7])
+    """
+    rangees = np.asarray(rangees)
+    return (rangees[None, :] + nb_rangees * np.arange(longueur_rangees)[:, None]).ravel()
+
+
+def _optimise_zone(refs, frequence, proba_zone, temps_zone, longueur_rangees, nb_rangees_zone, temps_max):
+    """
+    Place les références d'une zone (les plus fréquentes près de l'entrée) puis lance la descente locale.
+    Les références sont renumérotées de 0 à len(refs) - 1.
+    """
+    nb_ref_zone = len(refs)
+    positionnement = np.zeros(nb_ref_zone)
+    ordre_places = np.argsort(np.diagonal(temps_zone), kind="stable")
+    positionnement[ordre_places] = np.argsort(-frequence, kind="stable")
+    positionnement = positionnement.reshape(longueur_rangees, nb_rangees_zone)
+
+    if nb_ref_zone > 1:
+        positionnement = descente(positionnement, proba_zone, temps_zone, temps_max)
+
+    return positionnement
+
+
+def repare_frontieres(positionnement, proba, temps_entrepot, zones, largeur=1, nb_passes=3):
+    """
+    Améliore le positionnement par des échanges de références de part et d'autre des frontières
+    entre zones voisines. On applique tous les échanges améliorants (meilleur échange de chaque référence).
+
+    Paramètres:
+        positionnement (array de taille (longueur_rangees, nb_rangees)) : le positionnement assemblé.
+
+        proba (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        zones (liste de listes d'entiers) : les rangées de chaque zone.
+
+        largeur (Entier) : nombre de rangées prises de chaque côté d'une frontière.
+
+        nb_passes (Entier) : nombre maximal de passes.
+
+    Return:
+        positionnement (array de taille (longueur_rangees, nb_rangees)) : le positionnement réparé.
+    """
+    positionnement = positionnement.copy()
+    proba_sym = proba_symetrique(proba)
+    rangees_triees = sorted(zones, key=min)
+
+    for _ in range(nb_passes):
+        amelioration = False
+        for (zone_gauche, zone_droite) in zip(rangees_triees[:-1], rangees_triees[1:]):
+            gauche = sorted(zone_gauche)[-largeur:]
+            droite = sorted(zone_droite)[:largeur]
+            for ref in positionnement[:, gauche].ravel().astype(int):
+                candidats = positionnement[:, droite].ravel().astype(int)
+                places = places_references(positionnement)
+                deltas = delta_echanges(places, ref, candidats, temps_entrepot, proba_sym)
+                meilleur = np.argmin(deltas)
+                if deltas[meilleur] < -1e-12:
+                    autre = candidats[meilleur]
+                    casier_ref, rangee_ref = np.argwhere(positionnement == ref)[0]
+                    casier_autre, rangee_autre = np.argwhere(positionnement == autre)[0]
+                    positionnement[casier_ref, rangee_ref] = autre
+                    positionnement[casier_autre, rangee_autre] = ref
+                    amelioration = True
+        if not amelioration:
+            break
+
+    return positionnement
+
+
+def decomposition(historique, nb_rangees, longueur_rangees, temps_entrepot, nb_zones, temps_max=None,
+                  nb_processus=1, instance=None):
+    """
+    Calcule un positionnement en optimisant séparément des zones de l'entrepôt.
+
+    Paramètres:
+        historique (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        nb_zones (Entier): le nombre de zones.
+
+        temps_max (Réel): temps maximal de la descente locale dans chaque zone, en secondes.
+
+        nb_processus (Entier): nombre de zones optimisées en parallèle.
+
+        instance (Instance): si elle est donnée, on réutilise ses fréquences et ses indices de Jacquard.
+
+    Return:
+        positionnement (array de taille (longueur_rangees, nb_rangees)) : la position des références dans l'entrepôt.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> positionnement = decomposition(proba, 2, 2, evalue_entrepot(2, 2), 2)
+    >>> sorted(positionnement.ravel())
+    [0.0, 1.0, 2.0, 3.0]
+    """
+    if instance is not None:
+        (frequence, J) = (instance.frequence, instance.jaccard)
+    else:
+        frequence = from_historique_to_frequence(historique)
+        J = indice_jacquard(historique)
+    zones = zones_rangees(nb_rangees, nb_zones, temps_entrepot, longueur_rangees)
+    groupes = regroupe_references(J, frequence, [len(zone) * longueur_rangees for zone in zones])
+
+    # -- Sous-problèmes -- #
+    sous_problemes = []
+    for (zone, refs) in zip(zones, groupes):
+        refs = np.array(refs)
+        places = places_zone(zone, nb_rangees, longueur_rangees)
+        sous_problemes.append((refs, frequence[refs], historique[np.ix_(refs, refs)],
+                               temps_entrepot[np.ix_(places, places)], longueur_rangees, len(zone), temps_max))
+
+    if nb_processus > 1:
+        with Pool(nb_processus) as pool:
+            solutions = pool.starmap(_optimise_zone, sous_problemes)
+    else:
+        solutions = [_optimise_zone(*sous_probleme) for sous_probleme in sous_problemes]
+
+    # -- Assemblage -- #
+    positionnement = -1 * np.ones((longueur_rangees, nb_rangees))
+    for (zone, refs, solution) in zip(zones, groupes, solutions):
+        positionnement[:, zone] = np.array(refs)[solution.astype(int)]
+
+    return repare_frontieres(positionnement, historique, temps_entrepot, zones)
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from generateur import matrice_proba
+    from evaluation import evalue_position
+
+    LONGUEUR_RANGEES = 30
+    NB_RANGEES = 36
+    PROBA = matrice_proba(LONGUEUR_RANGEES * NB_RANGEES)
+    TEMPS_ENTREPOT = evalue_entrepot(LONGUEUR_RANGEES, NB_RANGEES)
+    POSITIONNEMENT = decomposition(PROBA, NB_RANGEES, LONGUEUR_RANGEES, TEMPS_ENTREPOT, 6, temps_max=10,
+                                   nb_processus=6)
+    print(evalue_position(POSITIONNEMENT, TEMPS_ENTREPOT, PROBA))
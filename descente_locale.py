@@ -3,11 +3,18 @@ Ce module permet de calculer un emplacement performant de l'entrepôt.
 Nous utilisons ici une descente locale.
 """
 from random import randint
-from evaluation import evalue_position, evalue_entrepot
-from alea import alea
-from generateur import extraction_commande
+from time import time
+from evaluation import evalue_position, evalue_entrepot, places_references, proba_symetrique, evalue_scenarios
+from evenements import Evenement
 import numpy as np
 
+# Place fictive où l'on pose une référence le temps de libérer sa nouvelle place
+TAMPON = -1
+# Nom des voisinages de descente, dans l'ordre de leur numéro
+VOISINAGES = ("rangees", "elements", "cycle_rangees", "cycle_elements")
+# Nombre d'évaluations entre deux points de contrôle envoyés au rappel de descente
+PERIODE_POINTS_CONTROLE = 1000
+
 
 def applique_cycle_rangees(positions, cycle, sens):
     """
@@ -30,6 +37,9 @@ def applique_cycle_rangees(positions, cycle, sens):
     >>> applique_cycle_rangees(position, permutation, False)
     array([[6, 0, 4, 1],
            [7, 3, 5, 2]])
+    >>> applique_cycle_rangees(position, [1, 2, 3], False)
+    array([[0, 6, 1, 4],
+           [3, 7, 2, 5]])
     """
     longeur_rangees = len(positions)
     cycle_longueur = len(cycle)
@@ -46,7 +56,7 @@ def applique_cycle_rangees(positions, cycle, sens):
             memoire = positions_essai[profondeur, cycle[-1]]
             for index_rangee in range(cycle_longueur - 1, 0, -1):
                 positions_essai[profondeur, cycle[index_rangee]] = positions_essai[profondeur, cycle[index_rangee - 1]]
-            positions_essai[profondeur, 0] = memoire
+            positions_essai[profondeur, cycle[0]] = memoire
 
     return positions_essai
     
@@ -180,7 +190,7 @@ def cycle_elements(longueur_cycle, positions, sens):
     return applique_cycle_elements(positions, cycle, sens)
 
 
-def verif_minimum_local(positions, proba, temps_entrepot):
+def verif_minimum_local(positions, proba, temps_entrepot, fonction_cout=None, mesures=None):
     """
     Permet de vérifier si positions est un minimum local de la fonction evalue_position.
     On ne vérifie que les permutations de deux éléments ou deux rangées
@@ -189,19 +199,26 @@ def verif_minimum_local(positions, proba, temps_entrepot):
         positions:
         proba:
         temps_entrepot:
+        fonction_cout: si elle est donnée, fonction_cout(positions) remplace evalue_position.
+        mesures (instrumentation.Mesures): si il est donné, compte les évaluations de la vérification.
 
     Returns:
         minimum_local (Booléen): True si positions est un minimum local
             et False sinon
     """
-    valeur_opt = evalue_position(positions, temps_entrepot, proba)
+    if fonction_cout is None:
+        def fonction_cout(essai):
+            return evalue_position(essai, temps_entrepot, proba)
+    if mesures is not None:
+        fonction_cout = mesures.compte_appels(fonction_cout, "evaluations_verification")
+    valeur_opt = fonction_cout(positions)
     longueur_rangees = len(positions)
     nb_rangees = len(positions[0])
 
     for rangee1 in range(nb_rangees - 1):
         for rangee2 in range(rangee1 + 1, nb_rangees):
             essai_rangee = applique_cycle_rangees(positions, [rangee1, rangee2], True)
-            valeur_rangee = evalue_position(essai_rangee, temps_entrepot, proba)
+            valeur_rangee = fonction_cout(essai_rangee)
             if valeur_rangee < valeur_opt:
                 return False
 
@@ -213,13 +230,14 @@ def verif_minimum_local(positions, proba, temps_entrepot):
                     element2 = [profondeur2, rangee2]
                     if element1 != element2:
                         essai_element = applique_cycle_elements(positions, [element1, element2], True)
-                        valeur_element = evalue_position(essai_element, temps_entrepot, proba)
+                        valeur_element = fonction_cout(essai_element)
                         if valeur_element < valeur_opt:
                             return False
     return True
 
 
-def descente(positions, proba, temps_entrepot):
+def descente(positions, proba=None, temps_entrepot=None, temps_max=None, instance=None, fonction_cout=None,
+             mesures=None, rappel=None):
     """
     Permet de trouver le minimum local de la fonction evalue.
     Prend comme point de départ le positionnement obtenu avec
@@ -233,63 +251,295 @@ def descente(positions, proba, temps_entrepot):
 
         praba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
 
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places,
+            ou routage.TempsImplicite pour les très grands entrepôts (cf evalue_entrepot).
+
+        temps_max (Réel): temps de calcul maximal en secondes. Par défaut, la descente
+            s'arrête seulement sur un minimum local.
+
+        instance (Instance): si elle est donnée, proba et temps_entrepot sont lus dans l'instance.
+
+        fonction_cout (Fonction): fonction_cout(positions) donne la valeur à minimiser.
+            Par défaut, c'est evalue_position(positions, temps_entrepot, proba).
+
+        mesures (instrumentation.Mesures): si il est donné, reçoit la durée des phases (voisin, evaluation,
+            verification), le nombre d'évaluations, de mouvements acceptés et rejetés par voisinage
+            et de redémarrages.
+
+        rappel (Fonction): si il est donné, rappel(evenement) reçoit les améliorations, les redémarrages,
+            un point de contrôle toutes les PERIODE_POINTS_CONTROLE évaluations et la fin (cf evenements).
+            S'il renvoie True, la descente s'arrête.
+
     Return:
         pos_opt (Array de taille (longueur_rangees, nb_rangees): la position
         des références dans l'entrepôt optimale.
     """
+    if instance is not None:
+        (proba, temps_entrepot) = (instance.proba, instance.temps_entrepot)
+    if fonction_cout is None:
+        def fonction_cout(essai):
+            return evalue_position(essai, temps_entrepot, proba)
+
     # Initialisation des variables
     pos_opt = positions.copy()
-    minimum = evalue_position(positions, temps_entrepot, proba)
+    minimum = fonction_cout(positions)
     nb_rangees = len(positions[0])
     longueur_rangee = len(positions)
     nb_ref = nb_rangees * longueur_rangee
-    nb_essaie = 0
-
-    while nb_essaie < nb_ref * nb_ref * 2:
-        # On modifie le positionnement en selectionnant au hasard le voisinnage
-        if nb_rangees > 3:  # On peut effectuer des cycles de rangées
-            if nb_ref > 3:  # On peut effectuer des cycles d'éléments
-                voisinnage = randint(0, 3)
-            else:
-                voisinnage = randint(0, 2)
-        else:  # On ne peut pas effectuer des cycles de rangées
-            if nb_ref > 3:  # On peut effectuer des cycles d'éléments
-                voisinnage = randint(0, 2)
-                if voisinnage == 2:
-                    voisinnage = 3
-            else:
-                voisinnage = randint(0, 1)
-        if nb_rangees == 1:
-            voisinnage = 1
-
-        if voisinnage == 0:  # Permutation de rangées
-            essai_position = cycle_rangees(2, positions, True)
-        elif voisinnage == 1:  # Permutation d'éléments
-            essai_position = cycle_elements(2, positions, True)
-        elif voisinnage == 2:  # Cycle de rangées
-            longueur_cycle = randint(3, nb_rangees)
-            sens = randint(0, 1)
-            essai_position = cycle_rangees(longueur_cycle, positions, sens)
-        else:  # Cycle d'éléments
-            longueur_cycle = randint(3, nb_ref)
-            sens = randint(0, 1)
-            essai_position = cycle_elements(longueur_cycle, positions, sens)
-
-        # On regarde si le nouveau positionnement fait mieux
-        valeur = evalue_position(essai_position, temps_entrepot, proba)
-        if valeur < minimum:
+    nb_evaluations = 1
+    debut = time()
+    if mesures is not None:
+        mesures.demarre()
+
+    def signale(nature):
+        # Renvoie True si le rappel demande l'arrêt
+        return rappel is not None and rappel(Evenement(nature, minimum, time() - debut, nb_evaluations,
+                                                       pos_opt)) is True
+
+    # On redémarre depuis le meilleur positionnement tant que ce n'est pas un minimum local
+    # "fin" est signalé quelle que soit la raison de l'arrêt (échéance, minimum local ou demande du rappel)
+    try:
+        while True:
             nb_essaie = 0
-            minimum = valeur
-            pos_opt = essai_position
-            print("La nouvelle valeur de notre positionnement est {}".format(minimum))
-        else:
-            nb_essaie += 1
-
-    if verif_minimum_local(pos_opt, proba, temps_entrepot):
-        return pos_opt
-    else:
-        print("Le minimum local n'est pas pos_opt...")
-        return descente(pos_opt, proba, temps_entrepot)
+            while nb_essaie < nb_ref * nb_ref * 2:
+                if temps_max is not None and time() - debut > temps_max:
+                    return pos_opt
+
+                # On modifie le positionnement en selectionnant au hasard le voisinnage
+                if nb_rangees > 3:  # On peut effectuer des cycles de rangées
+                    if nb_ref > 3:  # On peut effectuer des cycles d'éléments
+                        voisinnage = randint(0, 3)
+                    else:
+                        voisinnage = randint(0, 2)
+                else:  # On ne peut pas effectuer des cycles de rangées
+                    if nb_ref > 3:  # On peut effectuer des cycles d'éléments
+                        voisinnage = randint(0, 2)
+                        if voisinnage == 2:
+                            voisinnage = 3
+                    else:
+                        voisinnage = randint(0, 1)
+                if nb_rangees == 1:
+                    voisinnage = 1
+
+                if voisinnage == 0:  # Permutation de rangées
+                    essai_position = cycle_rangees(2, positions, True)
+                elif voisinnage == 1:  # Permutation d'éléments
+                    essai_position = cycle_elements(2, positions, True)
+                elif voisinnage == 2:  # Cycle de rangées
+                    longueur_cycle = randint(3, nb_rangees)
+                    sens = randint(0, 1)
+                    essai_position = cycle_rangees(longueur_cycle, positions, sens)
+                else:  # Cycle d'éléments
+                    longueur_cycle = randint(3, nb_ref)
+                    sens = randint(0, 1)
+                    essai_position = cycle_elements(longueur_cycle, positions, sens)
+
+                if mesures is not None:
+                    mesures.etape("voisin")
+
+                # On regarde si le nouveau positionnement fait mieux
+                valeur = fonction_cout(essai_position)
+                nb_evaluations += 1
+                if mesures is not None:
+                    mesures.etape("evaluation")
+                    mesures.compte("evaluations")
+                    mesures.compte(("acceptes_" if valeur < minimum else "rejetes_") + VOISINAGES[voisinnage])
+                if valeur < minimum:
+                    nb_essaie = 0
+                    minimum = valeur
+                    pos_opt = essai_position
+                    if signale("amelioration"):
+                        return pos_opt
+                else:
+                    nb_essaie += 1
+                if nb_evaluations % PERIODE_POINTS_CONTROLE == 0 and signale("point_controle"):
+                    return pos_opt
+
+            minimum_local = verif_minimum_local(pos_opt, proba, temps_entrepot, fonction_cout, mesures)
+            if mesures is not None:
+                mesures.etape("verification")
+            if minimum_local:
+                return pos_opt
+
+            # Le minimum local n'est pas pos_opt : on repart de lui
+            if mesures is not None:
+                mesures.compte("redemarrages")
+            if signale("redemarrage"):
+                return pos_opt
+            positions = pos_opt
+    finally:
+        signale("fin")
+
+
+def descente_scenarios(positions, probas, temps_entrepot, poids=None, critere="moyenne", temps_max=None):
+    """
+    Descente locale sur un objectif agrégé de plusieurs scénarios de demande.
+
+    Parametres:
+        positions (Array de taille (longueur_rangees, nb_rangees)): le positionnement de départ.
+
+        probas (Array de taille (nb_scenarios, nb_ref, nb_ref)): la matrice des probabilités de chaque scénario.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        poids (Array de taille nb_scenarios): poids de chaque scénario dans la moyenne.
+
+        critere (Chaîne de caractères): "moyenne" (moyenne pondérée) ou "pire" (pire scénario).
+
+        temps_max (Réel): temps de calcul maximal en secondes.
+
+    Return:
+        pos_opt (Array de taille (longueur_rangees, nb_rangees)): la position des références dans l'entrepôt.
+    """
+    probas = np.asarray(probas, dtype=float)
+    if poids is None:
+        poids = np.ones(len(probas))
+    poids = np.asarray(poids, dtype=float)
+
+    if critere == "moyenne":
+        # Le temps moyen est linéaire en proba : la moyenne des scénarios est celle d'une seule matrice
+        proba_moyenne = np.tensordot(poids / poids.sum(), probas, axes=1)
+        return descente(positions, proba_moyenne, temps_entrepot, temps_max)
+    if critere != "pire":
+        raise ValueError("Critère inconnu : {}".format(critere))
+
+    def pire_scenario(essai):
+        return evalue_scenarios(essai, temps_entrepot, probas, poids)[2]
+
+    return descente(positions, None, temps_entrepot, temps_max, fonction_cout=pire_scenario)
+
+
+def plan_deplacements(origine, positions):
+    """
+    Calcule l'ordre des déplacements physiques pour passer d'un positionnement à un autre.
+    Chaque cycle de références est vidé par la place tampon : on y pose la première référence,
+    chaque référence suivante prend la place libérée, puis la première quitte le tampon.
+
+    Parametres:
+        origine (Array de taille (longueur_rangees, nb_rangees)): le positionnement actuel.
+
+        positions (Array de taille (longueur_rangees, nb_rangees)): le positionnement visé.
+
+    Return:
+        plan (liste de triplets d'entiers) : (référence, place de départ, place d'arrivée) dans l'ordre,
+            les places étant codées en 1D [rangee + casier * nb_rangees] et TAMPON désignant la place tampon.
+
+    >>> plan_deplacements(np.array([[0, 1, 2], [3, 4, 5]]), np.array([[1, 2, 0], [3, 4, 5]]))
+    [(0, 0, -1), (1, 1, 0), (2, 2, 1), (0, -1, 2)]
+    """
+    places_origine = places_references(origine)
+    places_finales = places_references(positions)
+    # arrivee[place] = référence qui doit occuper la place à la fin
+    arrivee = np.argsort(places_finales)
+    plan = []
+    traitee = places_origine == places_finales
+
+    for ref in np.flatnonzero(~traitee):
+        if traitee[ref]:
+            continue
+        # On remonte le cycle : la place de ref est prise par la référence qui doit y aller
+        plan.append((int(ref), int(places_origine[ref]), TAMPON))
+        place_libre = places_origine[ref]
+        suivante = arrivee[place_libre]
+        while suivante != ref:
+            plan.append((int(suivante), int(places_origine[suivante]), int(place_libre)))
+            traitee[suivante] = True
+            place_libre = places_origine[suivante]
+            suivante = arrivee[place_libre]
+        plan.append((int(ref), TAMPON, int(place_libre)))
+        traitee[ref] = True
+
+    return plan
+
+
+def repositionnement(positions, budget, proba=None, temps_entrepot=None, temps_max=None, instance=None):
+    """
+    Réoptimise un positionnement existant en déplaçant au plus "budget" références.
+    On part du positionnement actuel et on applique à chaque itération le meilleur échange
+    de deux références qui respecte le budget, jusqu'à ce qu'aucun échange n'améliore.
+    -------
+    On garde la matrice cout[r, p] = sum_k proba_sym[r, k] * temps[p, place_k], coût de r en place p :
+    la variation de chaque échange s'en déduit en O(1), et un échange ne la modifie
+    que d'une matrice de rang 1. Une itération coûte O(nb_ref²).
+
+    Parametres:
+        positions (Array de taille (longueur_rangees, nb_rangees)): le positionnement actuel.
+
+        budget (Entier): nombre maximal de références qui changent de place.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes (la demande actuelle).
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        temps_max (Réel): temps de calcul maximal en secondes.
+
+        instance (Instance): si elle est donnée, proba et temps_entrepot sont lus dans l'instance.
+
+    Return:
+        pos_opt (Array de taille (longueur_rangees, nb_rangees)): le nouveau positionnement.
+
+        plan (liste de triplets d'entiers) : les déplacements à effectuer, dans l'ordre (cf plan_deplacements).
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> temps = evalue_entrepot(2, 2)
+    >>> positions = np.array([[3, 1], [0, 2]])
+    >>> (pos_opt, plan) = repositionnement(positions, 2, proba, temps)
+    >>> pos_opt
+    array([[2, 1],
+           [0, 3]])
+    >>> plan
+    [(2, 3, -1), (3, 0, 3), (2, -1, 0)]
+    >>> round(evalue_position(positions, temps, proba), 10), round(evalue_position(pos_opt, temps, proba), 10)
+    (11.0, 9.4)
+    """
+    if instance is not None:
+        (proba, temps_entrepot) = (instance.proba, instance.temps_entrepot)
+    debut = time()
+
+    origine = np.asarray(positions)
+    places_origine = places_references(origine)
+    places = places_origine.copy()
+    proba_sym = proba_symetrique(np.asarray(proba, dtype=float))
+    temps_entrepot = np.asarray(temps_entrepot, dtype=float)
+    nb_ref = len(places)
+    refs = np.arange(nb_ref)
+
+    cout = proba_sym @ temps_entrepot[places]
+    temps_places = temps_entrepot[places[:, None], places[None, :]]
+
+    while temps_max is None or time() - debut < temps_max:
+        # delta[a, b] : variation du temps moyen si a et b échangent leurs places
+        cout_places = cout[:, places]
+        actuel = cout_places[refs, refs]
+        diagonale = np.diagonal(temps_places)
+        delta = cout_places - actuel[:, None]
+        delta += delta.T
+        delta -= proba_sym * (diagonale[:, None] + diagonale[None, :] - 2 * temps_places)
+
+        # Nombre de références déplacées après l'échange
+        deplacee = places != places_origine
+        deplacees_apres = (places[None, :] != places_origine[:, None]).astype(int)
+        deplacees_apres += deplacees_apres.T
+        deplacees_apres += np.count_nonzero(deplacee) - deplacee[:, None] - deplacee[None, :]
+        delta[deplacees_apres > budget] = np.inf
+        np.fill_diagonal(delta, np.inf)
+
+        (ref_a, ref_b) = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[ref_a, ref_b] >= -1e-12:
+            break
+
+        # Mise à jour de rang 1 des coûts, puis échange
+        (place_a, place_b) = (places[ref_a], places[ref_b])
+        cout += np.outer(proba_sym[:, ref_a] - proba_sym[:, ref_b], temps_entrepot[place_b] - temps_entrepot[place_a])
+        (places[ref_a], places[ref_b]) = (place_b, place_a)
+        temps_places[[ref_a, ref_b]] = temps_places[[ref_b, ref_a]]
+        temps_places[:, [ref_a, ref_b]] = temps_places[:, [ref_b, ref_a]]
+
+    pos_opt = np.zeros(nb_ref, dtype=origine.dtype)
+    pos_opt[places] = refs
+    pos_opt = pos_opt.reshape(origine.shape)
+
+    return pos_opt, plan_deplacements(origine, pos_opt)
 
 
 if __name__ == "__main__":
@@ -297,6 +547,9 @@ if __name__ == "__main__":
     import doctest
     doctest.testmod()
 
+    from alea import alea
+    from generateur import extraction_commande
+
     # Paramètre pour charger les probabilités des commandes
     PATH_COMMANDE = "test"
     PROBA = extraction_commande(PATH_COMMANDE)[0]
@@ -316,7 +569,8 @@ if __name__ == "__main__":
     print(POSITIONS)
 
     # Calcul de la position optimale
-    POSITIONS_OPT = descente(POSITIONS, PROBA, TEMPS_ENTREPOT)
+    from evenements import AffichageConsole
+    POSITIONS_OPT = descente(POSITIONS, PROBA, TEMPS_ENTREPOT, rappel=AffichageConsole())
     print("La solution trouvée est :")
     print(POSITIONS_OPT)
     VAL_NOTRE_ALGO = evalue_position(POSITIONS_OPT, TEMPS_ENTREPOT, PROBA)
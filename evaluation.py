@@ -14,10 +14,9 @@ historique est une matrice 2D de taille : nb_ref * nb_ref donnant les probas de
     couple de références d'être commandée.
 """
 
-from pathlib import Path
 import numpy as np
-from alea import alea
-from generateur import extraction_commande
+from routage import table_temps, table_temps_triangulaire, TempsImplicite
+from triangulaire import MatriceTriangulaire, couples_non_nuls
 
 
 def sshape(longueur_rangees, nb_rangees, position1, position2):
@@ -75,7 +74,7 @@ def sshape(longueur_rangees, nb_rangees, position1, position2):
     return min(temps1, temps2)
 
 
-def evalue_entrepot(longueur_rangees, nb_rangees):
+def evalue_entrepot(longueur_rangees, nb_rangees, politique="sshape", triangulaire=False, implicite=False):
     """
     Evalue le temps de récupération pour chaque paire de positions.
 
@@ -84,27 +83,56 @@ def evalue_entrepot(longueur_rangees, nb_rangees):
 
         nb_rangees (Entier): le nombre de rangées dans l'entrepôt
 
+        politique (Chaîne de caractères): la politique de routage du robot (cf routage.POLITIQUES).
+
+        triangulaire (Booléen): si True, le tableau est une triangulaire.MatriceTriangulaire (deux fois moins de mémoire).
+
+        implicite (Booléen): si True, les temps sont calculés à la demande (cf routage.TempsImplicite),
+            avec une mémoire en O(nb_ref).
+
     Return:
         temps (Array de taille (nb_ref, nb_ref)): temps[i, j] du temps que le robot met à chercher 2 objets en positiosn i et j dans l'entrepôt (attention, les positions sont codées en 1D): [rangee, casier] = [rangee + casier*nb_rangees])
+            Le tableau est en lecture seule (cf routage.table_temps) : il faut le copier pour le modifier.
 
     >>> [list(evalue_entrepot(1, 4)[i]) for i in range(4)]
     [[8.0, 10.0, 14.0, 18.0], [10.0, 4.0, 10.0, 14.0], [14.0, 10.0, 8.0, 14.0], [18.0, 14.0, 14.0, 12.0]]
     >>> [list(evalue_entrepot(2, 2)[i]) for i in range(4)]
     [[6.0, 12.0, 6.0, 12.0], [12.0, 10.0, 12.0, 10.0], [6.0, 12.0, 4.0, 10.0], [12.0, 10.0, 10.0, 8.0]]
+    >>> bool(np.all(evalue_entrepot(3, 4, "point_milieu") >= evalue_entrepot(3, 4)))
+    True
+    >>> evalue_entrepot(2, 2, triangulaire=True)[1, 3], evalue_entrepot(2, 2, implicite=True)[1, 3]
+    (10.0, 10.0)
     """
-    nb_places = longueur_rangees*nb_rangees
-    temps = np.zeros((nb_places, nb_places))
-    for rangee1 in range(nb_rangees):
-        for casier1 in range(longueur_rangees):
-            for rangee2 in range(nb_rangees):
-                for casier2 in range(longueur_rangees):
-                    position1 = [rangee1, casier1]
-                    position2 = [rangee2, casier2]
-                    place1 = rangee1 + casier1 * nb_rangees
-                    place2 = rangee2 + casier2 * nb_rangees
-                    temps[place1, place2] = sshape(longueur_rangees, nb_rangees, position1, position2)
+    if implicite:
+        return TempsImplicite(politique, longueur_rangees, nb_rangees)
+    # Le tableau est partagé avec routage (en lecture seule) : on ne le copie pas
+    if triangulaire:
+        return table_temps_triangulaire(politique, int(longueur_rangees), int(nb_rangees))
+    return table_temps(politique, int(longueur_rangees), int(nb_rangees))
+
+
+def distance_entree(longueur_rangees, nb_rangees):
+    """
+    Calcule la diagonale du S-shape (aller-retour de l'entrée à chaque place) sans construire
+    la matrice complète des temps.
+
+    Parametres:
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
 
-    return temps
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt
+
+    Return:
+        distance (Array de taille nb_ref): distance[place] = temps[place, place] de evalue_entrepot.
+
+    >>> distance_entree(2, 2)
+    array([ 6., 10.,  4.,  8.])
+    """
+    largeur_entrepot = nb_rangees * 2 + 1
+    entree = largeur_entrepot // 2 + 1
+    casier = np.repeat(np.arange(longueur_rangees), nb_rangees)
+    allee_rangee = 3 + 2 * np.tile(np.arange(nb_rangees), longueur_rangees)
+
+    return 2. * (1 + np.abs(allee_rangee - entree) + (longueur_rangees - casier))
 
 
 def inverse_positionnement(positionnement):
@@ -135,6 +163,28 @@ def inverse_positionnement(positionnement):
     return entrepot
 
 
+def places_references(positionnement):
+    """
+    Donne la place 1D de chaque référence, sans boucle Python.
+
+    Parametres:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): positionnement[i, j] renvoie la référence
+        placée au casier i de la rangée j
+
+    Return:
+        places (array d'entiers de taille nb_ref) : places[refi] = rangee + casier * nb_rangees
+
+    >>> places_references(np.array([[3, 1], [0, 2]]))
+    array([2, 1, 3, 0])
+    """
+    refs = np.asarray(positionnement).astype(int).ravel()
+    places = np.empty(len(refs), dtype=int)
+    # La mise à plat ligne par ligne donne directement la place [rangee + casier * nb_rangees]
+    places[refs] = np.arange(len(refs))
+
+    return places
+
+
 def evalue_position(positionnement, temps_entrepot, proba):
     """
     Evalue le temps moyen d'un positionnement.
@@ -149,33 +199,247 @@ def evalue_position(positionnement, temps_entrepot, proba):
 
         proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
 
+        Les deux matrices peuvent être des triangulaire.MatriceTriangulaire, et temps_entrepot
+        un routage.TempsImplicite.
+
     Return:
         esperance (entier): le temps moyen mis pour collecter une commande
 
     >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
-    >>> evalue_position(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2), proba)
-    9.600000000000001
+    >>> round(evalue_position(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2), proba), 10)
+    9.6
+    >>> round(evalue_position(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2, triangulaire=True),
+    ...                       MatriceTriangulaire.depuis_matrice(proba)), 10)
+    9.6
+    >>> round(evalue_position(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2, implicite=True), proba), 10)
+    9.6
     """
-    nb_rangees = len(positionnement[0])
-    longueur_rangees = len(positionnement)
-    nb_ref = nb_rangees * longueur_rangees
-    position_ref = inverse_positionnement(positionnement)
+    places = places_references(positionnement)
+    if isinstance(proba, MatriceTriangulaire) or not isinstance(temps_entrepot, np.ndarray):
+        # On ne lit que les temps des couples ref1 < ref2 commandés ensemble, sans matrice de taille nb_ref * nb_ref
+        (refs1, refs2, proba_couples) = couples_non_nuls(proba)
+        return float(proba_couples @ temps_entrepot[places[refs1], places[refs2]])
+    # temps_commande[ref1, ref2] = temps pour aller chercher ref1 et ref2
+    temps_commande = temps_entrepot[places[:, None], places[None, :]]
+
+    # On ne compte que les couples ref1 < ref2
+    return float(np.sum(np.triu(temps_commande * proba, 1)))
+
 
-    esperance = 0
-    for ref1 in range(nb_ref):
-        for ref2 in range(ref1 + 1, nb_ref):
-            position_ref1 = int(position_ref[ref1, 0] + position_ref[ref1, 1]*nb_rangees)
-            position_ref2 = int(position_ref[ref2, 0] + position_ref[ref2, 1]*nb_rangees)
-            temps_commande = temps_entrepot[position_ref1, position_ref2]
-            esperance += temps_commande * proba[ref1, ref2]
+def evalue_positions(positionnements, temps_entrepot, proba, taille_lot=None):
+    """
+    Evalue en un seul appel vectorisé le temps moyen de plusieurs positionnements.
+
+    Parametres:
+        positionnements (Array de taille (nb_positionnements, longueur_rangees, nb_rangees)): les positionnements
+            à évaluer.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps[i, j] du temps que le robot met à chercher 2 objets en
+            position i et j dans l'entrepôt.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        Les deux matrices peuvent être des triangulaire.MatriceTriangulaire, et temps_entrepot
+        un routage.TempsImplicite.
+
+        taille_lot (Entier): nombre de positionnements traités ensemble. Par défaut, on le choisit pour que
+            le tableau intermédiaire ne dépasse pas 2**24 éléments.
+
+    Return:
+        esperances (Array de taille nb_positionnements): le temps moyen de chaque positionnement.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> np.round(evalue_positions(np.array([[[1, 3], [0, 2]], [[0, 1], [2, 3]]]), evalue_entrepot(2, 2), proba), 10)
+    array([9.6, 9. ])
+    """
+    positionnements = np.asarray(positionnements)
+    nb_positionnements = len(positionnements)
+    nb_ref = positionnements[0].size
+    if taille_lot is None:
+        taille_lot = max(1, 2 ** 24 // max(1, nb_ref * nb_ref))
+
+    # places[k, ref] = place de ref dans le k-ième positionnement
+    refs = positionnements.reshape(nb_positionnements, nb_ref).astype(int)
+    places = np.empty_like(refs)
+    np.put_along_axis(places, refs, np.arange(nb_ref)[None, :], axis=1)
+
+    esperances = np.zeros(nb_positionnements)
+    if isinstance(proba, MatriceTriangulaire) or not isinstance(temps_entrepot, np.ndarray):
+        # Seuls les couples ref1 < ref2 commandés ensemble sont lus
+        (refs1, refs2, proba_couples) = couples_non_nuls(proba)
+        for debut in range(0, nb_positionnements, taille_lot):
+            lot = places[debut: debut + taille_lot]
+            esperances[debut: debut + taille_lot] = temps_entrepot[lot[:, refs1], lot[:, refs2]] @ proba_couples
+        return esperances
+
+    proba_haute = np.triu(proba, 1)
+    for debut in range(0, nb_positionnements, taille_lot):
+        lot = places[debut: debut + taille_lot]
+        temps_commande = temps_entrepot[lot[:, :, None], lot[:, None, :]]
+        esperances[debut: debut + taille_lot] = np.einsum("kij,ij->k", temps_commande, proba_haute)
+
+    return esperances
+
+
+def contributions_positions(positionnements, temps_entrepot, proba, taille_lot=None, proba_sym=None):
+    """
+    Calcule en un seul appel vectorisé la contribution de chaque référence au temps moyen de plusieurs
+    positionnements : la moitié du temps des commandes qui la contiennent, de sorte que la somme
+    des contributions d'un positionnement est son temps moyen (cf evalue_positions).
+
+    Parametres:
+        positionnements (Array de taille (nb_positionnements, longueur_rangees, nb_rangees)): les positionnements.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
 
-    return esperance
+        taille_lot (Entier): nombre de positionnements traités ensemble (cf evalue_positions).
+
+        proba_sym (Array de taille (nb_ref, nb_ref)): proba_symetrique(proba) déjà calculée, par exemple
+            Instance.proba_symetrique. Par défaut, elle est calculée à chaque appel.
+
+    Return:
+        contributions (Array de taille (nb_positionnements, nb_ref)): contributions[k, ref].
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> contributions = contributions_positions(np.array([[[1, 3], [0, 2]]]), evalue_entrepot(2, 2), proba)
+    >>> contributions.round(2), round(contributions.sum(), 10)
+    (array([[2.6, 1.8, 3.6, 1.6]]), 9.6)
+    """
+    positionnements = np.asarray(positionnements)
+    nb_positionnements = len(positionnements)
+    nb_ref = positionnements[0].size
+    if proba_sym is None:
+        proba_sym = proba_symetrique(proba)
+    if taille_lot is None:
+        taille_lot = max(1, 2 ** 24 // max(1, nb_ref * nb_ref))
+
+    refs = positionnements.reshape(nb_positionnements, nb_ref).astype(int)
+    places = np.empty_like(refs)
+    np.put_along_axis(places, refs, np.arange(nb_ref)[None, :], axis=1)
+
+    contributions = np.zeros((nb_positionnements, nb_ref))
+    for debut in range(0, nb_positionnements, taille_lot):
+        lot = places[debut: debut + taille_lot]
+        temps_commande = temps_entrepot[lot[:, :, None], lot[:, None, :]]
+        contributions[debut: debut + taille_lot] = np.einsum("kij,ij->ki", temps_commande, proba_sym) / 2
+
+    return contributions
+
+
+def evalue_scenarios(positionnement, temps_entrepot, probas, poids=None):
+    """
+    Evalue en une seule passe le temps moyen d'un positionnement pour plusieurs scénarios de demande.
+
+    Parametres:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): la position des références.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        probas (Array de taille (nb_scenarios, nb_ref, nb_ref)): la matrice des probabilités de chaque scénario.
+
+        poids (Array de taille nb_scenarios): poids de chaque scénario dans la moyenne. Par défaut, ils sont égaux.
+
+    Return:
+        esperances (Array de taille nb_scenarios): le temps moyen pour chaque scénario.
+
+        moyenne (Réel): la moyenne des esperances, pondérée par poids.
+
+        pire (Réel): le temps moyen du pire scénario.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> (esperances, moyenne, pire) = evalue_scenarios(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2),
+    ...                                                np.array([proba, proba.T]), poids=[3, 1])
+    >>> np.round(esperances, 10), round(moyenne, 10), round(pire, 10)
+    (array([ 9.6, 10.6]), 9.85, 10.6)
+    """
+    probas = np.asarray(probas, dtype=float)
+    places = places_references(positionnement)
+    # Le temps de chaque couple de références ne dépend pas du scénario : on ne le calcule qu'une fois
+    temps_commande = np.triu(temps_entrepot[places[:, None], places[None, :]], 1)
+    esperances = np.einsum("ij,kij->k", temps_commande, probas)
+
+    if poids is None:
+        poids = np.ones(len(probas))
+    poids = np.asarray(poids, dtype=float)
+
+    return esperances, float(poids @ esperances / poids.sum()), float(esperances.max())
+
+
+def proba_symetrique(proba):
+    """
+    Symétrise la matrice des probabilités à partir de son triangle supérieur (celui lu par evalue_position).
+    La diagonale est mise à zéro.
+
+    Parametres:
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+    Return:
+        proba_sym (Array de taille (nb_ref, nb_ref)): matrice symétrique telle que
+            evalue_position = somme(proba_sym * temps) / 2.
+
+    >>> proba_symetrique(np.array([[1., 0.2], [0.5, 0.]]))
+    array([[0. , 0.2],
+           [0.2, 0. ]])
+    """
+    proba_haute = np.triu(proba, 1)
+    return proba_haute + proba_haute.T
+
+
+def delta_echanges(places, ref, candidats, temps_entrepot, proba_sym):
+    """
+    Calcule la variation du temps moyen lorsque l'on échange ref avec chacun des candidats.
+    Le calcul est en O(nb_candidats * nb_ref) au lieu d'une évaluation complète par échange.
+
+    Parametres:
+        places (array d'entiers de taille nb_ref) : places[refi] = place 1D de refi (cf places_references).
+
+        ref (Entier) : la référence à échanger.
+
+        candidats (array d'entiers) : les références avec lesquelles on essaie d'échanger ref.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        proba_sym (Array de taille (nb_ref, nb_ref)): matrice symétrique obtenue avec proba_symetrique.
+
+    Return:
+        deltas (array de taille nb_candidats) : nouvelle valeur - ancienne valeur pour chaque échange.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> positionnement = np.array([[1, 3], [0, 2]])
+    >>> deltas = delta_echanges(places_references(positionnement), 1, np.array([0, 2]), evalue_entrepot(2, 2),
+    ...                         proba_symetrique(proba))
+    >>> echange = np.array([[0, 3], [1, 2]])
+    >>> round(deltas[0] - (evalue_position(echange, evalue_entrepot(2, 2), proba) - 9.6), 10)
+    0.0
+    """
+    candidats = np.asarray(candidats, dtype=int)
+    place_ref = places[ref]
+    places_candidats = places[candidats]
+    temps_ref = temps_entrepot[place_ref, places]
+    temps_candidats = temps_entrepot[places_candidats[:, None], places[None, :]]
+    proba_candidats = proba_sym[candidats]
+
+    # ref prend la place des candidats, et inversement
+    delta = (temps_candidats - temps_ref[None, :]) @ proba_sym[ref]
+    delta += proba_candidats @ temps_ref - np.sum(proba_candidats * temps_candidats, axis=1)
+    # Le couple (ref, candidat) ne change pas de temps : on retire ce qui a été compté en trop
+    temps_croise = temps_entrepot[place_ref, places_candidats]
+    delta -= proba_sym[ref, candidats] * (temps_entrepot[places_candidats, places_candidats] - 2 * temps_croise
+                                          + temps_entrepot[place_ref, place_ref])
+
+    return delta
 
 
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
 
+    from pathlib import Path
+    from alea import alea
+    from generateur import extraction_commande
+
     # --- Paramètre pour charger les probabilités des commandes --- #
     PATH_COMMANDE = Path("test.txt")
     PROBA = extraction_commande(PATH_COMMANDE)
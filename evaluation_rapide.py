@@ -0,0 +1,78 @@
+"""
+Ce script évalue un positionnement en ligne de commande, en chargeant le moins de modules possible :
+    python evaluation_rapide.py nom_instance positionnement.txt [--politique sshape] [--cache]
+Le positionnement est un fichier .npy ou un fichier texte (une ligne par casier, une colonne par rangée).
+Avec --cache, la matrice des probabilités et les temps de l'entrepôt sont lus dans le cache
+partagé avec instance.Instance (cf cache.CacheDisque) au lieu d'être recalculés.
+"""
+
+from argparse import ArgumentParser
+import numpy as np
+from evaluation import evalue_position, evalue_entrepot
+from generateur import extraction_commande
+
+
+def charge_positionnement(chemin):
+    """
+    Lit un positionnement écrit avec numpy.save (.npy) ou numpy.savetxt.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     np.savetxt(repertoire + "/positionnement.txt", np.array([[1, 3], [0, 2]]))
+    ...     charge_positionnement(repertoire + "/positionnement.txt")
+    array([[1., 3.],
+           [0., 2.]])
+    """
+    if str(chemin).endswith(".npy"):
+        return np.load(chemin)
+    return np.loadtxt(chemin, ndmin=2)
+
+
+def evalue_fichiers(nom_instance, chemin_positionnement, politique="sshape", cache=None):
+    """
+    Evalue le positionnement du fichier chemin_positionnement sur l'instance nom_instance (sans .txt).
+
+    Return:
+        esperance (Réel): le temps moyen mis pour collecter une commande (cf evaluation.evalue_position).
+    """
+    positionnement = charge_positionnement(chemin_positionnement)
+    if cache is None:
+        (proba, longueur_rangees, nb_rangees) = extraction_commande(nom_instance)
+        (longueur_rangees, nb_rangees) = (int(longueur_rangees), int(nb_rangees))
+        temps_entrepot = evalue_entrepot(longueur_rangees, nb_rangees, politique)
+    else:
+        # Mêmes clés que instance.Instance
+        from cache import empreinte
+        with open(nom_instance + ".txt", "rb") as fichier:
+            contenu = fichier.read()
+        (longueur_rangees, nb_rangees) = (int(dimension) for dimension in contenu.split(b"\n", 1)[0].split()[:2])
+        proba = cache.calcule(empreinte(contenu), "proba", lambda: extraction_commande(nom_instance)[0])
+        temps_entrepot = cache.calcule(empreinte(politique, longueur_rangees, nb_rangees), "temps_entrepot",
+                                       lambda: evalue_entrepot(longueur_rangees, nb_rangees, politique))
+
+    if positionnement.shape != (longueur_rangees, nb_rangees):
+        raise ValueError("Le positionnement est de taille {} au lieu de {}.".format(
+            positionnement.shape, (longueur_rangees, nb_rangees)))
+    return evalue_position(positionnement, temps_entrepot, proba)
+
+
+def main(arguments=None):
+    """
+    Affiche le coût du positionnement donné en ligne de commande.
+    """
+    parser = ArgumentParser(description="Evalue un positionnement sur une instance.")
+    parser.add_argument("nom_instance", help="chemin de l'instance, sans l'extension .txt")
+    parser.add_argument("positionnement", help="fichier du positionnement (.npy ou texte)")
+    parser.add_argument("--politique", default="sshape", help="politique de routage du robot")
+    parser.add_argument("--cache", action="store_true", help="utilise le cache sur le disque")
+    arguments = parser.parse_args(arguments)
+
+    cache = None
+    if arguments.cache:
+        from cache import CacheDisque
+        cache = CacheDisque()
+    print(evalue_fichiers(arguments.nom_instance, arguments.positionnement, arguments.politique, cache))
+
+
+if __name__ == "__main__":
+    main()
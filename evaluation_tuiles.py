@@ -0,0 +1,122 @@
+"""
+Ce module évalue un positionnement lorsque la matrice des probabilités ne tient pas en mémoire :
+    python evaluation_tuiles.py proba.npy positionnement.npy [--temps temps.npy] [--taille-tuile 2048] [--fils 8]
+-------
+Les matrices sont des fichiers .npy lus par projection en mémoire (mmap) : une matrice pleine de taille
+(nb_ref, nb_ref), ou le triangle supérieur d'une triangulaire.MatriceTriangulaire. Sans fichier de temps,
+les temps de l'entrepôt sont calculés à la demande (cf routage.TempsImplicite).
+La matrice des probabilités est parcourue par tuiles carrées de références (au-dessus de la diagonale) :
+chaque tuile est lue, on calcule les temps de ses couples commandés ensemble et on accumule leur coût.
+La mémoire de travail est de l'ordre de nb_fils * taille_tuile² réels, quel que soit nb_ref.
+Les tuiles sont réparties sur des fils d'exécution : numpy libère le GIL pendant les gros calculs.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+from evaluation import places_references
+from triangulaire import MatriceTriangulaire
+
+TAILLE_TUILE = 2048
+
+
+def ouvre_matrice(chemin):
+    """
+    Ouvre sans la charger une matrice écrite avec numpy.save : pleine (2 dimensions) ou triangulaire (1 dimension,
+    cf triangulaire.MatriceTriangulaire).
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     np.save(repertoire + "/triangle.npy", np.array([1., 2., 3.]))
+    ...     matrice = ouvre_matrice(repertoire + "/triangle.npy")
+    ...     print(matrice.nb, matrice[1, 0])
+    2 2.0
+    """
+    matrice = np.load(chemin, mmap_mode="r")
+    if matrice.ndim == 2:
+        return matrice
+    # nb * (nb + 1) / 2 = len(matrice)
+    nb = int((np.sqrt(8 * len(matrice) + 1) - 1) / 2)
+    return MatriceTriangulaire(matrice, nb)
+
+
+def _evalue_tuile(places, temps_entrepot, proba, debut1, debut2, taille_tuile):
+    """
+    Coût des couples ref1 < ref2 de la tuile [debut1: debut1 + taille_tuile, debut2: debut2 + taille_tuile].
+    """
+    proba_tuile = np.asarray(proba[debut1: debut1 + taille_tuile, debut2: debut2 + taille_tuile])
+    if debut1 == debut2:
+        # Sur la diagonale, seul le triangle supérieur compte
+        proba_tuile = np.triu(proba_tuile, 1)
+    (lignes, colonnes) = np.nonzero(proba_tuile)
+    if len(lignes) == 0:
+        return 0.
+    temps = temps_entrepot[places[debut1 + lignes], places[debut2 + colonnes]]
+    return float(proba_tuile[lignes, colonnes] @ temps)
+
+
+def evalue_position_tuiles(positionnement, temps_entrepot, proba, taille_tuile=TAILLE_TUILE, nb_fils=None):
+    """
+    Evalue le temps moyen d'un positionnement par tuiles, comme evaluation.evalue_position.
+
+    Parametres:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): la position des références.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places,
+            éventuellement projeté en mémoire, triangulaire ou implicite (cf routage.TempsImplicite).
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes, éventuellement
+            projetée en mémoire ou triangulaire (cf ouvre_matrice).
+
+        taille_tuile (Entier): nombre de références de chaque côté d'une tuile.
+
+        nb_fils (Entier): nombre de fils d'exécution. Par défaut, le nombre de processeurs.
+
+    Return:
+        esperance (Réel): le temps moyen mis pour collecter une commande.
+
+    >>> from evaluation import evalue_entrepot
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> round(evalue_position_tuiles(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2, implicite=True), proba,
+    ...                              taille_tuile=3, nb_fils=2), 10)
+    9.6
+    """
+    places = places_references(positionnement)
+    nb_ref = len(places)
+    debuts = range(0, nb_ref, taille_tuile)
+    tuiles = [(debut1, debut2) for debut1 in debuts for debut2 in debuts if debut2 >= debut1]
+
+    with ThreadPoolExecutor(nb_fils or os.cpu_count()) as fils:
+        couts = fils.map(lambda tuile: _evalue_tuile(places, temps_entrepot, proba, *tuile, taille_tuile), tuiles)
+        # Les coûts sont sommés dans l'ordre des tuiles : le résultat ne dépend pas du nombre de fils
+        return float(sum(couts))
+
+
+def main(arguments=None):
+    """
+    Affiche le coût du positionnement donné en ligne de commande.
+    """
+    from argparse import ArgumentParser
+    from evaluation_rapide import charge_positionnement
+    from routage import TempsImplicite
+
+    parser = ArgumentParser(description="Evalue un positionnement par tuiles, sans charger les matrices en mémoire.")
+    parser.add_argument("proba", help="matrice des probabilités (.npy, pleine ou triangulaire)")
+    parser.add_argument("positionnement", help="fichier du positionnement (.npy ou texte)")
+    parser.add_argument("--temps", help="temps de l'entrepôt (.npy) ; par défaut, ils sont calculés à la demande")
+    parser.add_argument("--politique", default="sshape", help="politique de routage du robot")
+    parser.add_argument("--taille-tuile", type=int, default=TAILLE_TUILE)
+    parser.add_argument("--fils", type=int, help="nombre de fils d'exécution")
+    arguments = parser.parse_args(arguments)
+
+    positionnement = charge_positionnement(arguments.positionnement)
+    if arguments.temps is None:
+        temps_entrepot = TempsImplicite(arguments.politique, *positionnement.shape)
+    else:
+        temps_entrepot = ouvre_matrice(arguments.temps)
+    print(evalue_position_tuiles(positionnement, temps_entrepot, ouvre_matrice(arguments.proba),
+                                 arguments.taille_tuile, arguments.fils))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Ce module définit les événements émis par les méthodes d'optimisation (descente, ...) et
+des rappels prêts à l'emploi pour les suivre.
+-------
+Une méthode qui accepte un paramètre rappel=None appelle rappel(evenement) avec un Evenement :
+    - nature : "amelioration", "redemarrage", "point_controle" ou "fin",
+    - cout : le meilleur coût trouvé,
+    - temps : le temps écoulé depuis le début, en secondes,
+    - nb_evaluations : le nombre d'évaluations de la fonction de coût,
+    - positionnement : le meilleur positionnement trouvé (à ne pas modifier), s'il est connu.
+Si le rappel renvoie True, la méthode s'arrête et renvoie le meilleur positionnement trouvé.
+L'événement "fin" est émis une fois, quelle que soit la raison de l'arrêt.
+"""
+
+from collections import namedtuple
+from time import time
+
+Evenement = namedtuple("Evenement", ["nature", "cout", "temps", "nb_evaluations", "positionnement"],
+                       defaults=[None])
+
+
+class AffichageConsole:
+    """
+    Affiche les événements, au plus une fois toutes les "intervalle" secondes (l'événement "fin" est toujours affiché).
+
+    >>> affichage = AffichageConsole(intervalle=60)
+    >>> affichage(Evenement("amelioration", 12.5, 0.1, 10))
+    amelioration : coût 12.5 après 0.10 s et 10 évaluations
+    >>> affichage(Evenement("amelioration", 12.0, 0.2, 20))
+    >>> affichage(Evenement("fin", 12.0, 0.3, 30))
+    fin : coût 12.0 après 0.30 s et 30 évaluations
+    """
+    def __init__(self, intervalle=1.):
+        self.intervalle = intervalle
+        self._dernier_affichage = None
+
+    def __call__(self, evenement):
+        maintenant = time()
+        if (evenement.nature == "fin" or self._dernier_affichage is None
+                or maintenant - self._dernier_affichage >= self.intervalle):
+            self._dernier_affichage = maintenant
+            print("{} : coût {} après {:.2f} s et {} évaluations".format(*evenement[:4]))
+
+
+class TraceConvergence:
+    """
+    Ecrit la courbe de convergence (une ligne "temps meilleur_cout nb_evaluations" par amélioration)
+    dans un fichier texte, fermé à l'événement "fin". Chaque ligne est écrite sur le disque aussitôt ;
+    utilisée avec "with", la trace est fermée même si la méthode s'interrompt sur une erreur.
+
+    Parametres:
+        chemin (Chaîne de caractères): le fichier de la trace.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     with TraceConvergence(repertoire + "/trace.txt") as trace:
+    ...         trace(Evenement("amelioration", 12.5, 0.1, 10))
+    ...         print(open(repertoire + "/trace.txt").read(), end="")
+    0.1000 12.5 10
+    >>> trace.fichier.closed
+    True
+    """
+    def __init__(self, chemin):
+        self.fichier = open(chemin, "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fichier.close()
+
+    def __call__(self, evenement):
+        if self.fichier.closed:
+            return
+        if evenement.nature in ("amelioration", "fin"):
+            self.fichier.write("{:.4f} {!r} {}\n".format(evenement.temps, evenement.cout, evenement.nb_evaluations))
+            self.fichier.flush()
+        if evenement.nature == "fin":
+            self.fichier.close()
+
+
+class ArretStagnation:
+    """
+    Arrête la recherche si elle ne s'est pas améliorée depuis "duree" secondes.
+
+    >>> arret = ArretStagnation(duree=5)
+    >>> arret(Evenement("amelioration", 10., 1., 5)), arret(Evenement("point_controle", 10., 7., 50))
+    (False, True)
+    """
+    def __init__(self, duree):
+        self.duree = duree
+        self._derniere_amelioration = 0.
+
+    def __call__(self, evenement):
+        if evenement.nature == "amelioration":
+            self._derniere_amelioration = evenement.temps
+        return evenement.temps - self._derniere_amelioration > self.duree
+
+
+def combine(*rappels):
+    """
+    Rappel qui transmet chaque événement à tous les rappels ; on s'arrête si l'un d'eux le demande.
+    """
+    def rappel(evenement):
+        arrets = [rappel_simple(evenement) for rappel_simple in rappels]
+        return any(arret is True for arret in arrets)
+    return rappel
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
@@ -4,8 +4,8 @@ Il s'agit en réalité des probobilités de chaque commande
 """
 
 from numpy.random import randint, geometric
-from pulp import LpVariable, LpProblem, LpMinimize
 import numpy as np
+from triangulaire import MatriceTriangulaire, taille_triangulaire
 
 
 class DimensionError(Exception):
@@ -14,28 +14,46 @@ class DimensionError(Exception):
         return "Le nombre de référence doit être un multiple de 3 différent de 3"
 
 
-def extraction_commande(nom_fichier):
+def extraction_commande(nom_fichier, triangulaire=False):
     """
     Permet d'obtenir une matrice des commandes
-    à partir d'un fichier texte.
+    à partir d'un fichier texte, écrit en entier ou seulement par son triangle supérieur (cf store_matrice).
 
     Parametres:
         nom_fichier (Chaîne de caractères) : le chemin où se situe les commandes à extraire
 
+        triangulaire (Booléen) : si True, la matrice renvoyée est une triangulaire.MatriceTriangulaire.
+
     Return:
         commande (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+            Un fichier triangulaire donne une matrice symétrique.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     store_matrice(np.array([[0, 0.2], [0.2, 0]]), 1, 2, repertoire + "/petite.txt", triangulaire=True)
+    ...     (commande, longueur_rangee, nb_rangees) = extraction_commande(repertoire + "/petite")
+    ...     triangle = extraction_commande(repertoire + "/petite", triangulaire=True)[0]
+    >>> commande, triangle.valeurs
+    (array([[0. , 0.2],
+           [0.2, 0. ]]), array([0. , 0.2, 0. ]))
     """
     with open(nom_fichier + ".txt", "r") as fichier:
         entrepot = fichier.readline()
         (longueur_rangee, nb_rangees) = entrepot.split(" ")
-        lines = fichier.readlines()
-        nb_references = len(lines)
-        commande = np.zeros((nb_references, nb_references))
-
-        for (index_line, line) in enumerate(lines):
-            line = line.split(" ")
-            for index_ref in range(nb_references):
-                commande[index_line, index_ref] = line[index_ref]
+        valeurs = np.fromstring(fichier.read(), sep=" ")
+
+    nb_ref = int(longueur_rangee) * int(nb_rangees)
+    if len(valeurs) == nb_ref * nb_ref:
+        commande = valeurs.reshape(nb_ref, nb_ref)
+        if triangulaire:
+            commande = MatriceTriangulaire.depuis_matrice(commande)
+    elif len(valeurs) == taille_triangulaire(nb_ref):
+        commande = MatriceTriangulaire(valeurs, nb_ref)
+        if not triangulaire:
+            commande = commande.dense()
+    else:
+        raise ValueError("Le fichier {}.txt contient {} probabilités pour {} références.".format(
+            nom_fichier, len(valeurs), nb_ref))
 
     return commande, longueur_rangee, nb_rangees
 
@@ -76,6 +94,9 @@ def jaccard_to_proba(jaccard):
     """
     Renvoie une matrice de probabilité correspondant à la matrice de jaccard.
     """
+    # pulp est long à importer et ne sert qu'ici
+    from pulp import LpVariable, LpProblem, LpMinimize
+
     # -- Définissons des paramètres -- #
     nb_reference = len(jaccard)
 
@@ -289,20 +310,25 @@ def norme_matrice(matrice):
     return norme
 
 
-def store_matrice(matrice, longueur_rangee, nb_rangees, file_name):
+def store_matrice(matrice, longueur_rangee, nb_rangees, file_name, triangulaire=False):
     """
     Permet d'enregistrer la matrice en format texte.
 
     Parametres:
-        matrice (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+        matrice (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes
+            (ou triangulaire.MatriceTriangulaire).
 
         longueur_rangee (Entier positif): longueur des rangées dans l'entrepôt.
 
         nb_rangees (Entier positif): nombre de rangées dans l'entrepôt.
 
         file_name (Chaîne de caractères): chemin du nouveau fichier.
+
+        triangulaire (Booléen): si True, on n'écrit que le triangle supérieur, diagonale comprise
+            (la ligne ref1 commence au coefficient [ref1, ref1]). Toujours le cas pour une MatriceTriangulaire.
     """
     nb_reference = len(matrice)
+    triangulaire = triangulaire or isinstance(matrice, MatriceTriangulaire)
 
     with open(file_name, 'w') as file:
         string_row = "{} {}".format(longueur_rangee, nb_rangees)
@@ -310,14 +336,14 @@ def store_matrice(matrice, longueur_rangee, nb_rangees, file_name):
         file.write(string_row)
         for ref1 in range(nb_reference):
             string_row = ""
-            for ref2 in range(nb_reference):
+            for ref2 in range(ref1 if triangulaire else 0, nb_reference):
                 # On arrondi à la 3ième décimale
                 string_row += str(round(matrice[ref1, ref2], 3)) + " "
             string_row += "\n"
             file.write(string_row)
 
 
-def generation_commande(longueur_rangee, nb_rangees, nom_instance):
+def generation_commande(longueur_rangee, nb_rangees, nom_instance, triangulaire=False):
     """
     Génère un fichier texte donnant les probabilités.
     Renvoie la matrice des probabilités.
@@ -329,13 +355,15 @@ def generation_commande(longueur_rangee, nb_rangees, nom_instance):
 
         nom_instance (Chaîne de caractères): chemin du nouveau fichier.
 
+        triangulaire (Booléen): si True, on n'écrit que le triangle supérieur de la matrice (symétrique).
+
     Return:
         commande (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
     """
     nb_ref = longueur_rangee * nb_rangees
     try:
         probabilite = matrice_proba(nb_ref)
-        store_matrice(probabilite, longueur_rangee, nb_rangees, nom_instance + ".txt")
+        store_matrice(probabilite, longueur_rangee, nb_rangees, nom_instance + ".txt", triangulaire)
         return probabilite
 
     except DimensionError:
@@ -0,0 +1,325 @@
+"""
+Ce module permet de calculer un emplacement performant de l'entrepôt.
+Nous utilisons ici un algorithme génétique : toute une génération de
+positionnements est évaluée en un seul appel vectorisé.
+-------
+Un individu est un positionnement mis à plat : ordre[place] = ref avec
+place = rangee + casier * nb_rangees.
+"""
+
+from multiprocessing import Pool
+from time import time
+import numpy.random as rd
+import numpy as np
+from alea import alea
+from abc_classique import ABC
+from jaccard import jacquard
+from descente_locale import cycle_elements, cycle_rangees
+from evaluation import evalue_positions, evalue_entrepot
+
+
+def croisement_ox(parent1, parent2, debut, fin):
+    """
+    Croisement d'ordre (OX) de deux permutations.
+    L'enfant garde parent1[debut:fin] et complète avec les références de parent2
+    dans l'ordre où elles apparaissent.
+
+    Paramètres:
+        parent1 (array de taille nb_ref) : premier parent mis à plat.
+
+        parent2 (array de taille nb_ref) : second parent mis à plat.
+
+        debut (Entier) : début du segment conservé.
+
+        fin (Entier) : fin (exclue) du segment conservé.
+
+    Return:
+        enfant (array de taille nb_ref) : la permutation obtenue.
+
+    >>> croisement_ox(np.array([0, 1, 2, 3, 4]), np.array([4, 3, 2, 1, 0]), 1, 3)
+    array([4, 1, 2, 3, 0])
+    """
+    enfant = np.empty_like(parent1)
+    segment = np.zeros(len(parent1), dtype=bool)
+    segment[debut:fin] = True
+    enfant[segment] = parent1[segment]
+    # Les références de parent2 absentes du segment, dans l'ordre de parent2
+    dans_segment = np.zeros(len(parent1), dtype=bool)
+    dans_segment[parent1[debut:fin].astype(int)] = True
+    enfant[~segment] = parent2[~dans_segment[parent2.astype(int)]]
+
+    return enfant
+
+
+def croisement_pmx(parent1, parent2, debut, fin):
+    """
+    Croisement partiellement projeté (PMX) de deux permutations.
+    L'enfant garde parent1[debut:fin] et les autres places de parent2,
+    les conflits étant résolus par la correspondance du segment.
+
+    Paramètres:
+        parent1 (array de taille nb_ref) : premier parent mis à plat.
+
+        parent2 (array de taille nb_ref) : second parent mis à plat.
+
+        debut (Entier) : début du segment conservé.
+
+        fin (Entier) : fin (exclue) du segment conservé.
+
+    Return:
+        enfant (array de taille nb_ref) : la permutation obtenue.
+
+    >>> croisement_pmx(np.array([0, 1, 2, 3, 4]), np.array([4, 3, 2, 1, 0]), 1, 3)
+    array([4, 1, 2, 3, 0])
+    >>> croisement_pmx(np.array([1, 2, 3, 4, 0]), np.array([0, 1, 2, 3, 4]), 0, 2)
+    array([1, 2, 0, 3, 4])
+    """
+    parent1 = parent1.astype(int)
+    parent2 = parent2.astype(int)
+    nb_ref = len(parent1)
+    enfant = parent2.copy()
+    enfant[debut:fin] = parent1[debut:fin]
+
+    # place_parent1[ref] = place de ref dans parent1
+    place_parent1 = np.empty(nb_ref, dtype=int)
+    place_parent1[parent1] = np.arange(nb_ref)
+    dans_segment = np.zeros(nb_ref, dtype=bool)
+    dans_segment[parent1[debut:fin]] = True
+    hors_segment = np.ones(nb_ref, dtype=bool)
+    hors_segment[debut:fin] = False
+
+    # On suit la correspondance tant qu'il reste des doublons hors du segment
+    conflits = np.flatnonzero(hors_segment & dans_segment[enfant])
+    while len(conflits) > 0:
+        enfant[conflits] = parent2[place_parent1[enfant[conflits]]]
+        conflits = conflits[dans_segment[enfant[conflits]]]
+
+    return enfant
+
+
+def mutation(positions, taux_rangees=0.2):
+    """
+    Applique une mutation à un positionnement avec les voisinages de la descente locale.
+
+    Paramètres:
+        positions (array de taille (longueur_rangees, nb_rangees)) : le positionnement à muter.
+
+        taux_rangees (Réel) : probabilité d'utiliser un cycle de rangées plutôt qu'un cycle d'éléments.
+
+    Return:
+        positions (array de taille (longueur_rangees, nb_rangees)) : le positionnement muté.
+
+    >>> mutation(np.array([[0.]]))
+    array([[0.]])
+    """
+    (longueur_rangees, nb_rangees) = positions.shape
+    nb_ref = longueur_rangees * nb_rangees
+    if nb_ref < 2:
+        return positions.copy()
+
+    if nb_rangees > 1 and rd.random() < taux_rangees:
+        longueur_cycle = rd.randint(2, min(nb_rangees, 3) + 1)
+        return cycle_rangees(longueur_cycle, positions, bool(rd.randint(0, 2)))
+    longueur_cycle = rd.randint(2, min(nb_ref, 4) + 1)
+    return cycle_elements(longueur_cycle, positions, bool(rd.randint(0, 2)))
+
+
+def population_initiale(proba, nb_rangees, longueur_rangees, temps_entrepot, taille_population, seuil=0.2,
+                        instance=None):
+    """
+    Crée la population initiale à partir des heuristiques constructives :
+    le positionnement de Jacquard, plusieurs tirages de ABC et des tirages aléatoires.
+
+    Paramètres:
+        proba (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        taille_population (Entier) : nombre d'individus.
+
+        seuil (float) : seuil de corrélation utilisé par Jacquard.
+
+        instance (Instance) : si elle est donnée, ABC et Jacquard réutilisent ses statistiques.
+
+    Return:
+        population (array de taille (taille_population, longueur_rangees, nb_rangees)).
+    """
+    population = [jacquard(proba, nb_rangees, longueur_rangees, temps_entrepot, seuil, instance)]
+    # ABC est aléatoire à l'intérieur de chaque classe
+    nb_abc = (taille_population - 1) // 2
+    for _ in range(nb_abc):
+        population.append(ABC(proba, nb_rangees, longueur_rangees, instance))
+    if len(population) < taille_population:
+        population.extend(alea(longueur_rangees, nb_rangees, taille_population - len(population)))
+
+    return np.array(population[:taille_population], dtype=float)
+
+
+# Les processus de calcul gardent proba et temps_entrepot en mémoire
+_DONNEES_PROCESSUS = {}
+
+
+def _initialise_processus(temps_entrepot, proba):
+    _DONNEES_PROCESSUS["temps_entrepot"] = temps_entrepot
+    _DONNEES_PROCESSUS["proba"] = proba
+
+
+def _evalue_lot(positionnements):
+    return evalue_positions(positionnements, _DONNEES_PROCESSUS["temps_entrepot"], _DONNEES_PROCESSUS["proba"])
+
+
+def evalue_generation(population, temps_entrepot, proba, pool=None, nb_processus=1):
+    """
+    Evalue toute une génération, éventuellement répartie sur les processus de "pool".
+
+    Paramètres:
+        population (array de taille (taille_population, longueur_rangees, nb_rangees)).
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        proba (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        pool (multiprocessing.Pool) : processus initialisés avec _initialise_processus.
+
+        nb_processus (Entier) : nombre de processus de "pool".
+
+    Return:
+        valeurs (array de taille taille_population).
+    """
+    if pool is None:
+        return evalue_positions(population, temps_entrepot, proba)
+    lots = np.array_split(population, nb_processus)
+    return np.concatenate(pool.map(_evalue_lot, [lot for lot in lots if len(lot) > 0]))
+
+
+def selection_tournoi(valeurs, nb_selections, taille_tournoi=3):
+    """
+    Sélectionne des individus par tournoi, de manière vectorisée.
+
+    Paramètres:
+        valeurs (array de taille taille_population) : le coût de chaque individu.
+
+        nb_selections (Entier) : nombre d'individus à sélectionner.
+
+        taille_tournoi (Entier) : nombre de participants à chaque tournoi.
+
+    Return:
+        indices (array de taille nb_selections) : les indices des gagnants.
+
+    >>> selection_tournoi(np.array([3., 1., 2.]), 2, 3).shape
+    (2,)
+    """
+    participants = rd.randint(0, len(valeurs), size=(nb_selections, taille_tournoi))
+    gagnants = np.argmin(valeurs[participants], axis=1)
+
+    return participants[np.arange(nb_selections), gagnants]
+
+
+def genetique(population, proba, temps_entrepot, nb_generations=None, temps_max=None, taille_elite=2,
+              taux_mutation=0.3, croisement=croisement_ox, nb_processus=1):
+    """
+    Fait évoluer une population de positionnements et renvoie le meilleur trouvé.
+    Il faut donner nb_generations ou temps_max (ou les deux).
+
+    Parametres:
+        population (array de taille (taille_population, longueur_rangees, nb_rangees)): la population initiale,
+            par exemple obtenue avec population_initiale.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        nb_generations (Entier): nombre maximal de générations.
+
+        temps_max (Réel): temps de calcul maximal en secondes.
+
+        taille_elite (Entier): nombre de meilleurs individus recopiés tels quels.
+
+        taux_mutation (Réel): probabilité de muter un enfant.
+
+        croisement (fonction): croisement_ox ou croisement_pmx.
+
+        nb_processus (Entier): nombre de processus pour évaluer les générations.
+
+    Return:
+        pos_opt (Array de taille (longueur_rangees, nb_rangees)): le meilleur positionnement.
+
+        minimum (Réel): son temps moyen.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> population = np.array([alea(2, 2) for _ in range(6)])
+    >>> pos_opt, minimum = genetique(population, proba, evalue_entrepot(2, 2), nb_generations=5)
+    >>> sorted(pos_opt.ravel())
+    [0.0, 1.0, 2.0, 3.0]
+    """
+    if nb_generations is None and temps_max is None:
+        raise ValueError("Il faut donner nb_generations ou temps_max")
+
+    population = np.array(population, dtype=float)
+    (taille_population, longueur_rangees, nb_rangees) = population.shape
+    nb_ref = longueur_rangees * nb_rangees
+    taille_elite = min(taille_elite, taille_population)
+    debut = time()
+
+    pool = None
+    if nb_processus > 1:
+        pool = Pool(nb_processus, initializer=_initialise_processus, initargs=(temps_entrepot, proba))
+
+    try:
+        valeurs = evalue_generation(population, temps_entrepot, proba, pool, nb_processus)
+        generation = 0
+        while (nb_generations is None or generation < nb_generations) and \
+                (temps_max is None or time() - debut < temps_max):
+            # Les meilleurs individus sont conservés
+            elite = np.argsort(valeurs)[:taille_elite]
+            nouvelle_population = [population[index] for index in elite]
+
+            nb_enfants = taille_population - taille_elite
+            parents = selection_tournoi(valeurs, 2 * nb_enfants).reshape(nb_enfants, 2)
+            for (index_parent1, index_parent2) in parents:
+                (debut_segment, fin_segment) = np.sort(rd.randint(0, nb_ref + 1, size=2))
+                enfant = croisement(population[index_parent1].ravel(), population[index_parent2].ravel(),
+                                    debut_segment, fin_segment)
+                enfant = enfant.reshape(longueur_rangees, nb_rangees).astype(float)
+                if rd.random() < taux_mutation:
+                    enfant = mutation(enfant)
+                nouvelle_population.append(enfant)
+
+            population = np.array(nouvelle_population)
+            valeurs = evalue_generation(population, temps_entrepot, proba, pool, nb_processus)
+            generation += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    meilleur = np.argmin(valeurs)
+    return population[meilleur], valeurs[meilleur]
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from generateur import matrice_proba
+    from descente_locale import descente
+    from evaluation import evalue_position
+
+    # Comparaison avec la descente locale à temps de calcul égal
+    LONGUEUR_RANGEES = 30
+    NB_RANGEES = 36
+    TEMPS_MAX = 60
+    PROBA = matrice_proba(LONGUEUR_RANGEES * NB_RANGEES)
+    TEMPS_ENTREPOT = evalue_entrepot(LONGUEUR_RANGEES, NB_RANGEES)
+
+    POPULATION = population_initiale(PROBA, NB_RANGEES, LONGUEUR_RANGEES, TEMPS_ENTREPOT, 40)
+    (POS_GENETIQUE, VAL_GENETIQUE) = genetique(POPULATION, PROBA, TEMPS_ENTREPOT, temps_max=TEMPS_MAX)
+    POS_DESCENTE = descente(POPULATION[0], PROBA, TEMPS_ENTREPOT, temps_max=TEMPS_MAX)
+
+    print("Algorithme génétique : {}".format(VAL_GENETIQUE))
+    print("Descente locale : {}".format(evalue_position(POS_DESCENTE, TEMPS_ENTREPOT, PROBA)))
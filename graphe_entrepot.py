@@ -0,0 +1,386 @@
+"""
+Ce module permet de calculer les temps de récupération d'un entrepôt quelconque,
+décrit par un plan ou par un graphe, au lieu de la géométrie fixe de evaluation.sshape.
+-------
+Paramètres
+-------
+plan est une liste de chaînes de caractères de même longueur, une par ligne de l'entrepôt :
+    '.' case de circulation, 'E' entrée (case de circulation où commence et finit chaque tournée),
+    'C' casier, tout autre caractère un obstacle.
+    Une rangée est une colonne du plan qui contient des casiers : les rangées peuvent avoir des
+    longueurs différentes et être coupées par des allées transversales. Les casiers d'une rangée
+    sont numérotés du haut (le fond, casier 0) vers le bas, comme dans evaluation.sshape.
+
+Le robot prend un casier depuis une case de circulation voisine. Pour deux références, il part
+d'une entrée, passe devant les deux casiers par le plus court chemin et revient à la même entrée :
+    temps[a, b] = min sur les entrées d de D[d, u] + D[u, v] + D[v, d]
+avec u, v des cases d'accès de a et b et D la distance dans le graphe des cases de circulation.
+Le tableau obtenu respecte le même contrat que evaluation.evalue_entrepot (places codées en 1D
+[rangee + casier * nb_rangees]) : il se donne directement à evalue_position, jacquard ou descente.
+Les places des rangées plus courtes que la plus longue n'existent pas : leur temps est une pénalité,
+et les références fictives (de probabilité nulle) qui complètent le catalogue y sont rangées.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import shortest_path
+
+# Nombre de sources des plus courts chemins (ou de places) traitées ensemble
+TAILLE_LOT = 256
+
+
+def plan_standard(longueurs, allees_transversales=(), entrees=None):
+    """
+    Dessine le plan d'un entrepôt en rangées parallèles séparées par des allées,
+    avec une allée transversale au fond et une à l'avant.
+
+    Paramètres:
+        longueurs (liste d'entiers) : nombre de casiers de chaque rangée.
+
+        allees_transversales (liste d'entiers) : on ajoute une allée transversale après ces casiers.
+
+        entrees (liste d'entiers) : colonnes des entrées sur l'allée de l'avant. Par défaut, une entrée au milieu.
+
+    Return:
+        plan (liste de chaînes de caractères) : le plan de l'entrepôt.
+
+    >>> plan_standard([2, 1], allees_transversales=[0])
+    ['.....', '.C.C.', '.....', '.C...', '..E..']
+    """
+    nb_rangees = len(longueurs)
+    largeur = 2 * nb_rangees + 1
+    if entrees is None:
+        entrees = [largeur // 2]
+
+    plan = ["." * largeur]
+    for casier in range(max(longueurs)):
+        plan.append("".join("C" if index % 2 == 1 and casier < longueurs[index // 2] else "."
+                            for index in range(largeur)))
+        if casier in allees_transversales:
+            plan.append("." * largeur)
+    plan.append("".join("E" if index in entrees else "." for index in range(largeur)))
+
+    return plan
+
+
+def graphe_plan(plan):
+    """
+    Construit le graphe des cases de circulation d'un plan et repère les casiers.
+
+    Paramètres:
+        plan (liste de chaînes de caractères) : le plan de l'entrepôt.
+
+    Return:
+        graphe (scipy.sparse.csr_matrix) : graphe des cases de circulation voisines (arêtes de longueur 1).
+
+        acces (array d'entiers de taille (nb_places, nb_acces)) : cases de circulation voisines de chaque place,
+            complétées par -1 ; une place qui n'existe pas n'a que des -1.
+
+        entrees (array d'entiers) : les cases des entrées.
+
+        longueur_rangees (Entier) : la longueur de la plus longue rangée.
+
+        nb_rangees (Entier) : le nombre de rangées.
+
+    >>> (graphe, acces, entrees, longueur_rangees, nb_rangees) = graphe_plan(["...", ".C.", ".E."])
+    >>> (graphe.shape, acces.tolist(), entrees.tolist(), longueur_rangees, nb_rangees)
+    ((8, 8), [[3, 4, 1, 6]], [6], 1, 1)
+    """
+    grille = np.array([list(ligne) for ligne in plan])
+    circulation = (grille == ".") | (grille == "E")
+    numeros = -np.ones(grille.shape, dtype=np.int64)
+    numeros[circulation] = np.arange(np.count_nonzero(circulation))
+
+    # -- Arêtes entre cases de circulation voisines -- #
+    departs = []
+    arrivees = []
+    for (case1, case2) in ((numeros[:, :-1], numeros[:, 1:]), (numeros[:-1, :], numeros[1:, :])):
+        voisines = (case1 >= 0) & (case2 >= 0)
+        departs.append(case1[voisines])
+        arrivees.append(case2[voisines])
+    (departs, arrivees) = (np.concatenate(departs), np.concatenate(arrivees))
+    nb_cases = int(np.count_nonzero(circulation))
+    graphe = sparse.coo_matrix((np.ones(len(departs)), (departs, arrivees)), shape=(nb_cases, nb_cases)).tocsr()
+    graphe = graphe + graphe.T
+
+    # -- Casiers : une rangée par colonne, numérotés de haut en bas -- #
+    (lignes, colonnes) = np.nonzero(grille == "C")
+    (colonnes_rangees, rangees) = np.unique(colonnes, return_inverse=True)
+    nb_rangees = len(colonnes_rangees)
+    ordre = np.lexsort((lignes, colonnes))
+    (lignes, colonnes, rangees) = (lignes[ordre], colonnes[ordre], rangees[ordre])
+    debuts = np.searchsorted(rangees, np.arange(nb_rangees))
+    casiers = np.arange(len(lignes)) - debuts[rangees]
+    longueur_rangees = int(casiers.max(initial=-1)) + 1
+
+    # Cases de circulation voisines de chaque casier
+    bordee = np.pad(numeros, 1, constant_values=-1)
+    acces = -np.ones((longueur_rangees * nb_rangees, 4), dtype=np.int64)
+    places = rangees + casiers * nb_rangees
+    for (index, (decalage_ligne, decalage_colonne)) in enumerate(((0, -1), (0, 1), (-1, 0), (1, 0))):
+        acces[places, index] = bordee[lignes + 1 + decalage_ligne, colonnes + 1 + decalage_colonne]
+    # Les cases d'accès valides d'abord, et pas plus de colonnes que nécessaire
+    acces = np.take_along_axis(acces, np.argsort(acces < 0, axis=1, kind="stable"), axis=1)
+    acces = acces[:, :max(1, int((acces >= 0).sum(axis=1).max(initial=1)))]
+
+    return graphe, acces, numeros[grille == "E"], longueur_rangees, nb_rangees
+
+
+def distances_cases(graphe, sources, cibles, taille_lot=TAILLE_LOT):
+    """
+    Calcule les plus courts chemins des sources vers les cibles, par lots de sources
+    pour ne jamais garder toutes les distances du graphe en mémoire.
+
+    >>> chemin = sparse.csr_matrix(np.array([[0, 1, 0], [1, 0, 2], [0, 2, 0]]))
+    >>> distances_cases(chemin, np.array([0, 2]), np.array([1, 2]), taille_lot=1)
+    array([[1., 3.],
+           [2., 0.]])
+    """
+    distances = np.empty((len(sources), len(cibles)))
+    for debut in range(0, len(sources), taille_lot):
+        lot = sources[debut: debut + taille_lot]
+        distances[debut: debut + len(lot)] = shortest_path(graphe, method="D", directed=False,
+                                                           indices=lot)[:, cibles]
+
+    return distances
+
+
+def chaines(graphe, imposes=()):
+    """
+    Décompose le graphe en noeuds clés (de degré différent de 2, ou imposés) reliés par des chaînes
+    de noeuds de degré 2 : dans un entrepôt, les allées entre deux croisements.
+    Un plus court chemin ne quitte une chaîne que par ses extrémités, il suffit donc de connaître
+    les distances entre noeuds clés.
+
+    Paramètres:
+        graphe (scipy.sparse.csr_matrix) : graphe non orienté et pondéré.
+
+        imposes (array d'entiers) : noeuds à garder comme noeuds clés (les entrées).
+
+    Return:
+        cles (array d'entiers) : les noeuds clés.
+
+        bouts (array d'entiers de taille (nb_noeuds, 2)) : indice dans cles des deux extrémités de la chaîne de
+            chaque noeud (deux fois lui-même pour un noeud clé).
+
+        ecarts (array de taille (nb_noeuds, 2)) : distance de chaque noeud à ces extrémités le long de la chaîne.
+
+        chaine (array d'entiers de taille nb_noeuds) : numéro de la chaîne de chaque noeud (négatif pour un noeud clé).
+
+    >>> chemin = sparse.csr_matrix(np.array([[0, 1, 0, 0], [1, 0, 2, 0], [0, 2, 0, 1], [0, 0, 1, 0]]))
+    >>> (cles, bouts, ecarts, chaine) = chaines(chemin)
+    >>> (cles.tolist(), bouts.tolist(), ecarts.tolist())
+    ([0, 3], [[0, 0], [0, 1], [0, 1], [1, 1]], [[0.0, 0.0], [1.0, 3.0], [3.0, 1.0], [0.0, 0.0]])
+    """
+    graphe = sparse.csr_matrix(graphe)
+    nb_noeuds = graphe.shape[0]
+    degre = np.diff(graphe.indptr)
+    est_cle = degre != 2
+    est_cle[np.asarray(imposes, dtype=np.int64)] = True
+    departs = np.repeat(np.arange(nb_noeuds), degre)
+
+    while True:
+        # Un marcheur part de chaque noeud clé dans chaque chaîne, et avance jusqu'au noeud clé suivant
+        marcheurs = np.flatnonzero(est_cle[departs] & ~est_cle[graphe.indices])
+        (origine, precedent) = (departs[marcheurs], departs[marcheurs])
+        (courant, distance) = (graphe.indices[marcheurs], graphe.data[marcheurs].astype(float))
+        numero = np.arange(len(marcheurs))
+        visites = []
+        while len(courant) > 0:
+            visites.append((courant, numero, origine, distance))
+            premier = graphe.indptr[courant]
+            retour = graphe.indices[premier] == precedent
+            arete = np.where(retour, premier + 1, premier)
+            (precedent, courant, distance) = (courant, graphe.indices[arete], distance + graphe.data[arete])
+            actifs = ~est_cle[courant]
+            (precedent, courant, distance, numero, origine) = (precedent[actifs], courant[actifs], distance[actifs],
+                                                               numero[actifs], origine[actifs])
+
+        (noeuds, numeros, origines, distances) = [np.concatenate([visite[index] for visite in visites] + [[]])
+                                                  for index in range(4)]
+        noeuds = noeuds.astype(np.int64)
+        # Les cycles sans noeud clé ne sont jamais visités : on y impose un noeud clé
+        oublies = ~est_cle
+        oublies[noeuds] = False
+        if not oublies.any():
+            break
+        est_cle[np.flatnonzero(oublies)[0]] = True
+
+    cles = np.flatnonzero(est_cle)
+    index_cles = -np.ones(nb_noeuds, dtype=np.int64)
+    index_cles[cles] = np.arange(len(cles))
+    bouts = np.repeat(index_cles[:, None], 2, axis=1)
+    ecarts = np.zeros((nb_noeuds, 2))
+    chaine = -1 - np.arange(nb_noeuds)
+
+    # Chaque noeud d'une chaîne est visité par les deux marcheurs de la chaîne, toujours dans le même ordre
+    ordre = np.lexsort((numeros, noeuds))
+    (noeuds, numeros) = (noeuds[ordre].reshape(-1, 2), numeros[ordre].astype(np.int64).reshape(-1, 2))
+    (origines, distances) = (origines[ordre].astype(np.int64).reshape(-1, 2), distances[ordre].reshape(-1, 2))
+    bouts[noeuds[:, 0]] = index_cles[origines]
+    ecarts[noeuds[:, 0]] = distances
+    chaine[noeuds[:, 0]] = numeros[:, 0]
+
+    return cles, bouts, ecarts, chaine
+
+
+def _ports(acces, valide, bouts, ecarts, distance_entree):
+    """
+    Pour chaque place, les noeuds clés par lesquels on y arrive et le coût de l'entrée jusqu'à la place
+    puis jusqu'à ce noeud clé. On ne garde que le meilleur coût de chaque noeud clé.
+    """
+    nb_places = len(acces)
+    cles_ports = bouts[acces].reshape(nb_places, -1)
+    couts_ports = (distance_entree[acces][:, :, None] + ecarts[acces])
+    couts_ports[~valide] = np.inf
+    couts_ports = couts_ports.reshape(nb_places, -1)
+
+    ordre = np.lexsort((couts_ports, cles_ports), axis=1)
+    cles_ports = np.take_along_axis(cles_ports, ordre, axis=1)
+    couts_ports = np.take_along_axis(couts_ports, ordre, axis=1)
+    couts_ports[:, 1:][cles_ports[:, 1:] == cles_ports[:, :-1]] = np.inf
+
+    ordre = np.argsort(couts_ports, axis=1, kind="stable")
+    nb_ports = max(1, int(np.isfinite(couts_ports).sum(axis=1).max(initial=1)))
+    return (np.take_along_axis(cles_ports, ordre, axis=1)[:, :nb_ports],
+            np.take_along_axis(couts_ports, ordre, axis=1)[:, :nb_ports])
+
+
+def temps_graphe(graphe, acces, entrees, penalite=None, dtype=float, taille_lot=TAILLE_LOT):
+    """
+    Calcule le temps de récupération de chaque paire de places d'un entrepôt décrit par un graphe.
+    -------
+    Les plus courts chemins ne sont calculés qu'entre noeuds clés (cf chaines). Pour une entrée fixée,
+    une tournée qui ne reste pas dans une chaîne va de l'entrée à la première place, sort de sa chaîne
+    par un noeud clé, rejoint la chaîne de la seconde place, puis revient à l'entrée :
+        temps[a, b] = min sur les ports p de a et q de b de cout[p] + D_cles[p, q] + cout[q]
+    Les tournées qui restent dans une chaîne sont ajoutées chaîne par chaîne.
+
+    Paramètres:
+        graphe (scipy.sparse.csr_matrix) : graphe non orienté et pondéré des cases de circulation.
+
+        acces (array d'entiers de taille (nb_places, nb_acces)) : cases depuis lesquelles on prend chaque place,
+            complétées par -1 ; une place sans accès n'existe pas.
+
+        entrees (array d'entiers) : les cases des entrées.
+
+        penalite (Réel) : temps des places qui n'existent pas. Par défaut, dix fois le plus grand temps.
+
+        dtype : type des temps ; np.float32 divise la mémoire par deux pour les très grands entrepôts.
+
+        taille_lot (Entier) : nombre de places traitées ensemble.
+
+    Return:
+        temps (Array de taille (nb_places, nb_places)) : temps de récupération de chaque paire de places.
+
+    >>> (graphe, acces, entrees, _, _) = graphe_plan(plan_standard([2, 2]))
+    >>> temps_graphe(graphe, acces, entrees)
+    array([[4., 4., 4., 4.],
+           [4., 4., 4., 4.],
+           [4., 4., 2., 2.],
+           [4., 4., 2., 2.]])
+    """
+    graphe = sparse.csr_matrix(graphe)
+    acces = np.asarray(acces)
+    entrees = np.asarray(entrees, dtype=np.int64)
+    nb_places = len(acces)
+    existe = acces[:, 0] >= 0
+    acces = acces[existe]
+    valide = acces >= 0
+    acces = np.where(valide, acces, acces[:, :1])
+    nb_existantes = len(acces)
+
+    (cles, bouts, ecarts, chaine) = chaines(graphe, entrees)
+    distances_cles = distances_cases(graphe, cles, cles)
+
+    distances_entrees = [np.min(ecarts + distances_cles[entree][bouts], axis=1)
+                         for entree in np.searchsorted(cles, entrees)]
+
+    # -- Tournées qui passent par des noeuds clés -- #
+    # Le tableau est symétrique : on ne calcule que le triangle supérieur, recopié ensuite
+    temps_existantes = np.full((nb_existantes, nb_existantes), np.inf, dtype=dtype)
+    essai = np.empty((min(taille_lot, nb_existantes), nb_existantes), dtype=dtype)
+    for distance_entree in distances_entrees:
+        (cles_ports, couts_ports) = _ports(acces, valide, bouts, ecarts, distance_entree)
+        for (cle_arrivee, cout_arrivee) in zip(cles_ports.T, couts_ports.T):
+            arrivee = (distances_cles[:, cle_arrivee] + cout_arrivee[None, :]).astype(dtype)
+            for debut in range(0, nb_existantes, taille_lot):
+                fin = min(debut + taille_lot, nb_existantes)
+                (bloc, essai_bloc) = (temps_existantes[debut: fin, debut:], essai[:fin - debut, debut:])
+                for (cle_depart, cout_depart) in zip(cles_ports[debut: fin].T, couts_ports[debut: fin].T):
+                    np.add(arrivee[cle_depart, debut:], cout_depart[:, None], out=essai_bloc)
+                    np.minimum(bloc, essai_bloc, out=bloc)
+    for debut in range(0, nb_existantes, taille_lot):
+        fin = min(debut + taille_lot, nb_existantes)
+        temps_existantes[fin:, debut: fin] = temps_existantes[debut: fin, fin:].T
+
+    # -- Tournées qui restent dans une chaîne -- #
+    (places, colonnes) = np.nonzero(valide & (chaine[acces] >= 0))
+    cases = acces[places, colonnes]
+    ordre = np.argsort(chaine[cases], kind="stable")
+    (places, cases) = (places[ordre], cases[ordre])
+    bornes = np.flatnonzero(np.diff(chaine[cases])) + 1
+    for distance_entree in distances_entrees:
+        for (places_chaine, cases_chaine) in zip(np.split(places, bornes), np.split(cases, bornes)):
+            position = ecarts[cases_chaine, 0]
+            trajet = (distance_entree[cases_chaine][:, None] + np.abs(position[:, None] - position[None, :])
+                      + distance_entree[cases_chaine][None, :])
+            np.minimum.at(temps_existantes, (places_chaine[:, None], places_chaine[None, :]), trajet)
+
+    if penalite is None:
+        penalite = 10 * temps_existantes[np.isfinite(temps_existantes)].max(initial=1)
+    if existe.all():
+        return temps_existantes
+    temps = np.full((nb_places, nb_places), penalite, dtype=dtype)
+    temps[np.ix_(existe, existe)] = temps_existantes
+
+    return temps
+
+
+def temps_plan(plan, penalite=None, dtype=float):
+    """
+    Calcule le temps de récupération de chaque paire de places à partir du plan de l'entrepôt.
+
+    Paramètres:
+        plan (liste de chaînes de caractères) : le plan de l'entrepôt.
+
+        penalite (Réel) : temps des places qui n'existent pas (rangées plus courtes que la plus longue).
+
+        dtype : type des temps.
+
+    Return:
+        temps (Array de taille (nb_places, nb_places)) : temps de récupération de chaque paire de places.
+
+        longueur_rangees (Entier) : la longueur de la plus longue rangée.
+
+        nb_rangees (Entier) : le nombre de rangées.
+
+    >>> (temps, longueur_rangees, nb_rangees) = temps_plan(plan_standard([2, 1]), penalite=100)
+    >>> (temps, longueur_rangees, nb_rangees)
+    (array([[  4.,   4.,   4., 100.],
+           [  4.,   4.,   4., 100.],
+           [  4.,   4.,   2., 100.],
+           [100., 100., 100., 100.]]), 2, 2)
+    """
+    (graphe, acces, entrees, longueur_rangees, nb_rangees) = graphe_plan(plan)
+    return temps_graphe(graphe, acces, entrees, penalite, dtype), longueur_rangees, nb_rangees
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from time import time
+    from evaluation import evalue_entrepot
+
+    # Comparaison avec le S-shape sur l'entrepôt standard, puis un entrepôt de 12 000 places
+    LONGUEUR_RANGEES = 30
+    NB_RANGEES = 36
+    (TEMPS, _, _) = temps_plan(plan_standard([LONGUEUR_RANGEES] * NB_RANGEES))
+    print("Rapport moyen aux temps du S-shape : {}".format(np.mean(TEMPS / evalue_entrepot(LONGUEUR_RANGEES,
+                                                                                          NB_RANGEES))))
+
+    DEBUT = time()
+    temps_plan(plan_standard([100] * 120, allees_transversales=[49], entrees=[60, 180]), dtype=np.float32)
+    print("12 000 places, une allée transversale et deux entrées : {} s".format(time() - DEBUT))
@@ -0,0 +1,156 @@
+"""
+Ce module permet de tenir à jour la matrice des probabilités au fil des nouvelles commandes,
+sans relire tout l'historique.
+-------
+Les commandes anciennes sont oubliées exponentiellement : après chaque lot, le poids des
+commandes déjà vues est multiplié par le facteur d'oubli. Plutôt que de multiplier toute la
+matrice (coût en nb_ref²), on garde des poids "gonflés" : les nouvelles commandes comptent
+1 / facteur^t fois plus que celles du départ, ce qui revient au même à une constante près.
+Les fréquences sont des sommes de lignes et l'indice de Jacquard
+    J[i, j] = W[i, j] / (F[i] + F[j] - W[i, j])
+ne dépend pas de cette constante : un lot ne modifie que les lignes et colonnes des
+références qu'il contient.
+La normalisation (somme 1) change toute la matrice ; elle n'est faite qu'à la demande (proba).
+ABC, jacquard et descente ne dépendent pas de l'échelle de la matrice : on peut leur donner poids.
+"""
+
+import numpy as np
+from ingestion import paires_references, additionne_comptes
+from instance import Instance
+
+# Au-delà de cette échelle, les poids sont ramenés à l'échelle 1 pour éviter les débordements
+ECHELLE_MAX = 1e100
+
+
+class DemandeIncrementale:
+    """
+    Matrice des commandes mise à jour lot par lot, avec oubli exponentiel.
+
+    Parametres:
+        nb_ref (Entier): nombre de références.
+
+        facteur_oubli (Réel dans ]0, 1]): poids gardé par les commandes passées à chaque lot.
+
+    >>> demande = DemandeIncrementale(3, facteur_oubli=0.5)
+    >>> demande.ajoute_commandes([[0, 1], [0, 1, 2]])
+    array([0, 1, 2])
+    >>> demande.proba.round(3)
+    array([[0.   , 0.25 , 0.125],
+           [0.25 , 0.   , 0.125],
+           [0.125, 0.125, 0.   ]])
+    >>> demande.ajoute_commandes([[1, 2]])
+    array([1, 2])
+    >>> demande.proba.round(3)
+    array([[0.   , 0.167, 0.083],
+           [0.167, 0.   , 0.25 ],
+           [0.083, 0.25 , 0.   ]])
+    >>> from jaccard import indice_jacquard
+    >>> np.allclose(demande.jaccard, indice_jacquard(demande.proba))
+    True
+    """
+    def __init__(self, nb_ref, facteur_oubli=1.0):
+        if not 0 < facteur_oubli <= 1:
+            raise ValueError("Le facteur d'oubli doit être dans ]0, 1].")
+        self.nb_ref = int(nb_ref)
+        self.facteur_oubli = float(facteur_oubli)
+        self.echelle = 1.0
+        self.poids = np.zeros((self.nb_ref, self.nb_ref))
+        self.frequence = np.zeros(self.nb_ref)
+        self.total = 0.0
+        self.jaccard = np.zeros((self.nb_ref, self.nb_ref))
+
+    @classmethod
+    def depuis_comptes(cls, refs1, refs2, comptes, nb_ref, facteur_oubli=1.0):
+        """
+        Part des comptes d'un historique déjà lu (cf ingestion.comptes_historique).
+        """
+        demande = cls(nb_ref, facteur_oubli)
+        demande.ajoute_comptes(refs1, refs2, comptes, duree=0)
+        return demande
+
+    def ajoute_commandes(self, commandes, duree=1):
+        """
+        Ajoute un lot de commandes.
+
+        Paramètres:
+            commandes (liste de listes d'entiers) : les références de chaque nouvelle commande.
+
+            duree (Réel) : nombre de périodes d'oubli écoulées depuis le lot précédent.
+
+        Return:
+            touchees (array d'entiers) : les références dont les statistiques ont changé.
+        """
+        longueurs = np.array([len(commande) for commande in commandes], dtype=np.int64)
+        refs = np.array([ref for commande in commandes for ref in commande], dtype=np.int64)
+        (refs1, refs2) = paires_references(longueurs, refs)
+        return self.ajoute_comptes(refs1, refs2, np.ones(len(refs1)), duree)
+
+    def ajoute_comptes(self, refs1, refs2, comptes, duree=1):
+        """
+        Ajoute des couples de références commandées ensemble (refs1 < refs2) et leur nombre d'occurrences.
+        Le coût est proportionnel au nombre de couples plus nb_ref par référence touchée.
+
+        Return:
+            touchees (array d'entiers) : les références dont les statistiques ont changé.
+        """
+        # Oubli des commandes passées : les nouvelles comptent davantage
+        self.echelle /= self.facteur_oubli ** duree
+        if self.echelle > ECHELLE_MAX:
+            self._reechelonne()
+
+        (refs1, refs2, comptes) = additionne_comptes(np.asarray(refs1, dtype=np.int64),
+                                                     np.asarray(refs2, dtype=np.int64), np.asarray(comptes))
+        increments = comptes * self.echelle
+        self.poids[refs1, refs2] += increments
+        self.poids[refs2, refs1] += increments
+        np.add.at(self.frequence, refs1, increments)
+        np.add.at(self.frequence, refs2, increments)
+        self.total += 2 * increments.sum()
+
+        touchees = np.union1d(refs1, refs2)
+        self._met_a_jour_jaccard(touchees)
+        return touchees
+
+    def _met_a_jour_jaccard(self, touchees):
+        """
+        Recalcule les lignes et colonnes de la matrice de Jacquard des références touchées.
+        """
+        if len(touchees) == 0:
+            return
+        lignes = self.poids[touchees]
+        denominateur = self.frequence[touchees, None] + self.frequence[None, :] - lignes
+        J = np.divide(lignes, denominateur, out=np.zeros(lignes.shape), where=denominateur != 0)
+        self.jaccard[touchees] = J
+        self.jaccard[:, touchees] = J.T
+
+    def _reechelonne(self):
+        """
+        Ramène les poids à l'échelle 1 : seule opération en nb_ref², rarement faite.
+        """
+        self.poids /= self.echelle
+        self.frequence /= self.echelle
+        self.total /= self.echelle
+        self.echelle = 1.0
+
+    @property
+    def proba(self):
+        """Matrice des probabilités normalisée (somme 1), calculée à la demande."""
+        if self.total == 0:
+            return np.zeros((self.nb_ref, self.nb_ref))
+        return self.poids / self.total
+
+    def vers_instance(self, longueur_rangees, nb_rangees, cache=None):
+        """
+        Crée une Instance dont les fréquences et les indices de Jacquard sont déjà calculés.
+        """
+        instance = Instance(self.proba, longueur_rangees, nb_rangees, cache)
+        # On remplit les cached_property pour ne pas les recalculer
+        instance.__dict__["frequence"] = self.frequence / max(self.total, 1e-300)
+        instance.__dict__["jaccard"] = self.jaccard.copy()
+        return instance
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
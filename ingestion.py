@@ -0,0 +1,302 @@
+"""
+Ce module permet de construire la matrice des probabilités des commandes
+à partir d'un historique brut de commandes.
+-------
+Le fichier d'historique contient une commande par ligne : les numéros des références
+commandées, séparés par des espaces ou des virgules. Les lignes vides ou commençant
+par "#" sont ignorées.
+
+Chaque couple de références différentes d'une même commande est compté une fois.
+Le fichier est lu par blocs de lignes et les comptes sont gardés dans une matrice creuse :
+la mémoire utilisée dépend du nombre de couples distincts, pas du nombre de commandes.
+Plusieurs processus peuvent lire chacun une partie du fichier, leurs comptes sont ensuite
+additionnés (map-reduce).
+"""
+
+from multiprocessing import Pool
+import os
+import numpy as np
+from scipy import sparse
+
+# Nombre de lignes lues à la fois
+TAILLE_BLOC = 100000
+
+
+def paires_commandes(lignes):
+    """
+    Calcule les couples de références commandées ensemble.
+
+    Paramètres:
+        lignes (liste d'octets) : les lignes de l'historique, une commande par ligne.
+
+    Return:
+        refs1 (array d'entiers) : la plus petite référence de chaque couple.
+
+        refs2 (array d'entiers) : la plus grande référence de chaque couple.
+
+        nb_commandes (Entier) : nombre de commandes lues.
+
+    >>> (refs1, refs2, nb_commandes) = paires_commandes([b"0 2 1", b"# commentaire", b"3,1", b"4 4", b""])
+    >>> (refs1.tolist(), refs2.tolist(), nb_commandes)
+    ([1, 0, 0, 1], [3, 1, 2, 2], 3)
+    """
+    commandes = [ligne.replace(b",", b" ").split() for ligne in lignes if not ligne.lstrip().startswith(b"#")]
+    commandes = [commande for commande in commandes if len(commande) > 0]
+    nb_commandes = len(commandes)
+    if nb_commandes == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0
+
+    longueurs = np.array([len(commande) for commande in commandes])
+    refs = np.array([int(ref) for commande in commandes for ref in commande], dtype=np.int64)
+    (refs1, refs2) = paires_references(longueurs, refs)
+
+    return refs1, refs2, nb_commandes
+
+
+def paires_references(longueurs, refs):
+    """
+    Calcule les couples de références commandées ensemble à partir des commandes mises bout à bout.
+
+    Paramètres:
+        longueurs (array d'entiers) : nombre de lignes de chaque commande.
+
+        refs (array d'entiers) : les références de toutes les commandes, mises bout à bout.
+
+    Return:
+        refs1 (array d'entiers) : la plus petite référence de chaque couple.
+
+        refs2 (array d'entiers) : la plus grande référence de chaque couple.
+
+    >>> [tableau.tolist() for tableau in paires_references(np.array([2, 1]), np.array([3, 1, 2]))]
+    [[1], [3]]
+    """
+    nb_commandes = len(longueurs)
+    refs = np.asarray(refs, dtype=np.int64)
+    numeros = np.repeat(np.arange(nb_commandes, dtype=np.int64), longueurs)
+
+    # On trie les références dans chaque commande et on enlève les doublons
+    cles = np.unique(numeros << 32 | refs)
+    (numeros, refs) = (cles >> 32, cles & 0xFFFFFFFF)
+    longueurs = np.bincount(numeros, minlength=nb_commandes)
+    debuts = np.concatenate(([0], np.cumsum(longueurs)[:-1]))
+
+    # Les commandes de même longueur sont traitées ensemble
+    refs1 = []
+    refs2 = []
+    for longueur in np.unique(longueurs[longueurs > 1]):
+        blocs = refs[debuts[longueurs == longueur][:, None] + np.arange(longueur)[None, :]]
+        (indices1, indices2) = np.triu_indices(longueur, 1)
+        refs1.append(blocs[:, indices1].ravel())
+        refs2.append(blocs[:, indices2].ravel())
+
+    if len(refs1) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(refs1), np.concatenate(refs2)
+
+
+def additionne_comptes(refs1, refs2, comptes):
+    """
+    Regroupe les comptes d'un même couple.
+
+    >>> [tableau.tolist() for tableau in additionne_comptes(np.array([0, 1, 0]), np.array([2, 2, 2]), np.array([1, 1, 2]))]
+    [[0, 1], [2, 2], [3, 1]]
+    """
+    (cles, inverse) = np.unique(refs1.astype(np.int64) << 32 | refs2, return_inverse=True)
+    return cles >> 32, cles & 0xFFFFFFFF, np.bincount(inverse.ravel(), weights=comptes).astype(np.int64)
+
+
+def compte_morceau(chemin, debut, fin, taille_bloc=TAILLE_BLOC):
+    """
+    Compte les couples des commandes qui commencent entre les octets debut (inclus) et fin (exclu) du fichier.
+
+    Paramètres:
+        chemin (Chaîne de caractères) : chemin de l'historique.
+
+        debut (Entier) : premier octet du morceau.
+
+        fin (Entier) : fin du morceau.
+
+        taille_bloc (Entier) : nombre de lignes traitées à la fois.
+
+    Return:
+        refs1, refs2, comptes (arrays d'entiers) : les couples distincts et leur nombre d'occurrences.
+
+        nb_commandes (Entier) : nombre de commandes lues.
+    """
+    # Les comptes des blocs sont regroupés avec les comptes déjà faits seulement lorsqu'ils
+    # prennent plus de place qu'eux : la mémoire reste proportionnelle au nombre de couples distincts
+    # et chaque couple n'est trié qu'un nombre logarithmique de fois.
+    comptes = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    en_attente = []
+    taille_attente = 0
+    nb_commandes = 0
+
+    with open(chemin, "rb") as fichier:
+        # Une ligne appartient au morceau qui contient son premier octet
+        if debut > 0:
+            fichier.seek(debut - 1)
+            fichier.readline()
+        lignes = []
+        while fichier.tell() < fin:
+            ligne = fichier.readline()
+            if not ligne:
+                break
+            lignes.append(ligne)
+            if len(lignes) == taille_bloc or fichier.tell() >= fin:
+                (refs1, refs2, nb_nouvelles) = paires_commandes(lignes)
+                nb_commandes += nb_nouvelles
+                en_attente.append(additionne_comptes(refs1, refs2, np.ones(len(refs1))))
+                taille_attente += len(en_attente[-1][0])
+                lignes = []
+            if taille_attente > len(comptes[0]) or (taille_attente > 0 and fichier.tell() >= fin):
+                en_attente.append(comptes)
+                comptes = additionne_comptes(*[np.concatenate(tableaux) for tableaux in zip(*en_attente)])
+                en_attente = []
+                taille_attente = 0
+
+    return comptes + (nb_commandes,)
+
+
+def comptes_historique(chemin, nb_processus=1, taille_bloc=TAILLE_BLOC):
+    """
+    Compte les couples de références commandées ensemble dans tout l'historique.
+
+    Paramètres:
+        chemin (Chaîne de caractères) : chemin de l'historique.
+
+        nb_processus (Entier) : nombre de processus lisant chacun une partie du fichier.
+
+        taille_bloc (Entier) : nombre de lignes traitées à la fois par chaque processus.
+
+    Return:
+        refs1, refs2, comptes (arrays d'entiers) : les couples distincts (refs1 < refs2) et leur nombre d'occurrences.
+
+        nb_commandes (Entier) : nombre de commandes lues.
+    """
+    taille = os.path.getsize(chemin)
+    bornes = np.linspace(0, taille, nb_processus + 1).astype(int)
+    morceaux = [(chemin, bornes[index], bornes[index + 1], taille_bloc) for index in range(nb_processus)]
+
+    if nb_processus > 1:
+        with Pool(nb_processus) as pool:
+            resultats = pool.starmap(compte_morceau, morceaux)
+    else:
+        resultats = [compte_morceau(*morceau) for morceau in morceaux]
+
+    (refs1, refs2, comptes) = additionne_comptes(np.concatenate([resultat[0] for resultat in resultats]),
+                                                 np.concatenate([resultat[1] for resultat in resultats]),
+                                                 np.concatenate([resultat[2] for resultat in resultats]))
+    return refs1, refs2, comptes, sum(resultat[3] for resultat in resultats)
+
+
+def proba_depuis_comptes(refs1, refs2, comptes, nb_ref=None):
+    """
+    Normalise les comptes en une matrice symétrique des probabilités, de somme 1
+    (même convention que generateur.matrice_proba).
+
+    Paramètres:
+        refs1, refs2, comptes (arrays d'entiers) : les couples distincts (refs1 < refs2) et leur nombre d'occurrences.
+
+        nb_ref (Entier) : nombre de références. Par défaut, la plus grande référence lue plus un.
+
+    Return:
+        proba (scipy.sparse.csr_matrix de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+    >>> proba_depuis_comptes(np.array([0, 1]), np.array([1, 2]), np.array([3, 1])).toarray()
+    array([[0.   , 0.375, 0.   ],
+           [0.375, 0.   , 0.125],
+           [0.   , 0.125, 0.   ]])
+    """
+    if nb_ref is None:
+        nb_ref = int(max(refs1.max(initial=-1), refs2.max(initial=-1))) + 1
+    total = 2 * comptes.sum()
+    haut = sparse.coo_matrix((comptes / total, (refs1, refs2)), shape=(nb_ref, nb_ref)).tocsr()
+
+    return haut + haut.T
+
+
+def store_proba_creuse(proba, longueur_rangee, nb_rangees, file_name):
+    """
+    Enregistre une matrice creuse au format texte des instances (cf generateur.store_matrice),
+    une ligne à la fois pour ne jamais construire la matrice pleine.
+    Les probabilités sont écrites avec 6 chiffres significatifs : sur un grand catalogue,
+    l'arrondi à 3 décimales de store_matrice les annulerait presque toutes.
+
+    Parametres:
+        proba (scipy.sparse.csr_matrix de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        longueur_rangee (Entier positif): longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier positif): nombre de rangées dans l'entrepôt.
+
+        file_name (Chaîne de caractères): chemin du nouveau fichier.
+    """
+    proba = sparse.csr_matrix(proba)
+    nb_reference = proba.shape[0]
+
+    with open(file_name, 'w') as file:
+        file.write("{} {}\n".format(longueur_rangee, nb_rangees))
+        ligne = np.zeros(nb_reference)
+        for ref1 in range(nb_reference):
+            debut, fin = proba.indptr[ref1], proba.indptr[ref1 + 1]
+            ligne[:] = 0
+            ligne[proba.indices[debut:fin]] = proba.data[debut:fin]
+            file.write(" ".join("{:.6g}".format(valeur) for valeur in ligne) + " \n")
+
+
+def ingestion(chemin, longueur_rangee, nb_rangees, nom_instance, nb_processus=1, taille_bloc=TAILLE_BLOC):
+    """
+    Lit un historique de commandes et écrit l'instance correspondante.
+
+    Parametres:
+        chemin (Chaîne de caractères) : chemin de l'historique.
+
+        longueur_rangee (Entier positif): longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier positif): nombre de rangées dans l'entrepôt ; il y a longueur_rangee * nb_rangees références.
+
+        nom_instance (Chaîne de caractères): chemin de l'instance, sans l'extension ".txt".
+
+        nb_processus (Entier) : nombre de processus de lecture.
+
+        taille_bloc (Entier) : nombre de lignes traitées à la fois par chaque processus.
+
+    Return:
+        proba (scipy.sparse.csr_matrix de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     with open(repertoire + "/commandes.txt", "w") as fichier:
+    ...         _ = fichier.write("0 1\\n1 2 3\\n0 1\\n")
+    ...     proba = ingestion(repertoire + "/commandes.txt", 2, 2, repertoire + "/instance", taille_bloc=1)
+    ...     with open(repertoire + "/instance.txt") as fichier:
+    ...         fichier.readline()
+    ...         fichier.readline()
+    '2 2\\n'
+    '0 0.2 0 0 \\n'
+    """
+    (refs1, refs2, comptes, _) = comptes_historique(chemin, nb_processus, taille_bloc)
+    proba = proba_depuis_comptes(refs1, refs2, comptes, longueur_rangee * nb_rangees)
+    store_proba_creuse(proba, longueur_rangee, nb_rangees, nom_instance + ".txt")
+
+    return proba
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from argparse import ArgumentParser
+
+    PARSER = ArgumentParser(description="Construit une instance à partir d'un historique de commandes.")
+    PARSER.add_argument("historique", nargs="?", help="fichier des commandes, une commande par ligne")
+    PARSER.add_argument("longueur_rangee", nargs="?", type=int)
+    PARSER.add_argument("nb_rangees", nargs="?", type=int)
+    PARSER.add_argument("nom_instance", nargs="?", help="chemin de l'instance, sans l'extension .txt")
+    PARSER.add_argument("--processus", type=int, default=os.cpu_count())
+    ARGUMENTS = PARSER.parse_args()
+
+    if ARGUMENTS.historique is not None:
+        ingestion(ARGUMENTS.historique, ARGUMENTS.longueur_rangee, ARGUMENTS.nb_rangees, ARGUMENTS.nom_instance,
+                  ARGUMENTS.processus)
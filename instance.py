@@ -0,0 +1,166 @@
+"""
+Ce module regroupe les données d'une instance et les statistiques qui en découlent.
+Chaque statistique (fréquences, rangs, indices de Jacquard, ensembles de corrélation,
+temps de récupération de l'entrepôt) n'est calculée qu'à sa première utilisation, puis gardée en mémoire :
+ABC, jacquard, descente, ... peuvent ainsi partager le même prétraitement.
+Avec un cache.CacheDisque, ces statistiques sont aussi conservées d'une exécution à l'autre.
+"""
+
+from functools import cached_property
+import numpy as np
+from abc_classique import from_historique_to_frequence, rang_frequence
+from jaccard import indice_jacquard, ens_correlation
+from evaluation import evalue_entrepot, proba_symetrique
+from generateur import extraction_commande
+from cache import empreinte
+from routage import TempsImplicite
+from triangulaire import MatriceTriangulaire
+
+
+class Instance:
+    """
+    Instance du problème de positionnement.
+
+    Parametres:
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        cache (CacheDisque): cache sur le disque des statistiques, facultatif.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places
+            déjà calculé, par exemple avec graphe_entrepot.temps_plan. Par défaut, il est calculé avec la politique.
+
+        politique (Chaîne de caractères): la politique de routage du robot (cf routage.POLITIQUES).
+
+    >>> instance = Instance(np.array([[0, 2, 4], [2, 0, 3], [4, 3, 1]]), 1, 3)
+    >>> instance.frequence
+    array([6., 5., 8.])
+    >>> instance.correlation(0.25)
+    [[2], [2], [0, 1]]
+    >>> instance.correlation(0.25) is instance.correlation(0.25)
+    True
+    >>> instance.cle_positionnement == Instance(instance.proba, 1, 3, politique="retour").cle_positionnement
+    False
+    """
+    def __init__(self, proba, longueur_rangees, nb_rangees, cache=None, temps_entrepot=None, politique="sshape"):
+        self.proba = np.asarray(proba, dtype=float)
+        self.longueur_rangees = int(longueur_rangees)
+        self.nb_rangees = int(nb_rangees)
+        self.cache = cache
+        self.politique = politique
+        self._correlations = {}
+        self._temps_donnes = temps_entrepot is not None
+        if temps_entrepot is not None:
+            self.__dict__["temps_entrepot"] = temps_entrepot
+
+    @classmethod
+    def depuis_fichier(cls, nom_fichier, cache=None, politique="sshape"):
+        """
+        Charge une instance écrite par generateur.store_matrice (sans l'extension ".txt").
+        Avec un cache, le fichier texte n'est analysé qu'une fois pour un contenu donné.
+        """
+        if cache is None:
+            (proba, longueur_rangees, nb_rangees) = extraction_commande(nom_fichier)
+            return cls(proba, longueur_rangees, nb_rangees, politique=politique)
+
+        with open(nom_fichier + ".txt", "rb") as fichier:
+            contenu = fichier.read()
+        (longueur_rangees, nb_rangees) = contenu.split(b"\n", 1)[0].split()[:2]
+        proba = cache.calcule(empreinte(contenu), "proba", lambda: extraction_commande(nom_fichier)[0])
+        return cls(proba, longueur_rangees, nb_rangees, cache, politique=politique)
+
+    @cached_property
+    def cle(self):
+        """Empreinte de l'instance (contenu et dimensions), utilisée comme clé du cache."""
+        return empreinte(self.proba, self.longueur_rangees, self.nb_rangees)
+
+    @cached_property
+    def cle_positionnement(self):
+        """
+        Empreinte de l'instance et des temps de l'entrepôt (politique de routage, ou tableau donné
+        au constructeur), utilisée comme clé du meilleur positionnement connu : sa valeur en dépend.
+        """
+        if not self._temps_donnes:
+            return empreinte(self.proba, self.longueur_rangees, self.nb_rangees, self.politique)
+        temps = self.temps_entrepot
+        if isinstance(temps, TempsImplicite):
+            # Les temps ne dépendent que de la politique et des dimensions
+            temps = (temps.politique, temps.longueur_rangees, temps.nb_rangees)
+        elif isinstance(temps, MatriceTriangulaire):
+            temps = np.asarray(temps.valeurs)
+        else:
+            temps = np.asarray(temps)
+        return empreinte(self.proba, self.longueur_rangees, self.nb_rangees, "temps", temps)
+
+    @cached_property
+    def cle_geometrie(self):
+        """Empreinte de la politique de routage et des dimensions de l'entrepôt : les temps ne dépendent que d'elles."""
+        return empreinte(self.politique, self.longueur_rangees, self.nb_rangees)
+
+    def _calcule(self, cle, nom, fonction):
+        if self.cache is None:
+            return fonction()
+        return self.cache.calcule(cle, nom, fonction)
+
+    @property
+    def nb_ref(self):
+        return len(self.proba)
+
+    @cached_property
+    def frequence(self):
+        """Fréquence de commande de chaque référence."""
+        return self._calcule(self.cle, "frequence", lambda: from_historique_to_frequence(self.proba))
+
+    @cached_property
+    def rang(self):
+        """Références classées par fréquence décroissante (cf rang_frequence)."""
+        return self._calcule(self.cle, "rang", lambda: rang_frequence(self.proba, self.frequence))
+
+    @cached_property
+    def jaccard(self):
+        """Indices de Jacquard de chaque couple de références."""
+        return self._calcule(self.cle, "jaccard", lambda: indice_jacquard(self.proba))
+
+    @cached_property
+    def proba_symetrique(self):
+        """Matrice symétrique des probabilités (cf evaluation.proba_symetrique)."""
+        return proba_symetrique(self.proba)
+
+    @cached_property
+    def temps_entrepot(self):
+        """Temps de récupération de chaque paire de places de l'entrepôt, avec la politique de routage."""
+        return self._calcule(self.cle_geometrie, "temps_entrepot",
+                             lambda: evalue_entrepot(self.longueur_rangees, self.nb_rangees, self.politique))
+
+    def correlation(self, seuil):
+        """
+        Ensembles de corrélation de chaque référence pour un seuil donné (cf ens_correlation).
+        """
+        if seuil not in self._correlations:
+            self._correlations[seuil] = ens_correlation(self.jaccard, seuil)
+        return self._correlations[seuil]
+
+    def meilleur_positionnement(self):
+        """
+        Meilleur positionnement connu dans le cache et sa valeur, ou (None, inf).
+        """
+        if self.cache is None:
+            return None, float("inf")
+        return self.cache.meilleur_positionnement(self.cle_positionnement)
+
+    def propose_positionnement(self, positionnement, valeur):
+        """
+        Garde le positionnement dans le cache s'il est meilleur que le meilleur connu.
+        """
+        if self.cache is None:
+            return False
+        return self.cache.propose_positionnement(self.cle_positionnement, positionnement, valeur)
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,91 @@
+"""
+Ce module permet de mesurer où passe le temps des méthodes d'optimisation (descente, cache, ...).
+-------
+Les fonctions instrumentées prennent un paramètre facultatif mesures=None : sans objet Mesures,
+elles ne font qu'un test par étape. Avec un objet Mesures, elles ajoutent
+    - la durée de chaque phase (chronomètre "au tour" : chaque étape compte le temps écoulé depuis la précédente),
+    - des compteurs (évaluations, mouvements acceptés ou rejetés par voisinage, redémarrages, succès du cache, ...),
+et, si une période est donnée, un instantané de ces mesures est gardé (et transmis au rappel) à chaque période.
+"""
+
+from collections import Counter, defaultdict
+from time import perf_counter
+
+
+class Mesures:
+    """
+    Chronomètres par phase et compteurs.
+
+    Parametres:
+        periode (Réel): si elle est donnée, un instantané est pris toutes les "periode" secondes.
+
+        rappel (Fonction): si il est donné, rappel(instantane) est appelé à chaque instantané.
+
+    >>> mesures = Mesures()
+    >>> mesures.compte("evaluations", 3)
+    >>> mesures.demarre()
+    >>> mesures.etape("evaluation")
+    >>> mesures.compteurs["evaluations"], sorted(mesures.durees)
+    (3, ['evaluation'])
+    """
+    def __init__(self, periode=None, rappel=None):
+        self.periode = periode
+        self.rappel = rappel
+        self.compteurs = Counter()
+        self.durees = defaultdict(float)
+        self.instantanes = []
+        self.debut = perf_counter()
+        self._dernier = self.debut
+        self._prochain_instantane = self.debut if periode is None else self.debut + periode
+
+    def compte(self, nom, nombre=1):
+        """Ajoute nombre au compteur nom."""
+        self.compteurs[nom] += nombre
+
+    def demarre(self):
+        """Remet le chronomètre des phases à zéro, sans effacer les durées déjà mesurées."""
+        self._dernier = perf_counter()
+
+    def etape(self, phase):
+        """Attribue à phase le temps écoulé depuis la dernière étape (ou depuis demarre)."""
+        maintenant = perf_counter()
+        self.durees[phase] += maintenant - self._dernier
+        self._dernier = maintenant
+        if self.periode is not None and maintenant >= self._prochain_instantane:
+            self._prochain_instantane = maintenant + self.periode
+            instantane = self.instantane()
+            self.instantanes.append(instantane)
+            if self.rappel is not None:
+                self.rappel(instantane)
+
+    def compte_appels(self, fonction, nom):
+        """Renvoie fonction, dont chaque appel incrémente le compteur nom."""
+        def fonction_comptee(*arguments):
+            self.compteurs[nom] += 1
+            return fonction(*arguments)
+        return fonction_comptee
+
+    def instantane(self):
+        """
+        Copie des mesures à cet instant.
+
+        Return:
+            instantane (dictionnaire): temps écoulé depuis la création, durees et compteurs.
+        """
+        return {"temps": perf_counter() - self.debut, "durees": dict(self.durees), "compteurs": dict(self.compteurs)}
+
+    def resume(self):
+        """
+        Tableau lisible des durées (avec leur part du temps total) et des compteurs.
+        """
+        total = max(sum(self.durees.values()), 1e-12)
+        lignes = ["{:<24} {:>10.4f} s {:>6.1%}".format(phase, duree, duree / total)
+                  for (phase, duree) in sorted(self.durees.items(), key=lambda element: -element[1])]
+        lignes += ["{:<24} {:>10}".format(nom, nombre) for (nom, nombre) in sorted(self.compteurs.items())]
+        return "\n".join(lignes)
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
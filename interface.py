@@ -1,93 +1,124 @@
 """
 Ce script permet de charger les probabilités sur les commandes
 et de calculer les différents emplacements que propose les algorithmes.
+    python interface.py [nom_instance] [--politique sshape] [--seuils 0.05 0.1 ...]
 """
 
-from alea import alea
-from abc_classique import ABC
-from jaccard import jacquard
-from descente_locale import descente
-from evaluation import evalue_position, evalue_entrepot
-from generateur import extraction_commande
+from argparse import ArgumentParser
 from time import time
 
 
-# --- Paramètres --- #
+# --- Paramètres par défaut --- #
 LONGUEUR_RANGEES = 5
 NB_RANGEES = 6
+# Politique de routage du robot : "sshape", "retour", "point_milieu" ou "plus_grand_ecart"
+POLITIQUE = "sshape"
+# Seuils de corrélation essayés pour Jacquard
+SEUILS = [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4]
 # Attention : le nombre de réference doit être un multiple de trois
 NB_REF = LONGUEUR_RANGEES * NB_RANGEES
 NOM_INSTANCE_THEO = "entrepot{}x{}_{}".format(LONGUEUR_RANGEES, NB_RANGEES, NB_REF)
 # NOM_INSTANCE_PIA =
 NOM_INSTANCE = NOM_INSTANCE_THEO
-
-# --- Probabilité des commandes --- #
-print("Chargement de la commande...")
-PROBA = extraction_commande(NOM_INSTANCE)[0]
-
-# --- Calcul du S-Shape --- #
-print("Calcul du S_Shape...")
-TEMPS_ENTREPOT = evalue_entrepot(LONGUEUR_RANGEES, NB_RANGEES)
-
-
-# --- Calcul des emplacements par différentes méthodes --- #
-print("Calcul des positionnements...")
-# Partie calcul
-TIME_ALEA = time()
-
-POSITIONNEMENT_ALEA = alea(LONGUEUR_RANGEES, NB_RANGEES)
-
-TIME_ALEA_ABC = time()
-
-POSITIONNEMENT_ABC = ABC(PROBA, NB_RANGEES, LONGUEUR_RANGEES)
-
-TIME_ABC = time()
-print(POSITIONNEMENT_ABC)
-TIME_JACCARD = time()
-
-POSITIONNEMENT_JACCARD = jacquard(PROBA, NB_RANGEES, LONGUEUR_RANGEES, TEMPS_ENTREPOT, 0.2)
-
-TIME_JACCARD_DESCENTE = time()
-
-POSITIONNEMENT_DESCENTE_LOCALE = descente(POSITIONNEMENT_JACCARD.copy(), PROBA, TEMPS_ENTREPOT)
-
-TIME_DESCTENTE = time()
-
-# Partie affichage
-print("Le positionnement aléatoire est :")
-print(POSITIONNEMENT_ALEA)
-print("Le positionnement ABC est :")
-print(POSITIONNEMENT_ABC)
-print("Le positionnement Jacquard est :")
-print(POSITIONNEMENT_JACCARD)
-print("Le positionnement descente locale est :")
-print(POSITIONNEMENT_DESCENTE_LOCALE)
-
-
-# --- Evaluation des différents emplacements --- #
-print("Evaluation des positionnement...")
-ALEA = evalue_position(POSITIONNEMENT_ALEA, TEMPS_ENTREPOT, PROBA)
-ABC = evalue_position(POSITIONNEMENT_ABC, TEMPS_ENTREPOT, PROBA)
-JACCARD = evalue_position(POSITIONNEMENT_JACCARD, TEMPS_ENTREPOT, PROBA)
-DESCENTE_LOCALE = evalue_position(POSITIONNEMENT_DESCENTE_LOCALE, TEMPS_ENTREPOT, PROBA)
-
-
-# Affichage des résultats
-print("Le résultat pour le positionnement aléaoire est de {}".format(ALEA))
-print(" Temps : {}".format(TIME_ALEA_ABC - TIME_ALEA))
-
-print("Le résultat pour le positionnement ABC est de {}".format(ABC))
-print(" Temps : {}".format(TIME_ABC - TIME_ALEA_ABC))
-
-print("Le résultat pour le positionnement Jacquard est de {}".format(JACCARD))
-print(" Temps : {}".format(TIME_JACCARD_DESCENTE - TIME_JACCARD))
-
-print("Le résultat pour le positionnement descente locale est de {}".format(DESCENTE_LOCALE))
-print(" Temps : {}".format(TIME_DESCTENTE - TIME_JACCARD))
-
-print("Pourcentage de gain par rapport à ABC : {}".format((ABC - DESCENTE_LOCALE) / ABC))
-print("Pourcentage de gain par rapport à Jaccard : {}".format((JACCARD - DESCENTE_LOCALE) / JACCARD))
+# Les positionnements ne sont affichés que pour les petits entrepôts
+NB_REF_AFFICHAGE = 100
+
+
+def main(arguments=None):
+    """
+    Calcule les positionnements de ABC, Jacquard et de la descente locale sur une instance,
+    et les compare à un positionnement aléatoire.
+
+    Parametres:
+        arguments (liste de chaînes de caractères): les arguments de la ligne de commande (par défaut, sys.argv).
+    """
+    parser = ArgumentParser(description="Compare les méthodes de positionnement sur une instance.")
+    parser.add_argument("nom_instance", nargs="?", default=NOM_INSTANCE, help="chemin de l'instance, sans .txt")
+    parser.add_argument("--politique", default=POLITIQUE, help="politique de routage du robot")
+    parser.add_argument("--seuils", nargs="+", type=float, default=SEUILS, help="seuils essayés pour Jacquard")
+    arguments = parser.parse_args(arguments)
+
+    # Les modules de calcul ne sont chargés qu'une fois les arguments lus
+    from alea import moments_alea
+    from abc_classique import ABC
+    from jaccard import balayage_seuil
+    from descente_locale import descente
+    from evenements import AffichageConsole
+    from evaluation import evalue_position
+    from instance import Instance
+    from cache import CacheDisque
+
+    # --- Probabilité des commandes --- #
+    print("Chargement de la commande...")
+    instance = Instance.depuis_fichier(arguments.nom_instance, CacheDisque(), arguments.politique)
+    proba = instance.proba
+    (longueur_rangees, nb_rangees) = (instance.longueur_rangees, instance.nb_rangees)
+
+    # --- Calcul des temps de récupération --- #
+    print("Calcul des temps de récupération ({})...".format(arguments.politique))
+    temps_entrepot = instance.temps_entrepot
+
+    # --- Calcul des emplacements par différentes méthodes --- #
+    print("Calcul des positionnements...")
+    # Partie calcul
+    time_alea = time()
+
+    # Un positionnement aléatoire n'est pas tiré : on connaît exactement la moyenne et la variance de son coût
+    (alea, variance_alea) = moments_alea(temps_entrepot, proba)
+
+    time_alea_abc = time()
+
+    positionnement_abc = ABC(proba, nb_rangees, longueur_rangees, instance)
+
+    time_abc = time()
+    time_jaccard = time()
+
+    (seuil, positionnement_jaccard, _) = balayage_seuil(proba, nb_rangees, longueur_rangees, temps_entrepot,
+                                                        arguments.seuils, instance=instance)
+
+    time_jaccard_descente = time()
+
+    positionnement_descente_locale = descente(positionnement_jaccard.copy(), instance=instance,
+                                              rappel=AffichageConsole())
+
+    time_descente = time()
+
+    # Partie affichage
+    if instance.nb_ref <= NB_REF_AFFICHAGE:
+        print("Le positionnement ABC est :")
+        print(positionnement_abc)
+        print("Le positionnement Jacquard est :")
+        print(positionnement_jaccard)
+        print("Le positionnement descente locale est :")
+        print(positionnement_descente_locale)
+
+    # --- Evaluation des différents emplacements --- #
+    print("Evaluation des positionnement...")
+    abc = evalue_position(positionnement_abc, temps_entrepot, proba)
+    jaccard = evalue_position(positionnement_jaccard, temps_entrepot, proba)
+    descente_locale = evalue_position(positionnement_descente_locale, temps_entrepot, proba)
+    if instance.propose_positionnement(positionnement_descente_locale, descente_locale):
+        print("Nouveau meilleur positionnement connu pour cette instance")
+
+    # Affichage des résultats
+    print("Le résultat moyen d'un positionnement aléatoire est de {} (écart-type {})".format(alea,
+                                                                                          variance_alea ** 0.5))
+    print(" Temps : {}".format(time_alea_abc - time_alea))
+
+    print("Le résultat pour le positionnement ABC est de {}".format(abc))
+    print(" Temps : {}".format(time_abc - time_alea_abc))
+
+    print("Le résultat pour le positionnement Jacquard (seuil {}) est de {}".format(seuil, jaccard))
+    print(" Temps : {}".format(time_jaccard_descente - time_jaccard))
+
+    print("Le résultat pour le positionnement descente locale est de {}".format(descente_locale))
+    print(" Temps : {}".format(time_descente - time_jaccard))
+
+    print("Pourcentage de gain par rapport à l'aléatoire : {} ({} écarts-types)".format(
+        (alea - descente_locale) / alea, (alea - descente_locale) / variance_alea ** 0.5))
+    print("Pourcentage de gain par rapport à ABC : {}".format((abc - descente_locale) / abc))
+    print("Pourcentage de gain par rapport à Jaccard : {}".format((jaccard - descente_locale) / jaccard))
 
 
 if __name__ == "__main__":
-    pass
+    main()
@@ -1,4 +1,7 @@
+from multiprocessing import Pool
 import numpy as np
+from evaluation import evalue_positions
+from abc_classique import from_historique_to_frequence
 # besoin du sshape calculé sur l'entrepôt
 
 
@@ -13,23 +16,18 @@ def indice_jacquard(historique):
         J (array de taille (nb_ref, nb_ref)): contenant les indices de Jacquard de chaque couple de références
 
     >>> indice_jacquard(np.array([[0, 2, 4], [2, 0, 3], [4, 3, 1]]))
-    array([[0., 0.22222222, 0.4], [0.22222222, 0., 0.3], [0.4, 0.3, 0.06666667]])
+    array([[0.        , 0.22222222, 0.4       ],
+           [0.22222222, 0.        , 0.3       ],
+           [0.4       , 0.3       , 0.06666667]])
     """
-    nb_ref = len(historique)
-    J = np.zeros((nb_ref, nb_ref))
-    for i in range(nb_ref):
-        for j in range(i, nb_ref):
-            denominateur = 0
-            for k in range(nb_ref):
-                denominateur += historique[i, k] + historique[j, k]
-            denominateur -= historique[i, j]
-            if denominateur == 0:
-                J[i, j] = 0
-                J[j, i] = J[i, j]
-            else :
-                J[i, j] = historique[i, j]/denominateur
-                J[j, i] = J[i, j]
-    return J
+    historique = np.asarray(historique, dtype=float)
+    frequence = historique.sum(axis=1)
+    denominateur = frequence[:, None] + frequence[None, :] - historique
+    J = np.zeros(historique.shape)
+    non_nul = denominateur != 0
+    J[non_nul] = historique[non_nul] / denominateur[non_nul]
+    # on ne garde que le triangle supérieur, recopié par symétrie
+    return np.triu(J) + np.triu(J, 1).T
 
 
 
@@ -51,40 +49,13 @@ def ens_correlation(jacquard, seuil):
     >>> ens_correlation(np.array([[0., 0.22222222, 0.4], [0.22222222, 0., 0.3], [0.4, 0.3, 0.06666667]]), 0.35)
     [[2], [], [0]]
     """
-    nb_ref = len(jacquard)
-    E = [[] for k in range(nb_ref)]
-    for i in range(nb_ref):
-        for j in range(i, nb_ref):
-            if j!=i and jacquard[i, j] >= seuil :
-                E[i] += [j]
-                E[j] += [i]
+    correle = np.triu(np.asarray(jacquard) >= seuil, 1)
+    correle |= correle.T
+    E = [np.flatnonzero(ligne).tolist() for ligne in correle]
     return E
 
 
 
-def from_historique_to_frequence(historique):
-    """
-    Calcule la fréquence de commande de chaque référence (= fréquence d'apparition dans les commandes).
-
-    Paramètres:
-        historique (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
-
-    Return:
-        frequence (array de taille nb_ref) donnant la probabilité de chaque référence.
-
-    >>> from_historique_to_frequence(np.array([[0.3, 0.1, 0.2], [0.1, 0, 0.4], [0.2, 0.4, 0]]))
-    array([0.6, 0.5, 0.6])
-    >>> from_historique_to_frequence(np.array([[0.1, 0.4, 0.5, 0.3], [0.4, 0, 1, 0], [0.5, 1, 0.2, 0.7], [0.3, 0, 0.7, 0.3]]))
-    array([1.3, 1.4, 2.4, 1.3])
-    """
-    nb_ref = len(historique[0])
-    frequence = np.zeros(nb_ref)
-    for ref in range(nb_ref):
-        frequence[ref] = sum(historique[ref])
-    return frequence
-
-
-
 def proche_entree(positionnement_en_cours, temps_entrepot):
     """
     Trouve la place disponible la plus proche de l'entrée de l'entrepôt.
@@ -108,22 +79,16 @@ def proche_entree(positionnement_en_cours, temps_entrepot):
     [0, 2]
     """
     nb_rangees = len(positionnement_en_cours[0])
-    longueur_rangees = len(positionnement_en_cours)
 
-    place_min = [-1, -1] # place absurde
-    distance_min = 10*(nb_rangees + longueur_rangees) # borne sup des distances
+    # places libres, parcourues rangée par rangée
+    (rangees, casiers) = np.nonzero(np.asarray(positionnement_en_cours).T < 0)
+    if len(rangees) == 0:
+        return [-1, -1] # place absurde
+    places = rangees + casiers * nb_rangees
+    # la première place libre la plus proche de l'entrée
+    index_min = np.argmin(temps_entrepot[places, places])
 
-    for rangee in range(nb_rangees):
-        for casier in range(longueur_rangees):
-            # si la place est libre
-            if positionnement_en_cours[casier, rangee] < 0 :
-                place = rangee + casier * nb_rangees
-                # si la place est plus proche de l'entrée
-                if temps_entrepot[place, place] < distance_min :
-                    place_min = [casier, rangee]
-                    distance_min = temps_entrepot[place, place]
-
-    return place_min
+    return [int(casiers[index_min]), int(rangees[index_min])]
 
 
 
@@ -138,6 +103,7 @@ def proche_place(positionnement_en_cours, place, temps_entrepot):
         place (liste [r, c]) : donne les coordonnees de la rangee r et de le casier c de la place à côté de laquelle on veut se placer
 
         temps_entrepot (array de taille (nb_ref, nb_ref)): temps[i, j] du temps que le robot met à chercher 2 objets en positions i et j dans l'entrepôt (attention, les positions sont codées en 1D): [rangee, casier] = [rangee + casier*nb_rangees])
+            Seule une ligne est lue : un routage.TempsImplicite ne calcule que celle-ci.
 
     Return:
         position (liste [c, r]) : donne les coordonnees de la rangee r et de le casier c de la place disponible la plus proche de la place donnée
@@ -153,32 +119,29 @@ def proche_place(positionnement_en_cours, place, temps_entrepot):
     [0, 0]
     >>> proche_place(np.array([[3, 2, -1], [0, 1, -1]]), [1, 1], temps)
     [1, 2]
+    >>> from evaluation import evalue_entrepot
+    >>> proche_place(np.array([[3, 2, -1], [0, 1, -1]]), [1, 1], evalue_entrepot(2, 3, implicite=True))
+    [1, 2]
     """
     nb_rangees = len(positionnement_en_cours[0])
-    longueur_rangees = len(positionnement_en_cours)
 
     casier_ref = place[0]
     rangee_ref = place[1]
+    place_ref = rangee_ref + casier_ref * nb_rangees
 
-    place_min = [-1, -1] # place absurde
-    distance_min = 100*(nb_rangees + longueur_rangees) # borne sup des distances
+    # places libres, parcourues rangée par rangée
+    (rangees, casiers) = np.nonzero(np.asarray(positionnement_en_cours).T < 0)
+    if len(rangees) == 0:
+        return [-1, -1] # place absurde
+    places = rangees + casiers * nb_rangees
+    # la première place libre la plus proche de la place en argument
+    index_min = np.argmin(temps_entrepot[place_ref, places])
 
-    for rangee in range(nb_rangees):
-        for casier in range(longueur_rangees):
-            # si la place est libre
-            if positionnement_en_cours[casier, rangee] < 0 :
-                place_ref = rangee_ref + casier_ref * nb_rangees
-                place = rangee + casier * nb_rangees
-                # si la place est plus proche de la place en argument
-                if temps_entrepot[place_ref, place] < distance_min :
-                    place_min = [casier, rangee]
-                    distance_min = temps_entrepot[place_ref, place]
+    return [int(casiers[index_min]), int(rangees[index_min])]
 
-    return place_min
 
 
-
-def jacquard(historique, nb_rangees, longueur_rangees, temps_entrepot, seuil):
+def jacquard(historique, nb_rangees, longueur_rangees, temps_entrepot, seuil, instance=None):
     """
     Crée un positionnement des références sous le critère de Jacquard.
 
@@ -193,6 +156,8 @@ def jacquard(historique, nb_rangees, longueur_rangees, temps_entrepot, seuil):
 
         seuil (float) : seuil de corrélation "suffisante".
 
+        instance (Instance) : si elle est donnée, on réutilise ses fréquences, indices et ensembles de corrélation.
+
     Return:
         positionnement (array de taille (longueur_rangees, nb_rangees)) : la position des références dans l'entrepôt.
 
@@ -207,10 +172,50 @@ def jacquard(historique, nb_rangees, longueur_rangees, temps_entrepot, seuil):
     array([[0., 3.], [2., 1.]])
     """
 
-    nb_ref = len(historique)
+    if instance is not None:
+        return jacquard_precalcule(instance.frequence, instance.jaccard, nb_rangees, longueur_rangees, temps_entrepot,
+                                   seuil, instance.correlation(seuil))
+
     frequence = from_historique_to_frequence(historique)
     J = indice_jacquard(historique)
-    E = ens_correlation(J, seuil)
+
+    return jacquard_precalcule(frequence, J, nb_rangees, longueur_rangees, temps_entrepot, seuil)
+
+
+
+def jacquard_precalcule(frequence, J, nb_rangees, longueur_rangees, temps_entrepot, seuil, E=None):
+    """
+    Crée un positionnement des références sous le critère de Jacquard, à partir des fréquences
+    et des indices de Jacquard déjà calculés (cf jacquard).
+
+    Paramètres:
+        frequence (array de taille nb_ref) : fréquence de commande de chaque référence.
+
+        J (array de taille (nb_ref, nb_ref)) : matrice des indices de jacquard.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        seuil (float) : seuil de corrélation "suffisante".
+
+        E (liste de listes) : ensembles de corrélation déjà calculés pour ce seuil (cf ens_correlation).
+
+    Return:
+        positionnement (array de taille (longueur_rangees, nb_rangees)) : la position des références dans l'entrepôt.
+
+    >>> historique = np.array([[0, 0.4, 0.1], [0.4, 0, 0.1], [0.1, 0.1, 0]])
+    >>> jacquard_precalcule(from_historique_to_frequence(historique), indice_jacquard(historique), 3, 1,
+    ...                     np.array([[8, 10, 14], [10, 4, 10], [14, 10, 8]]), 0.2)
+    array([[1., 0., 2.]])
+    """
+    nb_ref = len(frequence)
+    # frequence est modifiée pendant le placement
+    frequence = np.array(frequence, dtype=float)
+    if E is None:
+        E = ens_correlation(J, seuil)
     # on initialise le positionnement à -1 (-1 signifie donc que la place est libre)
     positionnement = -1*np.ones((longueur_rangees, nb_rangees))
 
@@ -246,6 +251,73 @@ def jacquard(historique, nb_rangees, longueur_rangees, temps_entrepot, seuil):
 
 
 
+# Les processus du balayage gardent les données partagées en mémoire
+_DONNEES_PROCESSUS = {}
+
+
+def _initialise_processus(frequence, J, nb_rangees, longueur_rangees, temps_entrepot):
+    _DONNEES_PROCESSUS["arguments"] = (frequence, J, nb_rangees, longueur_rangees, temps_entrepot)
+
+
+def _jacquard_processus(seuil):
+    return jacquard_precalcule(*_DONNEES_PROCESSUS["arguments"], seuil)
+
+
+
+def balayage_seuil(historique, nb_rangees, longueur_rangees, temps_entrepot, seuils, nb_processus=1, instance=None):
+    """
+    Cherche le meilleur seuil de corrélation pour jacquard.
+    Les fréquences et les indices de Jacquard ne sont calculés qu'une fois, les positionnements
+    de chaque seuil sont construits en parallèle puis évalués en un seul appel vectorisé.
+
+    Paramètres:
+        historique (array de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        seuils (liste de float) : les seuils de corrélation à essayer.
+
+        nb_processus (Entier) : nombre de processus utilisés pour construire les positionnements.
+
+        instance (Instance) : si elle est donnée, on réutilise ses fréquences et ses indices de Jacquard.
+
+    Return:
+        meilleur_seuil (float) : le seuil donnant le plus petit temps moyen.
+
+        meilleur_positionnement (array de taille (longueur_rangees, nb_rangees)) : le positionnement associé.
+
+        valeurs (array de taille len(seuils)) : le temps moyen obtenu pour chaque seuil.
+
+    >>> historique = np.array([[0, 0.4, 0.1], [0.4, 0, 0.1], [0.1, 0.1, 0]])
+    >>> temps = np.array([[8, 10, 14], [10, 4, 10], [14, 10, 8]])
+    >>> (seuil, positionnement, valeurs) = balayage_seuil(historique, 3, 1, temps, [0.1, 0.2])
+    >>> seuil, positionnement
+    (0.1, array([[1., 0., 2.]]))
+    """
+    if instance is not None:
+        (frequence, J) = (instance.frequence, instance.jaccard)
+    else:
+        frequence = from_historique_to_frequence(historique)
+        J = indice_jacquard(historique)
+    arguments = (frequence, J, nb_rangees, longueur_rangees, temps_entrepot)
+
+    if nb_processus > 1:
+        with Pool(nb_processus, initializer=_initialise_processus, initargs=arguments) as pool:
+            positionnements = pool.map(_jacquard_processus, seuils)
+    else:
+        positionnements = [jacquard_precalcule(*arguments, seuil) for seuil in seuils]
+
+    valeurs = evalue_positions(np.array(positionnements), temps_entrepot, historique)
+    meilleur = int(np.argmin(valeurs))
+
+    return seuils[meilleur], positionnements[meilleur], valeurs
+
+
+
 if __name__ == "__main__":
     # -- Doc tests -- #
     import doctest
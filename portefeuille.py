@@ -0,0 +1,248 @@
+"""
+Ce module lance en parallèle plusieurs stratégies de positionnement (un portefeuille) et renvoie
+le meilleur positionnement trouvé avant l'échéance, avec le nom de la stratégie qui l'a trouvé.
+-------
+Chaque stratégie tourne dans son propre processus. Le meilleur positionnement connu (le "titulaire")
+et son coût sont en mémoire partagée : chaque stratégie y publie ses améliorations. Une recherche
+locale qui, passé un temps de grâce, reste nettement moins bonne que le titulaire est abandonnée
+pour laisser le processeur aux autres. A l'échéance, les stratégies encore en cours sont arrêtées.
+"""
+
+from multiprocessing import Process, Array, Value, Lock, Event
+from time import time
+import random
+import numpy as np
+from alea import alea
+
+# Part du budget pendant laquelle une recherche n'est jamais abandonnée
+GRACE = 0.25
+# Une recherche est abandonnée si son coût dépasse celui du titulaire de plus de cette proportion
+ECART_ABANDON = 0.02
+# Temps laissé aux stratégies pour s'arrêter après l'échéance, en secondes
+DELAI_ARRET = 1.
+TAILLE_POPULATION = 20
+SEUILS = [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4]
+
+STRATEGIES = {}
+
+
+def strategie(nom):
+    """
+    Enregistre une stratégie sous le nom "nom".
+    La fonction décorée reçoit l'instance, l'échéance (cf time.time) et le Titulaire ; elle publie
+    ses positionnements avec titulaire.propose.
+    """
+    def enregistre(fonction):
+        STRATEGIES[nom] = fonction
+        return fonction
+    return enregistre
+
+
+class Titulaire:
+    """
+    Meilleur positionnement connu, partagé entre les processus.
+
+    Parametres:
+        nb_ref (Entier): le nombre de références.
+
+        noms (liste de chaînes de caractères): les noms des stratégies.
+
+    >>> titulaire = Titulaire(4, ["a", "b"])
+    >>> titulaire.propose(np.array([[1, 3], [0, 2]]), 9.6, "b")
+    True
+    >>> titulaire.propose(np.array([[0, 1], [2, 3]]), 10., "a")
+    False
+    >>> titulaire.lit((2, 2))
+    (array([[1., 3.],
+           [0., 2.]]), 9.6, 'b')
+    """
+    def __init__(self, nb_ref, noms):
+        self.noms = list(noms)
+        self.verrou = Lock()
+        self.positionnement = Array("d", nb_ref, lock=False)
+        self.cout = Value("d", float("inf"), lock=False)
+        self.indice = Value("i", -1, lock=False)
+        self.arret = Event()
+
+    def propose(self, positionnement, cout, nom):
+        """Remplace le titulaire si cout est meilleur ; renvoie True dans ce cas."""
+        with self.verrou:
+            if cout >= self.cout.value:
+                return False
+            self.positionnement[:] = np.ravel(positionnement)
+            self.cout.value = cout
+            self.indice.value = self.noms.index(nom)
+            return True
+
+    def lit(self, forme, delai=None):
+        """
+        Copie du titulaire : positionnement (de taille forme), coût et nom de la stratégie (None s'il n'y en a pas).
+        Sans délai, on attend que le verrou soit libre.
+        """
+        # Sans délai, on attend le verrou ; avec un délai, si un processus a été arrêté en gardant le verrou,
+        # on lit quand même une fois le délai écoulé
+        verrouille = self.verrou.acquire() if delai is None else self.verrou.acquire(timeout=delai)
+        try:
+            indice = self.indice.value
+            return (np.array(self.positionnement).reshape(forme), self.cout.value,
+                    self.noms[indice] if indice >= 0 else None)
+        finally:
+            if verrouille:
+                self.verrou.release()
+
+
+def _cout(instance, positionnement):
+    from evaluation import evalue_position
+    return evalue_position(positionnement, instance.temps_entrepot, instance.proba)
+
+
+def _construit(nom, instance, titulaire, positionnement):
+    titulaire.propose(positionnement, _cout(instance, positionnement), nom)
+    return positionnement
+
+
+@strategie("abc")
+def _abc(instance, echeance, titulaire):
+    from abc_classique import ABC
+    return _construit("abc", instance, titulaire, ABC(instance.proba, instance.nb_rangees,
+                                                        instance.longueur_rangees, instance))
+
+
+@strategie("jacquard")
+def _jacquard(instance, echeance, titulaire):
+    from jaccard import balayage_seuil
+    return _construit("jacquard", instance, titulaire, balayage_seuil(
+        instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot, SEUILS,
+        instance=instance)[1])
+
+
+@strategie("spectral")
+def _spectral(instance, echeance, titulaire):
+    from spectral import spectral
+    return _construit("spectral", instance, titulaire, spectral(instance.proba, instance.nb_rangees,
+                                                                  instance.longueur_rangees, instance.temps_entrepot))
+
+
+def _recherche_locale(nom, depart, instance, echeance, titulaire):
+    """
+    Descente depuis depart, qui publie ses améliorations et s'abandonne si elle perd nettement.
+    """
+    from descente_locale import descente
+    debut = time()
+    grace = GRACE * (echeance - debut)
+
+    def rappel(evenement):
+        if evenement.nature == "amelioration":
+            titulaire.propose(evenement.positionnement, evenement.cout, nom)
+        if titulaire.arret.is_set():
+            return True
+        return time() - debut > grace and evenement.cout > titulaire.cout.value * (1 + ECART_ABANDON)
+
+    positionnement = descente(depart.copy(), instance=instance, temps_max=max(echeance - time(), 0.), rappel=rappel)
+    titulaire.propose(positionnement, _cout(instance, positionnement), nom)
+
+
+@strategie("descente_jacquard")
+def _descente_jacquard(instance, echeance, titulaire):
+    from jaccard import jacquard
+    depart = jacquard(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot, 0.1,
+                      instance)
+    _recherche_locale("descente_jacquard", depart, instance, echeance, titulaire)
+
+
+@strategie("descente_abc")
+def _descente_abc(instance, echeance, titulaire):
+    from abc_classique import ABC
+    depart = ABC(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance)
+    _recherche_locale("descente_abc", depart, instance, echeance, titulaire)
+
+
+@strategie("genetique")
+def _genetique(instance, echeance, titulaire):
+    from genetique import genetique, population_initiale
+    population = population_initiale(instance.proba, instance.nb_rangees, instance.longueur_rangees,
+                                     instance.temps_entrepot, TAILLE_POPULATION, instance=instance)
+    (positionnement, cout) = genetique(population, instance.proba, instance.temps_entrepot,
+                                       temps_max=max(echeance - time(), 0.))
+    titulaire.propose(positionnement, cout, "genetique")
+
+
+def _lance_strategie(nom, instance, echeance, titulaire):
+    # Chaque processus tire ses propres nombres aléatoires
+    random.seed()
+    np.random.seed()
+    STRATEGIES[nom](instance, echeance, titulaire)
+
+
+def portefeuille(instance, temps_budget, strategies=None):
+    """
+    Lance les stratégies en parallèle et renvoie le meilleur positionnement trouvé avant l'échéance.
+
+    Parametres:
+        instance (Instance): l'instance à résoudre.
+
+        temps_budget (Réel): temps de calcul maximal en secondes (plus DELAI_ARRET au pire pour arrêter
+            les stratégies).
+
+        strategies (liste de chaînes de caractères): les stratégies lancées (des clés de STRATEGIES).
+            Par défaut, toutes.
+
+    Return:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): le meilleur positionnement trouvé.
+
+        cout (Réel): son coût (cf evaluation.evalue_position).
+
+        strategie (Chaîne de caractères): la stratégie qui l'a trouvé ("cache" si c'est le meilleur
+            positionnement connu du cache de l'instance, "alea" si c'est le positionnement aléatoire
+            qui sert de point de départ lorsque le cache n'en a pas).
+
+    >>> from instance import Instance
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> (positionnement, cout, strategie) = portefeuille(Instance(proba, 2, 2), 1, ["abc", "descente_abc"])
+    >>> sorted(positionnement.ravel()), strategie in ("alea", "abc", "descente_abc")
+    ([0.0, 1.0, 2.0, 3.0], True)
+    >>> (positionnement, cout, strategie) = portefeuille(Instance(proba, 2, 2), 1, [])
+    >>> sorted(positionnement.ravel()), strategie
+    ([0.0, 1.0, 2.0, 3.0], 'alea')
+    """
+    debut = time()
+    echeance = debut + temps_budget
+    noms = list(STRATEGIES) if strategies is None else list(strategies)
+    forme = (instance.longueur_rangees, instance.nb_rangees)
+    titulaire = Titulaire(instance.nb_ref, noms + ["cache", "alea"])
+    meilleur_connu = instance.meilleur_positionnement()[0]
+    if meilleur_connu is None:
+        # Un positionnement valide est toujours renvoyé, même si aucune stratégie n'aboutit avant l'échéance
+        (meilleur_connu, nom_connu) = (alea(instance.longueur_rangees, instance.nb_rangees), "alea")
+    else:
+        nom_connu = "cache"
+    # Le coût enregistré dans le cache n'est pas repris : on le recalcule sur cette instance
+    titulaire.propose(meilleur_connu, _cout(instance, meilleur_connu), nom_connu)
+    # Les statistiques sont calculées une fois, avant de copier l'instance dans les processus
+    for statistique in ("temps_entrepot", "frequence", "jaccard"):
+        getattr(instance, statistique)
+
+    processus = [Process(target=_lance_strategie, args=(nom, instance, echeance, titulaire), daemon=True)
+                 for nom in noms]
+    for processus_strategie in processus:
+        processus_strategie.start()
+    for processus_strategie in processus:
+        processus_strategie.join(max(echeance - time(), 0.))
+
+    titulaire.arret.set()
+    for processus_strategie in processus:
+        processus_strategie.join(DELAI_ARRET)
+        if processus_strategie.is_alive():
+            processus_strategie.terminate()
+            processus_strategie.join()
+
+    (positionnement, cout, nom) = titulaire.lit(forme, DELAI_ARRET)
+    if nom != "cache":
+        instance.propose_positionnement(positionnement, cout)
+    return positionnement, cout, nom
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,241 @@
+"""
+Ce module regroupe les politiques de routage du robot dans l'entrepôt de evaluation.sshape
+(entrée au milieu de l'allée avant, une allée à droite de chaque rangée, une allée transversale
+au fond et une à l'avant).
+-------
+Chaque politique donne le tableau des temps de récupération de chaque paire de places,
+calculé sans boucle sur les places. Les TAILLE_CACHE derniers tableaux calculés sont gardés en mémoire
+et partagés en lecture seule : revenir à une géométrie et une politique récentes ne coûte rien
+(table_temps.cache_clear() libère cette mémoire).
+    - "sshape" : on traverse les rangées ou on rebrousse chemin, au plus court.
+    - "retour" : on entre dans chaque rangée par l'avant et on en ressort par l'avant.
+    - "point_milieu" : les casiers de la moitié avant sont pris par l'avant, ceux de la moitié du fond
+      par l'allée du fond, ce qui oblige à traverser la première et la dernière rangée visitées.
+    - "plus_grand_ecart" : la première et la dernière rangée visitées sont traversées, les autres
+      sont prises par l'avant et par le fond sans franchir le plus grand écart entre casiers.
+Pour deux références, point_milieu et plus_grand_ecart ne diffèrent que lorsque les deux
+références sont dans la moitié avant ; une référence seule (diagonale) est prise de la même
+manière par toutes les politiques.
+Pour les très grands entrepôts, TempsImplicite calcule ces temps à la demande, sans tableau.
+"""
+
+from functools import lru_cache
+import numpy as np
+from triangulaire import MatriceTriangulaire, taille_triangulaire, indices_diffuses
+
+# Nombre de lignes du tableau calculées ensemble, pour borner la mémoire des tableaux intermédiaires
+TAILLE_BLOC = 1024
+# Nombre de tableaux gardés en mémoire (chacun est de taille nb_places²)
+TAILLE_CACHE = 2
+
+POLITIQUES = {}
+
+
+def politique_routage(nom):
+    """
+    Enregistre une politique de routage sous le nom "nom".
+    La fonction décorée reçoit les caractéristiques de deux ensembles de places (cf geometrie_places)
+    et renvoie leurs temps de récupération.
+    """
+    def enregistre(fonction):
+        POLITIQUES[nom] = fonction
+        return fonction
+    return enregistre
+
+
+def geometrie_places(longueur_rangees, nb_rangees, places):
+    """
+    Donne, pour chaque place codée en 1D [rangee + casier * nb_rangees], sa rangée,
+    l'abscisse de son allée, la distance de cette allée à l'entrée et sa profondeur depuis l'allée avant.
+
+    >>> geometrie_places(2, 2, np.arange(4))
+    (array([0, 1, 0, 1]), array([3, 5, 3, 5]), array([0, 2, 0, 2]), array([2, 2, 1, 1]))
+    """
+    rangee = places % nb_rangees
+    casier = places // nb_rangees
+    allee = 3 + 2 * rangee
+    entree = (nb_rangees * 2 + 1) // 2 + 1
+
+    return rangee, allee, np.abs(allee - entree), longueur_rangees - casier
+
+
+def _retour_meme_rangee(ecart1, profondeur1, profondeur2):
+    """On monte jusqu'à la référence la plus profonde et on revient."""
+    return 2 * (1 + ecart1 + np.maximum(profondeur1, profondeur2))
+
+
+def _traverse(longueur_rangees, allee1, ecart1, allee2, ecart2):
+    """On traverse la première rangée jusqu'au fond et on revient par la seconde."""
+    return 2 + ecart1 + 2 * (longueur_rangees + 1) + np.abs(allee1 - allee2) + ecart2
+
+
+def _retour(allee1, ecart1, profondeur1, allee2, ecart2, profondeur2):
+    """On entre par l'avant dans chaque rangée et on rebrousse chemin."""
+    return 2 + ecart1 + 2 * profondeur1 + np.abs(allee1 - allee2) + 2 * profondeur2 + ecart2
+
+
+@politique_routage("sshape")
+def _temps_sshape(longueur_rangees, place1, place2):
+    (rangee1, allee1, ecart1, profondeur1) = place1
+    (rangee2, allee2, ecart2, profondeur2) = place2
+    return np.where(rangee1 == rangee2, _retour_meme_rangee(ecart1, profondeur1, profondeur2),
+                    np.minimum(_traverse(longueur_rangees, allee1, ecart1, allee2, ecart2),
+                               _retour(allee1, ecart1, profondeur1, allee2, ecart2, profondeur2)))
+
+
+@politique_routage("retour")
+def _temps_retour(longueur_rangees, place1, place2):
+    (rangee1, allee1, ecart1, profondeur1) = place1
+    (rangee2, allee2, ecart2, profondeur2) = place2
+    return np.where(rangee1 == rangee2, _retour_meme_rangee(ecart1, profondeur1, profondeur2),
+                    _retour(allee1, ecart1, profondeur1, allee2, ecart2, profondeur2))
+
+
+@politique_routage("point_milieu")
+def _temps_point_milieu(longueur_rangees, place1, place2):
+    (rangee1, allee1, ecart1, profondeur1) = place1
+    (rangee2, allee2, ecart2, profondeur2) = place2
+    avant = (2 * profondeur1 <= longueur_rangees) & (2 * profondeur2 <= longueur_rangees)
+    return np.where(rangee1 == rangee2, _retour_meme_rangee(ecart1, profondeur1, profondeur2),
+                    np.where(avant, _retour(allee1, ecart1, profondeur1, allee2, ecart2, profondeur2),
+                             _traverse(longueur_rangees, allee1, ecart1, allee2, ecart2)))
+
+
+@politique_routage("plus_grand_ecart")
+def _temps_plus_grand_ecart(longueur_rangees, place1, place2):
+    (rangee1, allee1, ecart1, profondeur1) = place1
+    (rangee2, allee2, ecart2, profondeur2) = place2
+    # Avec deux références dans deux rangées, ce sont la première et la dernière : on les traverse
+    return np.where(rangee1 == rangee2, _retour_meme_rangee(ecart1, profondeur1, profondeur2),
+                    _traverse(longueur_rangees, allee1, ecart1, allee2, ecart2))
+
+
+@lru_cache(maxsize=TAILLE_CACHE)
+def table_temps(politique, longueur_rangees, nb_rangees):
+    """
+    Calcule (une seule fois par géométrie) le temps de récupération de chaque paire de places.
+    Le tableau renvoyé est partagé : il est en lecture seule, et le code qui doit le modifier en fait une copie.
+
+    Paramètres:
+        politique (Chaîne de caractères): le nom de la politique de routage (une clé de POLITIQUES).
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+    Return:
+        temps (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+    >>> table_temps("retour", 2, 2)
+    array([[ 6., 14.,  6., 12.],
+           [14., 10., 12., 10.],
+           [ 6., 12.,  4., 10.],
+           [12., 10., 10.,  8.]])
+    >>> table_temps("retour", 2, 2) is table_temps("retour", 2, 2)
+    True
+    """
+    if politique not in POLITIQUES:
+        raise ValueError("Politique de routage inconnue : {} (connues : {})".format(
+            politique, ", ".join(sorted(POLITIQUES))))
+    nb_places = longueur_rangees * nb_rangees
+    colonnes = geometrie_places(longueur_rangees, nb_rangees, np.arange(nb_places))
+    temps = np.empty((nb_places, nb_places))
+
+    for debut in range(0, nb_places, TAILLE_BLOC):
+        lignes = geometrie_places(longueur_rangees, nb_rangees, np.arange(debut, min(debut + TAILLE_BLOC, nb_places)))
+        temps[debut: debut + TAILLE_BLOC] = POLITIQUES[politique](
+            longueur_rangees, [caracteristique[:, None] for caracteristique in lignes],
+            [caracteristique[None, :] for caracteristique in colonnes])
+
+    temps.flags.writeable = False
+    return temps
+
+
+@lru_cache(maxsize=TAILLE_CACHE)
+def table_temps_triangulaire(politique, longueur_rangees, nb_rangees):
+    """
+    Comme table_temps, mais seul le triangle supérieur est calculé et gardé (cf triangulaire.MatriceTriangulaire) :
+    la matrice pleine n'est jamais construite. Le tableau renvoyé est partagé : il est en lecture seule.
+
+    >>> bool(np.array_equal(np.asarray(table_temps_triangulaire("retour", 2, 2)), table_temps("retour", 2, 2)))
+    True
+    """
+    if politique not in POLITIQUES:
+        raise ValueError("Politique de routage inconnue : {} (connues : {})".format(
+            politique, ", ".join(sorted(POLITIQUES))))
+    nb_places = longueur_rangees * nb_rangees
+    places = np.arange(nb_places)
+    colonnes = geometrie_places(longueur_rangees, nb_rangees, places)
+    valeurs = np.empty(taille_triangulaire(nb_places))
+
+    rempli = 0
+    for debut in range(0, nb_places, TAILLE_BLOC):
+        lignes_bloc = places[debut: debut + TAILLE_BLOC]
+        lignes = geometrie_places(longueur_rangees, nb_rangees, lignes_bloc)
+        bloc = POLITIQUES[politique](longueur_rangees, [caracteristique[:, None] for caracteristique in lignes],
+                                     [caracteristique[None, :] for caracteristique in colonnes])
+        # La sélection booléenne parcourt le bloc ligne par ligne : c'est l'ordre du triangle
+        triangle = bloc[lignes_bloc[:, None] <= places[None, :]]
+        valeurs[rempli: rempli + len(triangle)] = triangle
+        rempli += len(triangle)
+
+    valeurs.flags.writeable = False
+    return MatriceTriangulaire(valeurs, nb_places)
+
+
+class TempsImplicite:
+    """
+    Temps de récupération de chaque paire de places, calculés à la demande à partir de la géométrie
+    des places : la mémoire est en O(nb_places) au lieu de O(nb_places²), au prix d'un calcul par lecture.
+    S'indexe comme le tableau de table_temps (entiers, tableaux d'indices qui se diffusent, tranches).
+
+    Parametres:
+        politique (Chaîne de caractères): le nom de la politique de routage (une clé de POLITIQUES).
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+    >>> temps = TempsImplicite("retour", 2, 2)
+    >>> temps[0, 1], temps[np.array([0, 3]), np.array([1, 2])], temps[1]
+    (14.0, array([14., 10.]), array([14., 10., 12., 10.]))
+    >>> bool(np.array_equal(np.asarray(temps), table_temps("retour", 2, 2)))
+    True
+    """
+    def __init__(self, politique, longueur_rangees, nb_rangees):
+        if politique not in POLITIQUES:
+            raise ValueError("Politique de routage inconnue : {} (connues : {})".format(
+                politique, ", ".join(sorted(POLITIQUES))))
+        self.politique = politique
+        self.longueur_rangees = int(longueur_rangees)
+        self.nb_rangees = int(nb_rangees)
+        self.nb = self.longueur_rangees * self.nb_rangees
+        self.geometrie = geometrie_places(self.longueur_rangees, self.nb_rangees, np.arange(self.nb))
+
+    @property
+    def shape(self):
+        return (self.nb, self.nb)
+
+    def __len__(self):
+        return self.nb
+
+    def __getitem__(self, cle):
+        (lignes, colonnes) = indices_diffuses(cle, self.nb)
+        temps = POLITIQUES[self.politique](self.longueur_rangees,
+                                           [caracteristique[lignes] for caracteristique in self.geometrie],
+                                           [caracteristique[colonnes] for caracteristique in self.geometrie])
+        # [()] renvoie un réel pour une seule paire
+        return np.asarray(temps, dtype=float)[()]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[:, :], dtype=dtype)
+
+    def copy(self):
+        # Rien n'est stocké en dehors de la géométrie, qui n'est jamais modifiée
+        return self
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
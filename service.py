@@ -0,0 +1,280 @@
+"""
+Ce module est un service local d'évaluation de positionnements, pour les outils qui en évaluent
+des milliers par minute sans relancer Python à chaque fois :
+    python service.py --socket /tmp/mopsi.sock entrepot5x6_30
+-------
+Le service garde en mémoire les instances (matrice des probabilités et temps de l'entrepôt) ; une instance
+demandée pour la première fois est chargée dans un fil d'exécution à part, une seule fois.
+Le protocole est une requête JSON par ligne, sur un socket Unix ou en TCP sur localhost :
+    {"id": 1, "instance": "entrepot5x6_30", "positionnement": [[...], ...]}
+et la réponse, sur une ligne, porte le même id :
+    {"id": 1, "cout": 10.7, "contributions": [...]}   ou   {"id": 1, "erreur": "..."}
+Les contributions sont celles de evaluation.contributions_positions (leur somme est le coût).
+Les requêtes qui arrivent ensemble (pendant DELAI_LOT secondes) pour une même instance sont
+évaluées en un seul appel vectorisé, dans un fil d'exécution à part pour ne pas bloquer le service.
+"""
+
+import asyncio
+import json
+import numpy as np
+from evaluation import contributions_positions
+
+# Temps d'attente des autres requêtes avant d'évaluer un lot, en secondes
+DELAI_LOT = 0.002
+# Nombre maximal de positionnements évalués ensemble
+TAILLE_LOT = 256
+
+
+class ServiceEvaluation:
+    """
+    Service d'évaluation de positionnements, par lots.
+
+    Parametres:
+        cache (CacheDisque): cache sur le disque des statistiques des instances chargées, facultatif.
+
+        politique (Chaîne de caractères): la politique de routage du robot des instances chargées.
+
+    >>> import tempfile
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> async def exemple(chemin_socket):
+    ...     service = ServiceEvaluation()
+    ...     service.ajoute_instance("petite", proba, 2, 2)
+    ...     serveur = await service.lance(chemin_socket=chemin_socket)
+    ...     client = await ClientEvaluation.connecte(chemin_socket=chemin_socket)
+    ...     reponses = await asyncio.gather(client.evalue("petite", [[1, 3], [0, 2]]),
+    ...                                     client.evalue("petite", [[0, 1], [2, 3]]),
+    ...                                     client.evalue("petite", [[0, 1]]))
+    ...     await client.ferme()
+    ...     serveur.close()
+    ...     await serveur.wait_closed()
+    ...     return [round(reponse["cout"], 10) for reponse in reponses[:2]], reponses[2]["erreur"], service.nb_lots
+    >>> with tempfile.TemporaryDirectory() as repertoire:
+    ...     asyncio.run(exemple(repertoire + "/service.sock"))
+    ([9.6, 9.0], 'Le positionnement est de taille (1, 2) au lieu de (2, 2).', 1)
+    """
+    def __init__(self, cache=None, politique="sshape"):
+        self.cache = cache
+        self.politique = politique
+        self.instances = {}
+        self.nb_lots = 0
+        self.nb_requetes = 0
+        self._en_attente = {}
+        self._chargements = {}
+
+    def ajoute_instance(self, nom, proba, longueur_rangees, nb_rangees, temps_entrepot=None):
+        """
+        Garde une instance en mémoire sous le nom "nom".
+        """
+        from instance import Instance
+        instance = _prepare(Instance(proba, longueur_rangees, nb_rangees, self.cache, temps_entrepot, self.politique))
+        self.instances[nom] = instance
+        return instance
+
+    def _charge(self, nom):
+        from instance import Instance
+        return _prepare(Instance.depuis_fichier(nom, self.cache, self.politique))
+
+    def instance(self, nom):
+        """
+        Instance de nom "nom", chargée depuis son fichier (sans .txt) si elle n'est pas en mémoire.
+        Cette méthode bloque pendant le chargement : dans le service, on utilise charge_instance.
+        """
+        if nom not in self.instances:
+            self.instances[nom] = self._charge(nom)
+        return self.instances[nom]
+
+    async def charge_instance(self, nom):
+        """
+        Instance de nom "nom", chargée à la première demande dans un fil d'exécution à part,
+        pour ne pas bloquer les autres requêtes. Les demandes qui arrivent pendant le chargement
+        attendent le même chargement.
+        """
+        if nom in self.instances:
+            return self.instances[nom]
+        if nom not in self._chargements:
+            self._chargements[nom] = asyncio.get_running_loop().run_in_executor(None, self._charge, nom)
+        chargement = self._chargements[nom]
+        try:
+            instance = await chargement
+        finally:
+            # Après un échec, la demande suivante relance le chargement
+            if self._chargements.get(nom) is chargement:
+                del self._chargements[nom]
+        self.instances.setdefault(nom, instance)
+        return self.instances[nom]
+
+    async def evalue(self, nom, positionnement):
+        """
+        Evalue un positionnement sur l'instance "nom", avec les autres requêtes du même lot.
+
+        Return:
+            cout (Réel): le temps moyen du positionnement.
+
+            contributions (Array de taille nb_ref): la contribution de chaque référence au coût.
+        """
+        instance = await self.charge_instance(nom)
+        positionnement = np.asarray(positionnement, dtype=float)
+        forme = (instance.longueur_rangees, instance.nb_rangees)
+        if positionnement.shape != forme:
+            raise ValueError("Le positionnement est de taille {} au lieu de {}.".format(positionnement.shape, forme))
+        if not np.array_equal(np.sort(positionnement.ravel()), np.arange(instance.nb_ref)):
+            raise ValueError("Le positionnement doit contenir chaque référence une fois.")
+
+        resultat = asyncio.get_running_loop().create_future()
+        attente = self._en_attente.setdefault(nom, [])
+        attente.append((positionnement, resultat))
+        if len(attente) == 1:
+            asyncio.get_running_loop().create_task(self._traite_lot(nom))
+        contributions = await resultat
+        return float(contributions.sum()), contributions
+
+    async def _traite_lot(self, nom):
+        # On laisse arriver les autres requêtes
+        await asyncio.sleep(DELAI_LOT)
+        attente = self._en_attente.pop(nom)
+        (lot, reste) = (attente[:TAILLE_LOT], attente[TAILLE_LOT:])
+        if reste:
+            self._en_attente[nom] = reste
+            asyncio.get_running_loop().create_task(self._traite_lot(nom))
+
+        instance = self.instances[nom]
+        self.nb_lots += 1
+        self.nb_requetes += len(lot)
+        try:
+            contributions = await asyncio.get_running_loop().run_in_executor(
+                None, contributions_positions, np.array([positionnement for (positionnement, _) in lot]),
+                instance.temps_entrepot, instance.proba, None, instance.proba_symetrique)
+        except Exception as erreur:
+            for (_, resultat) in lot:
+                resultat.set_exception(erreur)
+            return
+        for ((_, resultat), contributions_positionnement) in zip(lot, contributions):
+            resultat.set_result(contributions_positionnement)
+
+    async def _repond(self, ligne, ecrivain, verrou):
+        reponse = {}
+        try:
+            requete = json.loads(ligne)
+            reponse["id"] = requete.get("id")
+            (cout, contributions) = await self.evalue(requete["instance"], requete["positionnement"])
+            reponse.update(cout=cout, contributions=contributions.tolist())
+        except Exception as erreur:
+            reponse["erreur"] = str(erreur)
+        async with verrou:
+            ecrivain.write(json.dumps(reponse).encode() + b"\n")
+            await ecrivain.drain()
+
+    async def _connexion(self, lecteur, ecrivain):
+        # Les requêtes d'une connexion sont traitées en même temps : un client peut en envoyer plusieurs d'avance
+        verrou = asyncio.Lock()
+        taches = []
+        while True:
+            ligne = await lecteur.readline()
+            if not ligne:
+                break
+            taches.append(asyncio.create_task(self._repond(ligne, ecrivain, verrou)))
+        await asyncio.gather(*taches)
+        ecrivain.close()
+
+    async def lance(self, chemin_socket=None, hote="127.0.0.1", port=0):
+        """
+        Démarre le service sur un socket Unix (chemin_socket) ou, sinon, en TCP sur hote:port.
+
+        Return:
+            serveur (asyncio.Server): le serveur, à fermer avec close().
+        """
+        if chemin_socket is not None:
+            return await asyncio.start_unix_server(self._connexion, path=chemin_socket)
+        return await asyncio.start_server(self._connexion, hote, port)
+
+
+def _prepare(instance):
+    # Calculés une fois pour toutes au chargement, et non pendant l'évaluation d'un lot
+    (instance.temps_entrepot, instance.proba_symetrique)
+    return instance
+
+
+class ClientEvaluation:
+    """
+    Client du service d'évaluation. Plusieurs requêtes peuvent être en cours en même temps
+    sur la même connexion (cf ServiceEvaluation pour un exemple).
+    """
+    def __init__(self, lecteur, ecrivain):
+        self.lecteur = lecteur
+        self.ecrivain = ecrivain
+        self._numero = 0
+        self._en_cours = {}
+        self._lecture = asyncio.get_running_loop().create_task(self._lit_reponses())
+
+    @classmethod
+    async def connecte(cls, chemin_socket=None, hote="127.0.0.1", port=None):
+        """Se connecte au service sur un socket Unix (chemin_socket) ou en TCP sur hote:port."""
+        if chemin_socket is not None:
+            (lecteur, ecrivain) = await asyncio.open_unix_connection(chemin_socket)
+        else:
+            (lecteur, ecrivain) = await asyncio.open_connection(hote, port)
+        return cls(lecteur, ecrivain)
+
+    async def _lit_reponses(self):
+        while True:
+            ligne = await self.lecteur.readline()
+            if not ligne:
+                break
+            reponse = json.loads(ligne)
+            self._en_cours.pop(reponse["id"]).set_result(reponse)
+
+    async def evalue(self, instance, positionnement):
+        """
+        Evalue un positionnement sur une instance du service.
+
+        Return:
+            reponse (dictionnaire): cout et contributions, ou erreur.
+        """
+        self._numero += 1
+        resultat = asyncio.get_running_loop().create_future()
+        self._en_cours[self._numero] = resultat
+        requete = {"id": self._numero, "instance": instance, "positionnement": np.asarray(positionnement).tolist()}
+        self.ecrivain.write(json.dumps(requete).encode() + b"\n")
+        await self.ecrivain.drain()
+        return await resultat
+
+    async def ferme(self):
+        """Ferme la connexion une fois les réponses reçues."""
+        self.ecrivain.write_eof()
+        await self._lecture
+        self.ecrivain.close()
+        await self.ecrivain.wait_closed()
+
+
+def main(arguments=None):
+    """
+    Lance le service depuis la ligne de commande, jusqu'à son interruption.
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Service local d'évaluation de positionnements.")
+    parser.add_argument("instances", nargs="*", help="instances chargées au démarrage (sans .txt)")
+    parser.add_argument("--socket", help="chemin du socket Unix (sinon, TCP sur localhost)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--politique", default="sshape", help="politique de routage du robot")
+    parser.add_argument("--cache", action="store_true", help="utilise le cache sur le disque")
+    arguments = parser.parse_args(arguments)
+
+    cache = None
+    if arguments.cache:
+        from cache import CacheDisque
+        cache = CacheDisque()
+    service = ServiceEvaluation(cache, arguments.politique)
+    for nom in arguments.instances:
+        service.instance(nom)
+
+    async def sert():
+        serveur = await service.lance(arguments.socket, port=arguments.port)
+        print("Service prêt sur {}".format(arguments.socket or serveur.sockets[0].getsockname()))
+        async with serveur:
+            await serveur.serve_forever()
+    asyncio.run(sert())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Ce module permet de simuler l'activité de l'entrepôt pour valider evalue_position
+et estimer la queue de distribution du temps des tournées, pas seulement sa moyenne.
+-------
+Une commande est une paire de références (i, j), i < j, tirée avec une probabilité proportionnelle
+à proba[i, j] (le triangle supérieur, comme dans evalue_position). Sa tournée dure
+temps_entrepot[place_i, place_j].
+Les commandes sont tirées par lots de taille fixe (mémoire constante) par inversion de la fonction
+de répartition. On ne garde que le nombre de tournées de chaque durée possible : la moyenne
+et les quantiles de l'échantillon sont exacts, quelle que soit sa taille.
+"""
+
+from time import perf_counter
+import numpy as np
+from evaluation import places_references
+
+# Nombre de commandes tirées à la fois
+TAILLE_LOT = 2 ** 20
+QUANTILES = (50, 90, 95, 99)
+
+
+def _paires(proba):
+    """
+    Couples (i < j) de probabilité non nulle, et leur fonction de répartition normalisée.
+    """
+    proba = np.asarray(proba, dtype=float)
+    (refs1, refs2) = np.nonzero(np.triu(proba, 1))
+    poids = proba[refs1, refs2]
+    return refs1, refs2, poids, np.cumsum(poids) / poids.sum()
+
+
+def _durees(positionnement, temps_entrepot, refs1, refs2):
+    """
+    Durées distinctes des tournées et, pour chaque paire, l'indice de sa durée.
+    """
+    places = places_references(positionnement)
+    return np.unique(temps_entrepot[places[refs1], places[refs2]], return_inverse=True)
+
+
+def _statistiques(durees, effectifs, masse, quantiles):
+    """
+    Moyenne, écart-type et quantiles d'une distribution donnée par ses valeurs et leurs effectifs.
+    """
+    frequences = effectifs / effectifs.sum()
+    moyenne = float(frequences @ durees)
+    repartition = np.cumsum(frequences)
+    indices = np.minimum(np.searchsorted(repartition, np.array(quantiles) / 100 - 1e-12), len(durees) - 1)
+
+    return {"moyenne": moyenne,
+            "ecart_type": float(np.sqrt(max(frequences @ durees ** 2 - moyenne ** 2, 0))),
+            "quantiles": {quantile: float(durees[indice]) for (quantile, indice) in zip(quantiles, indices)},
+            # Valeur comparable à evalue_position, qui somme proba sur le triangle supérieur sans normaliser
+            "esperance": moyenne * masse,
+            # Nombre de commandes traitées par unité de temps (un seul robot)
+            "debit": 1 / moyenne}
+
+
+def distribution_exacte(positionnement, temps_entrepot, proba, quantiles=QUANTILES):
+    """
+    Calcule exactement, sans tirage, la distribution du temps des tournées.
+
+    Parametres:
+        positionnement (Array de taille (longueur_rangees, nb_rangees)): la position des références.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        quantiles (liste de réels): les quantiles (en pourcentage) à calculer.
+
+    Return:
+        statistiques (dictionnaire): moyenne, ecart_type, quantiles, esperance (comparable à evalue_position)
+            et debit (commandes par unité de temps).
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> from evaluation import evalue_entrepot
+    >>> statistiques = distribution_exacte(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2), proba)
+    >>> round(statistiques["esperance"], 10), statistiques["quantiles"]
+    (9.6, {50: 10.0, 90: 12.0, 95: 12.0, 99: 12.0})
+    """
+    (refs1, refs2, poids, _) = _paires(proba)
+    (durees, indices) = _durees(positionnement, temps_entrepot, refs1, refs2)
+    return _statistiques(durees, np.bincount(indices, weights=poids, minlength=len(durees)), poids.sum(),
+                         quantiles)
+
+
+def simule(positionnements, temps_entrepot, proba, nb_commandes=10 ** 6, graine=0, quantiles=QUANTILES,
+           taille_lot=TAILLE_LOT):
+    """
+    Simule nb_commandes commandes sur un ou plusieurs positionnements.
+    Tous les positionnements voient les mêmes commandes, ce qui rend leurs écarts plus précis.
+
+    Parametres:
+        positionnements (Array de taille (longueur_rangees, nb_rangees) ou (nb_positionnements, longueur_rangees,
+            nb_rangees)): le ou les positionnements à simuler.
+
+        temps_entrepot (Array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+
+        proba (Array de taille (nb_ref, nb_ref)): matrice des probabilités des commandes.
+
+        nb_commandes (Entier): nombre de commandes simulées.
+
+        graine (Entier): graine du générateur aléatoire.
+
+        quantiles (liste de réels): les quantiles (en pourcentage) à calculer.
+
+        taille_lot (Entier): nombre de commandes tirées à la fois ; la mémoire utilisée en dépend, pas nb_commandes.
+
+    Return:
+        statistiques (dictionnaire ou liste de dictionnaires): pour chaque positionnement, comme
+            distribution_exacte, plus "vitesse", le nombre de commandes simulées par seconde.
+
+    >>> proba = np.array([[0.0, 0.2, 0.4, 0.0], [0.2, 0, 0.1, 0.1], [0.4, 0.1, 0.0, 0.2], [0.0, 0.1, 0.3, 0.0]])
+    >>> from evaluation import evalue_entrepot
+    >>> statistiques = simule(np.array([[1, 3], [0, 2]]), evalue_entrepot(2, 2), proba, 10 ** 5, taille_lot=10 ** 4)
+    >>> abs(statistiques["esperance"] - 9.6) < 0.05
+    True
+    """
+    positionnements = np.asarray(positionnements)
+    un_seul = positionnements.ndim == 2
+    if un_seul:
+        positionnements = positionnements[None]
+
+    generateur = np.random.default_rng(graine)
+    (refs1, refs2, poids, repartition) = _paires(proba)
+    durees = [_durees(positionnement, temps_entrepot, refs1, refs2) for positionnement in positionnements]
+    effectifs = [np.zeros(len(valeurs)) for (valeurs, _) in durees]
+
+    debut = perf_counter()
+    for debut_lot in range(0, nb_commandes, taille_lot):
+        tirages = generateur.random(min(taille_lot, nb_commandes - debut_lot))
+        paires = np.minimum(np.searchsorted(repartition, tirages, side="right"), len(repartition) - 1)
+        for ((valeurs, indices), effectif) in zip(durees, effectifs):
+            effectif += np.bincount(indices[paires], minlength=len(valeurs))
+    vitesse = nb_commandes / max(perf_counter() - debut, 1e-12)
+
+    resultats = []
+    for ((valeurs, _), effectif) in zip(durees, effectifs):
+        statistiques = _statistiques(valeurs, effectif, poids.sum(), quantiles)
+        statistiques["vitesse"] = vitesse
+        resultats.append(statistiques)
+
+    return resultats[0] if un_seul else resultats
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
+
+    from generateur import matrice_proba
+    from evaluation import evalue_entrepot, evalue_position
+    from alea import alea
+
+    LONGUEUR_RANGEES = 30
+    NB_RANGEES = 36
+    PROBA = matrice_proba(LONGUEUR_RANGEES * NB_RANGEES)
+    TEMPS_ENTREPOT = evalue_entrepot(LONGUEUR_RANGEES, NB_RANGEES)
+    POSITIONNEMENT = alea(LONGUEUR_RANGEES, NB_RANGEES)
+
+    print("evalue_position : {}".format(evalue_position(POSITIONNEMENT, TEMPS_ENTREPOT, PROBA)))
+    print("Distribution exacte : {}".format(distribution_exacte(POSITIONNEMENT, TEMPS_ENTREPOT, PROBA)))
+    print("Simulation : {}".format(simule(POSITIONNEMENT, TEMPS_ENTREPOT, PROBA, 10 ** 7)))
@@ -0,0 +1,172 @@
+"""
+Ce module permet de générer un emplacement par ordonnancement spectral.
+On plonge les références sur une droite avec le vecteur de Fiedler du graphe
+des co-commandes (indices de Jacquard). L'ordre obtenu est découpé en groupes
+d'une rangée : les groupes les plus fréquents vont dans les rangées les plus
+proches de l'entrée, et dans chaque rangée les références les plus fréquentes
+vont dans les casiers les plus proches.
+Les matrices sont creuses : l'heuristique passe à l'échelle de 100 000 références.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import eigsh
+from evaluation import distance_entree, evalue_entrepot
+
+# En dessous de cette taille, on calcule les valeurs propres de manière dense
+TAILLE_DENSE = 200
+
+
+def graphe_commandes(historique):
+    """
+    Construit le graphe creux des co-commandes, pondéré par les indices de Jacquard.
+    Seuls les couples de références commandés ensemble sont stockés.
+
+    Paramètres:
+        historique (array ou matrice creuse de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+    Return:
+        graphe (scipy.sparse.csr_matrix de taille (nb_ref, nb_ref)) : graphe symétrique sans boucle.
+
+        frequence (array de taille nb_ref) : fréquence de commande de chaque référence.
+
+    >>> graphe, frequence = graphe_commandes(np.array([[0, 2, 4], [2, 0, 3], [4, 3, 1]]))
+    >>> graphe.toarray().round(3)
+    array([[0.   , 0.222, 0.4  ],
+           [0.222, 0.   , 0.3  ],
+           [0.4  , 0.3  , 0.   ]])
+    """
+    historique = sparse.csr_matrix(historique, dtype=float)
+    frequence = np.asarray(historique.sum(axis=1)).ravel()
+
+    # Comme indice_jacquard, on lit le triangle supérieur et on le recopie par symétrie
+    haut = sparse.triu(historique, 1).tocoo()
+    denominateur = frequence[haut.row] + frequence[haut.col] - haut.data
+    poids = np.divide(haut.data, denominateur, out=np.zeros(len(haut.data)), where=denominateur != 0)
+    graphe = sparse.coo_matrix((poids, (haut.row, haut.col)), shape=historique.shape).tocsr()
+    graphe.eliminate_zeros()
+
+    return graphe + graphe.T, frequence
+
+
+def vecteur_fiedler(graphe):
+    """
+    Calcule le vecteur de Fiedler (deuxième plus petit vecteur propre du laplacien normalisé)
+    d'un graphe connexe.
+
+    Paramètres:
+        graphe (scipy.sparse.csr_matrix de taille (n, n)) : graphe connexe et symétrique.
+
+    Return:
+        fiedler (array de taille n) : la coordonnée de chaque sommet sur la droite.
+
+    >>> chemin = sparse.csr_matrix(np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0.]]))
+    >>> np.argsort(vecteur_fiedler(chemin)).tolist() in ([0, 1, 2], [2, 1, 0])
+    True
+    """
+    degre = np.asarray(graphe.sum(axis=1)).ravel()
+    inverse_racine = 1 / np.sqrt(degre)
+    # Les plus grands vecteurs propres de D^-1/2 W D^-1/2 sont les plus petits du laplacien normalisé
+    adjacence = sparse.diags(inverse_racine) @ graphe @ sparse.diags(inverse_racine)
+
+    if graphe.shape[0] <= TAILLE_DENSE:
+        (_, vecteurs) = np.linalg.eigh(adjacence.toarray())
+        return inverse_racine * vecteurs[:, -2]
+
+    depart = np.random.default_rng(0).random(graphe.shape[0])
+    # Une précision grossière suffit pour ordonner les sommets, et coûte beaucoup moins d'itérations
+    (valeurs, vecteurs) = eigsh(adjacence, k=2, which="LA", v0=depart, tol=1e-3)
+    return inverse_racine * vecteurs[:, np.argsort(valeurs)[0]]
+
+
+def ordre_spectral(historique):
+    """
+    Ordonne les références pour que les références souvent commandées ensemble soient voisines.
+    Les composantes connexes sont traitées séparément, de la plus fréquente à la moins fréquente,
+    et chacune est orientée pour commencer par ses références les plus fréquentes.
+
+    Paramètres:
+        historique (array ou matrice creuse de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+    Return:
+        ordre (array d'entiers de taille nb_ref) : les références dans l'ordre spectral.
+
+    >>> historique = np.array([[0, 5, 1, 0], [5, 0, 0, 0], [1, 0, 0, 2], [0, 0, 2, 0]])
+    >>> ordre_spectral(historique)
+    array([1, 0, 2, 3])
+    """
+    (graphe, frequence) = graphe_commandes(historique)
+    (nb_composantes, composante) = connected_components(graphe, directed=False)
+    frequence_composantes = np.bincount(composante, weights=frequence, minlength=nb_composantes)
+    taille_composantes = np.bincount(composante, minlength=nb_composantes)
+
+    # Les références isolées sont simplement triées par fréquence décroissante
+    isolees = np.flatnonzero(taille_composantes[composante] == 1)
+    blocs = [(frequence[isolees].sum(), isolees[np.argsort(-frequence[isolees], kind="stable")])]
+
+    membres_composantes = np.argsort(composante, kind="stable")
+    debuts = np.concatenate(([0], np.cumsum(taille_composantes)))
+    for index in np.flatnonzero(taille_composantes > 1):
+        membres = membres_composantes[debuts[index]: debuts[index + 1]]
+        fiedler = vecteur_fiedler(graphe[membres][:, membres])
+        ordre = membres[np.argsort(fiedler, kind="stable")]
+        # On commence par l'extrémité la plus fréquente
+        moitie = len(ordre) // 2
+        if frequence[ordre[:moitie]].sum() < frequence[ordre[len(ordre) - moitie:]].sum():
+            ordre = ordre[::-1]
+        blocs.append((frequence_composantes[index], ordre))
+
+    blocs.sort(key=lambda bloc: -bloc[0])
+    return np.concatenate([ordre for (_, ordre) in blocs]).astype(int)
+
+
+def spectral(historique, nb_rangees, longueur_rangees, temps_entrepot=None):
+    """
+    Crée un positionnement des références à partir de l'ordre spectral.
+
+    Paramètres:
+        historique (array ou matrice creuse de taille (nb_ref, nb_ref)) : matrice des probabilités des commandes.
+
+        nb_rangees (Entier): le nombre de rangées dans l'entrepôt.
+
+        longueur_rangees (Entier): la longueur des rangées dans l'entrepôt.
+
+        temps_entrepot (array de taille (nb_ref, nb_ref)): temps de récupération de chaque paire de places.
+            Seule la diagonale est utilisée ; si temps_entrepot vaut None, elle est calculée
+            directement avec le S-shape (utile lorsque la matrice ne tient pas en mémoire).
+
+    Return:
+        positionnement (array de taille (longueur_rangees, nb_rangees)) : la position des références dans l'entrepôt.
+
+    >>> historique = np.array([[0, 5, 1, 0], [5, 0, 0, 0], [1, 0, 0, 2], [0, 0, 2, 0]])
+    >>> spectral(historique, 2, 2, evalue_entrepot(2, 2))
+    array([[1., 3.],
+           [0., 2.]])
+    """
+    if temps_entrepot is None:
+        distance = distance_entree(longueur_rangees, nb_rangees)
+    else:
+        distance = np.diagonal(temps_entrepot)
+    distance = distance.reshape(longueur_rangees, nb_rangees)
+    frequence = np.asarray(sparse.csr_matrix(historique).sum(axis=1)).ravel()
+
+    # Découpage de l'ordre spectral en un groupe par rangée, trié par fréquence décroissante
+    groupes = ordre_spectral(historique).reshape(nb_rangees, longueur_rangees)
+    groupes = np.take_along_axis(groupes, np.argsort(-frequence[groupes], axis=1, kind="stable"), axis=1)
+    groupes = groupes[np.argsort(-frequence[groupes].sum(axis=1), kind="stable")]
+
+    # Rangées triées par distance moyenne à l'entrée, casiers triés par distance dans chaque rangée
+    rangees = np.argsort(distance.mean(axis=0), kind="stable")
+    casiers = np.argsort(distance, axis=0, kind="stable")[:, rangees]
+
+    positionnement = np.zeros((longueur_rangees, nb_rangees))
+    positionnement[casiers, rangees[None, :]] = groupes.T
+
+    return positionnement
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()
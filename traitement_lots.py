@@ -0,0 +1,280 @@
+"""
+Ce script calcule les positionnements de nombreuses instances en parallèle :
+    python traitement_lots.py instances/ sortie/ --algorithmes jacquard descente --budget 60 --processus 8
+Les instances sont les fichiers .txt d'un répertoire, ou celles listées dans un manifeste
+(un chemin par ligne, avec ou sans .txt ; les lignes commençant par "#" sont ignorées).
+-------
+Chaque processus traite une instance à la fois avec un budget de temps : les algorithmes sont lancés
+dans l'ordre donné et ceux qui acceptent un temps maximal (descente, genetique, decomposition)
+reçoivent le temps restant. Dans le répertoire de sortie, on écrit dès qu'il est calculé
+    - nom.algorithme.npy : le positionnement,
+    - nom.algorithme.json : son coût et son temps de calcul,
+puis nom.json, qui regroupe les résultats des algorithmes demandés lorsque l'instance est terminée.
+Si le traitement d'une instance échoue, l'erreur est écrite dans nom.erreur.json et le lot continue.
+nom est le nom du fichier de l'instance, la politique de routage et l'empreinte de son chemin (cf nom_sortie) :
+deux instances de même nom dans deux répertoires différents n'ont pas les mêmes fichiers.
+Les fichiers sont écrits de manière atomique : après un arrêt brutal, ou avec de nouveaux algorithmes,
+une nouvelle exécution ne lance que les algorithmes dont le résultat manque.
+"""
+
+import json
+import os
+import traceback
+from multiprocessing import Pool
+from pathlib import Path
+from time import time
+import numpy as np
+
+# Seuils de corrélation essayés pour Jacquard
+SEUILS = [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4]
+BUDGET = 60.
+TAILLE_POPULATION = 20
+
+ALGORITHMES = {}
+
+
+def algorithme(nom):
+    """
+    Enregistre un algorithme sous le nom "nom".
+    La fonction décorée reçoit l'instance, le temps restant (en secondes) et les positionnements
+    déjà calculés pour cette instance ; elle renvoie un positionnement.
+    """
+    def enregistre(fonction):
+        ALGORITHMES[nom] = fonction
+        return fonction
+    return enregistre
+
+
+@algorithme("abc")
+def _abc(instance, temps_restant, positionnements):
+    from abc_classique import ABC
+    return ABC(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance)
+
+
+@algorithme("jacquard")
+def _jacquard(instance, temps_restant, positionnements):
+    from jaccard import balayage_seuil
+    return balayage_seuil(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot,
+                          SEUILS, instance=instance)[1]
+
+
+@algorithme("spectral")
+def _spectral(instance, temps_restant, positionnements):
+    from spectral import spectral
+    return spectral(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot)
+
+
+@algorithme("descente")
+def _descente(instance, temps_restant, positionnements):
+    from descente_locale import descente
+    # On part du meilleur positionnement déjà calculé, sinon de celui de Jacquard
+    depart = min(positionnements.values(), key=lambda positionnement: _cout(instance, positionnement),
+                 default=None)
+    if depart is None:
+        depart = _jacquard(instance, temps_restant, positionnements)
+    return descente(depart.copy(), instance=instance, temps_max=temps_restant)
+
+
+@algorithme("genetique")
+def _genetique(instance, temps_restant, positionnements):
+    from genetique import genetique, population_initiale
+    population = population_initiale(instance.proba, instance.nb_rangees, instance.longueur_rangees,
+                                     instance.temps_entrepot, TAILLE_POPULATION, instance=instance)
+    return genetique(population, instance.proba, instance.temps_entrepot, temps_max=temps_restant)[0]
+
+
+@algorithme("decomposition")
+def _decomposition(instance, temps_restant, positionnements):
+    from decomposition import decomposition
+    nb_zones = max(1, instance.nb_rangees // 4)
+    return decomposition(instance.proba, instance.nb_rangees, instance.longueur_rangees, instance.temps_entrepot,
+                         nb_zones, temps_max=temps_restant / nb_zones, instance=instance)
+
+
+def _cout(instance, positionnement):
+    from evaluation import evalue_position
+    return evalue_position(positionnement, instance.temps_entrepot, instance.proba)
+
+
+def _ecrit_atomique(chemin, ecriture):
+    """
+    Ecrit le fichier avec ecriture(fichier) dans un fichier temporaire, puis le renomme :
+    le fichier n'existe que s'il est complet.
+    """
+    temporaire = Path("{}.{}.tmp".format(chemin, os.getpid()))
+    with open(temporaire, "wb") as fichier:
+        ecriture(fichier)
+    os.replace(temporaire, chemin)
+
+
+def liste_instances(source):
+    """
+    Chemins (sans .txt) des instances d'un répertoire ou d'un manifeste.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as repertoire:
+    ...     with open(repertoire + "/manifeste", "w") as manifeste:
+    ...         _ = manifeste.write("# instances\\na.txt\\n\\nb\\n")
+    ...     liste_instances(repertoire + "/manifeste")
+    ['a', 'b']
+    """
+    source = Path(source)
+    if source.is_dir():
+        return [str(chemin.with_suffix("")) for chemin in sorted(source.glob("*.txt"))]
+
+    instances = []
+    with open(source) as manifeste:
+        for ligne in manifeste:
+            ligne = ligne.strip()
+            if ligne and not ligne.startswith("#"):
+                instances.append(ligne[:-len(".txt")] if ligne.endswith(".txt") else ligne)
+    return instances
+
+
+def nom_sortie(nom_instance, politique="sshape"):
+    """
+    Préfixe des fichiers de sortie d'une instance : son nom, la politique de routage (les coûts en dépendent)
+    et l'empreinte de son chemin absolu.
+
+    >>> nom_sortie("a/w1") == nom_sortie("a/../a/w1"), nom_sortie("a/w1") == nom_sortie("b/w1")
+    (True, False)
+    >>> nom_sortie("a/w1") == nom_sortie("a/w1", "retour"), nom_sortie("a/w1", "retour").startswith("w1-retour-")
+    (False, True)
+    """
+    from cache import empreinte
+    chemin = Path(nom_instance)
+    return "{}-{}-{}".format(chemin.name, politique, empreinte(str(chemin.resolve()))[:12])
+
+
+def traite_instance(nom_instance, algorithmes, repertoire_sortie, budget=BUDGET, politique="sshape", cache=None):
+    """
+    Lance les algorithmes sur une instance et écrit leurs résultats au fur et à mesure.
+
+    Parametres:
+        nom_instance (Chaîne de caractères): chemin de l'instance, sans l'extension .txt.
+
+        algorithmes (liste de chaînes de caractères): les algorithmes à lancer (des clés de ALGORITHMES), dans l'ordre.
+
+        repertoire_sortie (Chaîne de caractères): le répertoire des résultats.
+
+        budget (Réel): temps de calcul donné à l'instance, en secondes.
+
+        politique (Chaîne de caractères): la politique de routage du robot.
+
+        cache (CacheDisque): cache sur le disque des statistiques, facultatif.
+
+    Return:
+        resultats (dictionnaire): pour chaque algorithme, son coût et son temps de calcul.
+            Les résultats déjà écrits sont relus : seuls les algorithmes qui manquent sont lancés.
+    """
+    from instance import Instance
+
+    sortie = Path(repertoire_sortie)
+    nom = nom_sortie(nom_instance, politique)
+    chemin_final = sortie / "{}.json".format(nom)
+
+    debut = time()
+    # L'instance n'est chargée que si un algorithme reste à lancer
+    instance = None
+    positionnements = {}
+    resultats = {}
+    for nom_algorithme in algorithmes:
+        chemin_positionnement = sortie / "{}.{}.npy".format(nom, nom_algorithme)
+        chemin_resultat = sortie / "{}.{}.json".format(nom, nom_algorithme)
+        if chemin_resultat.exists():
+            # Calculé avant un arrêt
+            positionnements[nom_algorithme] = np.load(chemin_positionnement)
+            with open(chemin_resultat) as fichier:
+                resultats[nom_algorithme] = json.load(fichier)
+            continue
+
+        if instance is None:
+            instance = Instance.depuis_fichier(nom_instance, cache, politique)
+        debut_algorithme = time()
+        positionnement = ALGORITHMES[nom_algorithme](instance, max(budget - (time() - debut), 0.), positionnements)
+        resultat = {"cout": _cout(instance, positionnement), "temps": time() - debut_algorithme}
+        positionnements[nom_algorithme] = positionnement
+        resultats[nom_algorithme] = resultat
+        # Le positionnement est écrit avant son résultat : un résultat présent a toujours son positionnement
+        _ecrit_atomique(chemin_positionnement, lambda fichier: np.save(fichier, positionnement))
+        _ecrit_atomique(chemin_resultat, lambda fichier: fichier.write(json.dumps(resultat).encode()))
+
+    _ecrit_atomique(chemin_final, lambda fichier: fichier.write(json.dumps(resultats, indent=1).encode()))
+    return resultats
+
+
+def _traite_instance_processus(arguments):
+    (nom_instance, algorithmes, repertoire_sortie, budget, politique, cache) = arguments
+    chemin_erreur = Path(repertoire_sortie) / "{}.erreur.json".format(nom_sortie(nom_instance, politique))
+    try:
+        resultats = traite_instance(nom_instance, algorithmes, repertoire_sortie, budget, politique, cache)
+    except Exception as erreur:
+        # Une instance en erreur n'arrête pas le lot : l'erreur est écrite et on passe à l'instance suivante
+        resultats = {"erreur": "{}: {}".format(type(erreur).__name__, erreur), "trace": traceback.format_exc()}
+        _ecrit_atomique(chemin_erreur, lambda fichier: fichier.write(json.dumps(resultats, indent=1).encode()))
+        return nom_instance, resultats
+    if chemin_erreur.exists():
+        chemin_erreur.unlink()
+    return nom_instance, resultats
+
+
+def _affiche(nom_instance, resultats):
+    if "erreur" in resultats:
+        print("{} : erreur {}".format(nom_instance, resultats["erreur"]))
+        return
+    print("{} : {}".format(nom_instance, ", ".join("{} {:.4f} ({:.2f} s)".format(nom, resultat["cout"], resultat["temps"])
+                                                   for (nom, resultat) in resultats.items())))
+
+
+def traite_lots(instances, algorithmes, repertoire_sortie, budget=BUDGET, nb_processus=1, politique="sshape",
+                cache=None):
+    """
+    Traite toutes les instances, nb_processus à la fois, et affiche les résultats au fur et à mesure.
+
+    Return:
+        resultats (dictionnaire): pour chaque instance, les résultats de traite_instance,
+            ou son erreur ({"erreur": ..., "trace": ...}).
+    """
+    Path(repertoire_sortie).mkdir(parents=True, exist_ok=True)
+    taches = [(nom_instance, algorithmes, repertoire_sortie, budget, politique, cache) for nom_instance in instances]
+
+    resultats = {}
+    if nb_processus > 1:
+        with Pool(nb_processus) as pool:
+            for (nom_instance, resultat) in pool.imap_unordered(_traite_instance_processus, taches):
+                resultats[nom_instance] = resultat
+                _affiche(nom_instance, resultat)
+    else:
+        for tache in taches:
+            (nom_instance, resultat) = _traite_instance_processus(tache)
+            resultats[nom_instance] = resultat
+            _affiche(nom_instance, resultat)
+    return resultats
+
+
+def main(arguments=None):
+    """
+    Lance le traitement par lots depuis la ligne de commande.
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Calcule les positionnements de nombreuses instances en parallèle.")
+    parser.add_argument("source", help="répertoire des instances (.txt) ou manifeste")
+    parser.add_argument("sortie", help="répertoire des résultats")
+    parser.add_argument("--algorithmes", nargs="+", choices=sorted(ALGORITHMES), default=["jacquard", "descente"])
+    parser.add_argument("--budget", type=float, default=BUDGET, help="temps de calcul par instance, en secondes")
+    parser.add_argument("--processus", type=int, default=os.cpu_count())
+    parser.add_argument("--politique", default="sshape", help="politique de routage du robot")
+    parser.add_argument("--cache", action="store_true", help="utilise le cache sur le disque")
+    arguments = parser.parse_args(arguments)
+
+    cache = None
+    if arguments.cache:
+        from cache import CacheDisque
+        cache = CacheDisque()
+    traite_lots(liste_instances(arguments.source), arguments.algorithmes, arguments.sortie, arguments.budget,
+                arguments.processus, arguments.politique, cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Ce module permet de stocker une matrice symétrique (probabilités des commandes, temps de l'entrepôt)
+par son seul triangle supérieur, diagonale comprise : nb * (nb + 1) / 2 réels au lieu de nb * nb.
+-------
+Le triangle est rangé ligne par ligne : la ligne i contient les coefficients [i, i], [i, i + 1], ..., [i, nb - 1],
+de sorte que le coefficient [i, j] (i <= j) est à l'indice i * (2 * nb - i + 1) / 2 + j - i.
+Une MatriceTriangulaire s'indexe comme un tableau numpy de taille (nb, nb) (entiers, tableaux d'indices
+qui se diffusent, tranches), et np.asarray la transforme en matrice pleine pour le code qui en a besoin.
+evalue_position et evalue_positions lisent directement le triangle, sans matrice pleine (cf couples_non_nuls).
+"""
+
+import numpy as np
+
+
+def taille_triangulaire(nb):
+    """
+    Nombre de coefficients du triangle supérieur (diagonale comprise) d'une matrice de taille (nb, nb).
+
+    >>> taille_triangulaire(4)
+    10
+    """
+    return nb * (nb + 1) // 2
+
+
+def indice_triangulaire(ligne, colonne, nb):
+    """
+    Indice du coefficient [ligne, colonne] dans le triangle rangé ligne par ligne.
+    Les indices peuvent être des tableaux (qui se diffusent) ; [ligne, colonne] et [colonne, ligne]
+    ont le même indice.
+
+    Parametres:
+        ligne (Entier ou array d'entiers): les lignes.
+
+        colonne (Entier ou array d'entiers): les colonnes.
+
+        nb (Entier): la taille de la matrice.
+
+    Return:
+        indices (Entier ou array d'entiers): les indices dans le triangle.
+
+    >>> indice_triangulaire(np.array([0, 1, 3, 2]), np.array([2, 1, 3, 1]), 4)
+    array([2, 4, 9, 5])
+    """
+    ligne = np.asarray(ligne)
+    colonne = np.asarray(colonne)
+    (haut, bas) = (np.minimum(ligne, colonne), np.maximum(ligne, colonne))
+    return haut * (2 * nb - haut + 1) // 2 + bas - haut
+
+
+def coordonnees_triangulaires(indices, nb):
+    """
+    Inverse de indice_triangulaire : la ligne et la colonne (ligne <= colonne) de chaque indice du triangle.
+
+    >>> coordonnees_triangulaires(np.array([2, 4, 9, 5]), 4)
+    (array([0, 1, 3, 1]), array([2, 1, 3, 2]))
+    """
+    indices = np.asarray(indices)
+    # La ligne i commence à l'indice i * (2 * nb - i + 1) / 2 : on résout l'équation du second degré
+    lignes = np.floor((2 * nb + 1 - np.sqrt((2 * nb + 1) ** 2 - 8 * indices)) / 2).astype(int)
+    # Correction des erreurs d'arrondi
+    lignes -= indice_triangulaire(lignes, lignes, nb) > indices
+    lignes += indice_triangulaire(lignes + 1, lignes + 1, nb) <= indices
+    return lignes, indices - indice_triangulaire(lignes, lignes, nb) + lignes
+
+
+def indices_diffuses(cle, nb):
+    """
+    Transforme l'indexation [lignes, colonnes] d'une matrice de taille (nb, nb) (entiers, tableaux,
+    tranches, ou une seule ligne) en deux tableaux d'indices qui se diffusent à la forme du résultat numpy.
+
+    >>> [indices.shape for indices in indices_diffuses((slice(None), np.array([0, 2])), 3)]
+    [(3, 1), (2,)]
+    """
+    if not isinstance(cle, tuple):
+        cle = (cle, slice(None))
+    (lignes, colonnes) = cle
+    if not (isinstance(lignes, slice) or isinstance(colonnes, slice)):
+        return np.asarray(lignes), np.asarray(colonnes)
+
+    # Même forme que pour un tableau numpy : la dimension d'une tranche est à sa place
+    lignes_tranche = isinstance(lignes, slice)
+    lignes = np.arange(nb)[lignes] if lignes_tranche else np.asarray(lignes)
+    colonnes = np.arange(nb)[colonnes] if isinstance(colonnes, slice) else np.asarray(colonnes)
+    if lignes_tranche:
+        return lignes.reshape((-1,) + (1,) * colonnes.ndim), colonnes
+    return lignes[..., None], colonnes
+
+
+class MatriceTriangulaire:
+    """
+    Matrice symétrique stockée par son triangle supérieur.
+
+    Parametres:
+        valeurs (Array de taille nb * (nb + 1) / 2): le triangle supérieur rangé ligne par ligne.
+
+        nb (Entier): la taille de la matrice.
+
+    >>> matrice = MatriceTriangulaire.depuis_matrice(np.array([[1., 2., 3.], [2., 4., 5.], [3., 5., 6.]]))
+    >>> matrice.valeurs
+    array([1., 2., 3., 4., 5., 6.])
+    >>> matrice[2, 1], matrice[np.array([0, 2]), np.array([1, 0])], matrice[1]
+    (5.0, array([2., 3.]), array([2., 4., 5.]))
+    >>> places = np.array([2, 0])
+    >>> matrice[places[:, None], places[None, :]]
+    array([[6., 3.],
+           [3., 1.]])
+    >>> bool(np.array_equal(np.asarray(matrice), matrice[:, :]))
+    True
+    """
+    def __init__(self, valeurs, nb):
+        self.valeurs = np.asarray(valeurs)
+        self.nb = int(nb)
+        if len(self.valeurs) != taille_triangulaire(self.nb):
+            raise ValueError("Le triangle d'une matrice de taille {} a {} coefficients, et non {}.".format(
+                self.nb, taille_triangulaire(self.nb), len(self.valeurs)))
+
+    @classmethod
+    def depuis_matrice(cls, matrice):
+        """
+        Garde le triangle supérieur (diagonale comprise) d'une matrice carrée ; le triangle inférieur est ignoré.
+        """
+        matrice = np.asarray(matrice)
+        nb = len(matrice)
+        # La sélection booléenne parcourt la matrice ligne par ligne : c'est l'ordre du triangle
+        lignes = np.arange(nb)
+        return cls(matrice[lignes[:, None] <= lignes[None, :]], nb)
+
+    @property
+    def shape(self):
+        return (self.nb, self.nb)
+
+    @property
+    def nbytes(self):
+        return self.valeurs.nbytes
+
+    def __len__(self):
+        return self.nb
+
+    def ligne(self, ligne):
+        """Coefficients [ligne, ligne], ..., [ligne, nb - 1], sans copie."""
+        debut = int(indice_triangulaire(ligne, ligne, self.nb))
+        return self.valeurs[debut: debut + self.nb - ligne]
+
+    def __getitem__(self, cle):
+        (lignes, colonnes) = indices_diffuses(cle, self.nb)
+        return self.valeurs[indice_triangulaire(lignes, colonnes, self.nb)]
+
+    def triangle_superieur(self):
+        """
+        Coefficients [i, j] pour i < j, dans l'ordre de np.triu_indices(nb, 1).
+        """
+        return self.valeurs[indice_triangulaire(*np.triu_indices(self.nb, 1), self.nb)]
+
+    def dense(self):
+        """Matrice pleine (symétrique) de taille (nb, nb)."""
+        lignes = np.arange(self.nb)
+        return self[lignes[:, None], lignes[None, :]]
+
+    def __array__(self, dtype=None):
+        return self.dense() if dtype is None else self.dense().astype(dtype)
+
+    def copy(self):
+        return MatriceTriangulaire(self.valeurs.copy(), self.nb)
+
+
+def couples_non_nuls(matrice):
+    """
+    Couples ref1 < ref2 de coefficient non nul d'une matrice pleine (triangle supérieur) ou triangulaire,
+    sans construire de tableau d'indices de taille nb * nb.
+
+    Return:
+        lignes, colonnes (arrays d'entiers): les couples, avec lignes < colonnes.
+
+        valeurs (Array): leurs coefficients.
+
+    >>> couples_non_nuls(np.array([[1., 0., 2.], [7., 0., 3.], [8., 9., 0.]]))
+    (array([0, 1]), array([2, 2]), array([2., 3.]))
+    >>> couples_non_nuls(MatriceTriangulaire(np.array([1., 0., 2., 0., 3., 0.]), 3))
+    (array([0, 1]), array([2, 2]), array([2., 3.]))
+    """
+    if isinstance(matrice, MatriceTriangulaire):
+        (lignes, colonnes) = coordonnees_triangulaires(np.flatnonzero(matrice.valeurs), matrice.nb)
+        hors_diagonale = lignes < colonnes
+        (lignes, colonnes) = (lignes[hors_diagonale], colonnes[hors_diagonale])
+        return lignes, colonnes, matrice.valeurs[indice_triangulaire(lignes, colonnes, matrice.nb)]
+
+    matrice = np.asarray(matrice)
+    (lignes, colonnes) = np.nonzero(np.triu(matrice, 1))
+    return lignes, colonnes, matrice[lignes, colonnes]
+
+
+def triangle_superieur(matrice):
+    """
+    Coefficients [i, j] pour i < j d'une matrice pleine ou triangulaire, dans l'ordre de np.triu_indices(nb, 1).
+
+    >>> triangle_superieur(np.array([[0, 1, 2], [7, 0, 3], [8, 9, 0]]))
+    array([1, 2, 3])
+    """
+    if isinstance(matrice, MatriceTriangulaire):
+        return matrice.triangle_superieur()
+    return np.asarray(matrice)[np.triu_indices(len(matrice), 1)]
+
+
+if __name__ == "__main__":
+    # -- Doc tests -- #
+    import doctest
+    doctest.testmod()